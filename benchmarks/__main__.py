@@ -0,0 +1,192 @@
+"""Offline benchmarks for dugs
+
+Run every scenario against synthetic data and write a JSON report:
+
+    python -m benchmarks run --guilds 10 --companies 50 --members 40 --messages-per-second 1000
+
+Compare two reports, e.g. from before and after a change:
+
+    python -m benchmarks compare baseline.json candidate.json
+
+Replay recorded gateway traffic (see `dugs.replay`) at 1x, Nx or maximum speed:
+
+    python -m benchmarks synthesize replay-data --guilds 10 --messages-per-second 2000
+    python -m benchmarks replay replay-data/recording.jsonl.gz --database replay-data/bench.db --speed max
+
+Time process start to gateway connect, against a fresh and an already-migrated database:
+
+    python -m benchmarks startup --runs 10
+
+Scenarios that check what they measure, like `companies.archive_rejoin`, fail the run when a check
+does not hold.
+
+Fail when the import cost of startup goes over budget or a lazy dependency is imported eagerly:
+
+    python -m benchmarks importtime --budget-ms 1000
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from benchmarks.fixtures import Scale, build_context
+from benchmarks.harness import ScenarioResult, compare, write_report
+from benchmarks.importtime import (
+    BUDGET_MS,
+    check_imports,
+    format_report,
+    measure_imports,
+)
+from benchmarks.replay import replay, synthesize
+from benchmarks.scenarios import SCENARIOS, fill_cache
+from benchmarks.startup import measure_startup
+
+
+async def run(args: argparse.Namespace) -> List[ScenarioResult]:
+    scale = _scale(args)
+    names = args.scenario or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="dugs-bench-") as directory:
+        ctx = await build_context(scale, Path(directory))
+        try:
+            await fill_cache(ctx)
+            for name in names:
+                result = await SCENARIOS[name](ctx, args.iterations)
+                print(result.summary())
+                for failure in result.failures:
+                    print(f"FAIL: {name}: {failure}")
+                results.append(result)
+        finally:
+            await ctx.close()
+
+    write_report(args.output, scale.to_dict(), results)
+    print(f"Report written to {args.output}")
+    return results
+
+
+def _scale(args: argparse.Namespace) -> Scale:
+    return Scale(
+        guilds=args.guilds,
+        companies_per_guild=args.companies,
+        members_per_company=args.members,
+        messages_per_second=args.messages_per_second,
+        duration=args.duration,
+        seed=args.seed,
+    )
+
+
+def _speed(value: str) -> Optional[float]:
+    if value == "max":
+        return None
+    return float(value.rstrip("x"))
+
+
+async def run_replay(args: argparse.Namespace) -> None:
+    results = await replay(args.recording, speed=args.speed, database=args.database)
+    for result in results:
+        print(result.summary())
+    write_report(args.output, {"speed": args.speed}, results)
+    print(f"Report written to {args.output}")
+
+
+def run_startup(args: argparse.Namespace) -> None:
+    results = measure_startup(args.runs)
+    for result in results:
+        print(result.summary())
+        print(f"{'':<45} phases (p50 ms since process start): {result.extra['phases_ms']}")
+    write_report(args.output, {"runs": args.runs}, results)
+    print(f"Report written to {args.output}")
+
+
+def run_importtime(args: argparse.Namespace) -> int:
+    result, imports = measure_imports(args.runs)
+    print(format_report(imports))
+    print(result.summary())
+    write_report(args.output, {"budget_ms": args.budget_ms}, [result])
+
+    problems = check_imports(result, imports, args.budget_ms)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+def _add_scale_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--companies", type=int, default=20, help="companies per guild")
+    parser.add_argument("--members", type=int, default=25, help="members per company")
+    parser.add_argument("--messages-per-second", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of messages")
+    parser.add_argument("--seed", type=int, default=Scale.seed)
+
+
+def main() -> Optional[int]:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run scenarios and write a JSON report")
+    _add_scale_arguments(run_parser)
+    run_parser.add_argument("--iterations", type=int, default=1000)
+    run_parser.add_argument("--scenario", action="append", help="run only these scenarios")
+    run_parser.add_argument("--output", default="bench_output.json")
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+
+    commands.add_parser("list", help="list available scenarios")
+
+    replay_parser = commands.add_parser("replay", help="replay a gateway recording into the bot")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--speed", type=_speed, default=1.0, help="1, 10, 10x or max")
+    replay_parser.add_argument("--database", help="database to copy and replay against")
+    replay_parser.add_argument("--output", default="bench_output.json")
+
+    synthesize_parser = commands.add_parser(
+        "synthesize", help="write a synthetic recording and matching database"
+    )
+    synthesize_parser.add_argument("directory", type=Path)
+    _add_scale_arguments(synthesize_parser)
+
+    startup_parser = commands.add_parser("startup", help="time process start to gateway connect")
+    startup_parser.add_argument("--runs", type=int, default=5)
+    startup_parser.add_argument("--output", default="bench_output.json")
+
+    importtime_parser = commands.add_parser(
+        "importtime", help="check startup import time against a budget"
+    )
+    importtime_parser.add_argument("--runs", type=int, default=3)
+    importtime_parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    importtime_parser.add_argument("--output", default="bench_output.json")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print("\n".join(SCENARIOS))
+    elif args.command == "compare":
+        print(compare(args.baseline, args.candidate))
+    elif args.command == "synthesize":
+        path = asyncio.run(synthesize(_scale(args), args.directory))
+        print(f"Recording written to {path}")
+    elif args.command == "startup":
+        run_startup(args)
+    elif args.command == "importtime":
+        return run_importtime(args)
+    else:
+        # the bot logs at INFO; the scenarios would drown the results
+        logging.getLogger().setLevel(logging.WARNING)
+        if args.command == "replay":
+            asyncio.run(run_replay(args))
+        else:
+            results = asyncio.run(run(args))
+            return 1 if any(result.failures for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Minimal stand-ins for the disnake objects the cogs touch.
+
+Only the attributes and coroutines the bot actually uses are implemented. `FakeMember` subclasses
+`disnake.Member` so the `isinstance` check in `dugs.database.Member.__eq__` still holds.
+"""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional
+
+import disnake
+
+from dugs import ingest
+
+__all__ = (
+    "FakeAttachment",
+    "FakeBot",
+    "FakeChannel",
+    "FakeGuild",
+    "FakeInteraction",
+    "FakeMember",
+    "FakeMessage",
+    "FakeResponse",
+    "FakeRole",
+    "FakeThread",
+)
+
+
+class FakeUser:
+    __slots__ = ("id", "name", "global_name", "bot")
+
+    def __init__(self, id: int, name: str, bot: bool = False) -> None:
+        self.id = id
+        self.name = name
+        self.global_name = name
+        self.bot = bot
+
+
+class FakeRole:
+    def __init__(self, id: int, name: str, color: int = 0, position: int = 1) -> None:
+        self.id = id
+        self.name = name
+        self.color = color
+        self.position = position
+        self.members: List[FakeMember] = []
+
+    @property
+    def mention(self) -> str:
+        return f"<@&{self.id}>"
+
+    def __lt__(self, other: FakeRole) -> bool:
+        return (self.position, self.id) < (other.position, other.id)
+
+    async def delete(self, *, reason: Optional[str] = None) -> None:
+        pass
+
+
+class FakeMember(disnake.Member):
+    __slots__ = ()
+
+    def __init__(self, guild: FakeGuild, id: int, name: str, bot: bool = False) -> None:
+        self._user = FakeUser(id, name, bot)
+        self._roles = disnake.utils.SnowflakeList([])
+        self._state = None
+        self.guild = guild
+        self.nick = None
+
+    def __repr__(self) -> str:
+        return f"<FakeMember id={self.id} name={self.name!r}>"
+
+    async def add_roles(self, *roles: Any, reason: Optional[str] = None, atomic: bool = True):
+        for role in roles:
+            if not self._roles.has(role.id):
+                self._roles.add(role.id)
+            if (r := self.guild.get_role(role.id)) and self not in r.members:
+                r.members.append(self)
+
+    async def remove_roles(self, *roles: Any, reason: Optional[str] = None, atomic: bool = True):
+        for role in roles:
+            if self._roles.has(role.id):
+                self._roles.remove(role.id)
+            if (r := self.guild.get_role(role.id)) and self in r.members:
+                r.members.remove(self)
+
+    async def send(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+class FakeChannel:
+    def __init__(self, id: int, name: str, guild: FakeGuild) -> None:
+        self.id = id
+        self.name = name
+        self.guild = guild
+        self.sent = 0
+
+    def permissions_for(self, member: FakeMember) -> disnake.Permissions:
+        return disnake.Permissions.all()
+
+    async def send(self, *args: Any, **kwargs: Any) -> None:
+        self.sent += 1
+
+
+class FakeGuild:
+    def __init__(self, id: int, name: str) -> None:
+        self.id = id
+        self.name = name
+        self.default_role = FakeRole(id, "@everyone", position=0)
+        self._roles: Dict[int, FakeRole] = {}
+        self._members: Dict[int, FakeMember] = {}
+        self.text_channels = [FakeChannel(id + 1, "war-announcements", self)]
+        self.chunked = True
+        self.unavailable = False
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._members.values())
+
+    @property
+    def roles(self) -> List[FakeRole]:
+        return list(self._roles.values())
+
+    @property
+    def member_count(self) -> int:
+        return len(self._members)
+
+    def get_member(self, id: int) -> Optional[FakeMember]:
+        return self._members.get(id)
+
+    def get_role(self, id: int) -> Optional[FakeRole]:
+        return self._roles.get(id)
+
+    def add_member(self, member: FakeMember) -> FakeMember:
+        self._members[member.id] = member
+        return member
+
+    async def create_role(self, *, name: str, color: int = 0, **kwargs: Any) -> FakeRole:
+        role_id = max(self._roles, default=self.id) + 1
+        role = self._roles[role_id] = FakeRole(role_id, name, color)
+        return role
+
+
+class FakeAttachment:
+    def __init__(self, content_type: Optional[str]) -> None:
+        self.content_type = content_type
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        id: int,
+        author: FakeMember,
+        content: str,
+        attachments: Iterable[FakeAttachment] = (),
+    ) -> None:
+        self.id = id
+        self.author = author
+        self.guild = author.guild
+        self.channel = author.guild.text_channels[0]
+        self.content = content
+        self.attachments = list(attachments)
+
+
+class FakeThread:
+    def __init__(self, id: int, owner: FakeMember) -> None:
+        self.id = id
+        self.owner_id = owner.id
+        self.guild = owner.guild
+        self.parent_id = owner.guild.text_channels[0].id
+
+
+class FakeResponse:
+    def __init__(self) -> None:
+        self._response_type = None
+
+    async def send_message(self, *args: Any, **kwargs: Any) -> None:
+        self._response_type = 4
+
+    async def defer(self, *args: Any, **kwargs: Any) -> None:
+        self._response_type = 5
+
+
+class FakeInteraction:
+    """Stands in for both command and component interactions"""
+
+    def __init__(
+        self, author: FakeMember, command_name: str = "", custom_id: Optional[str] = None
+    ) -> None:
+        self.author = author
+        self.guild = author.guild
+        self.guild_id = author.guild.id
+        self.channel = author.guild.text_channels[0]
+        self.application_command = SimpleNamespace(name=command_name)
+        self.component = SimpleNamespace(custom_id=custom_id)
+        self.response = FakeResponse()
+
+    async def delete_original_response(self) -> None:
+        pass
+
+    async def edit_original_response(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+
+class FakeBot:
+    """Just enough of `Dugs` for the cogs to be constructed and driven directly"""
+
+    def __init__(self, db: Any, companies: Any, guilds: List[FakeGuild]) -> None:
+        self.db_session = db
+        self.companies = companies
+        self.guilds = guilds
+        self._guilds = {g.id: g for g in guilds}
+        self.ingestion = ingest.IngestionQueue(maxsize=10_000, batch_size=256)
+
+    @property
+    def db(self) -> Any:
+        return self.db_session
+
+    def get_guild(self, id: int) -> Optional[FakeGuild]:
+        return self._guilds.get(id)
+
+    async def wait_until_ready(self) -> None:
+        # the benchmarks drive task loops by hand, so the scheduled loops must never start
+        await asyncio.Event().wait()
+
+    async def wait_until_warm(self) -> None:
+        # the context warms the cache before any scenario runs
+        pass
+
+    async def save_snapshot(self) -> None:
+        pass
@@ -0,0 +1,153 @@
+"""Synthetic guilds, companies, members and message streams at a configurable scale"""
+from __future__ import annotations
+
+import random
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from benchmarks.fakes import FakeAttachment, FakeBot, FakeGuild, FakeMember, FakeMessage, FakeRole
+from dugs import enums
+from dugs.companies import Companies
+from dugs.database import Base, Company, Member
+
+__all__ = ("BenchContext", "Scale", "build_context")
+
+WORDS = (
+    "a the war company raid loot gold ok lol gg attack defend base we they charge retreat "
+    "victory influence push hold guild leader private banner march"
+).split()
+
+ATTACHMENT_TYPES = (None, "image/png", "image/jpeg", "video/mp4", "application/pdf")
+
+# snowflake-sized id ranges so ids never collide between object kinds
+GUILD_ID_BASE = 100_000_000_000_000_000
+COMPANY_ID_BASE = 200_000_000_000_000_000
+MEMBER_ID_BASE = 300_000_000_000_000_000
+LURKER_ID_BASE = 400_000_000_000_000_000
+
+
+@dataclass
+class Scale:
+    guilds: int = 5
+    companies_per_guild: int = 20
+    members_per_company: int = 25
+    messages_per_second: int = 500
+    duration: float = 5.0
+    at_war_ratio: float = 0.5
+    seed: int = 1115612796
+
+    def to_dict(self) -> Dict[str, object]:
+        return asdict(self)
+
+
+@dataclass
+class BenchContext:
+    scale: Scale
+    engine: AsyncEngine
+    db: async_sessionmaker[AsyncSession]
+    bot: FakeBot
+    guilds: List[FakeGuild]
+    companies: List[Company]
+    messages: List[FakeMessage] = field(default_factory=list)
+
+    async def close(self) -> None:
+        await self.engine.dispose()
+
+
+def _message_content(rng: random.Random) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(1, 12)))
+
+
+async def build_context(scale: Scale, directory: Path) -> BenchContext:
+    """Creates a temporary SQLite database and matching fake guilds at the requested scale"""
+    rng = random.Random(scale.seed)
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{directory / 'bench.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    db = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    guilds: List[FakeGuild] = []
+    companies: List[Company] = []
+    colors = list(enums.CompanyColor)
+
+    for g in range(scale.guilds):
+        guild = FakeGuild(GUILD_ID_BASE + g, f"Guild {g}")
+        guilds.append(guild)
+        guild_companies = []
+
+        for c in range(scale.companies_per_guild):
+            company_id = COMPANY_ID_BASE + g * 1_000_000 + c
+            color = colors[c % len(colors)]
+            role = guild._roles[company_id] = FakeRole(company_id, f"Company {g}-{c}", color)
+            members = []
+
+            for m in range(scale.members_per_company):
+                member_id = MEMBER_ID_BASE + (g * 1_000_000 + c) * 10_000 + m
+                member = guild.add_member(FakeMember(guild, member_id, f"member-{g}-{c}-{m}"))
+                member._roles.add(company_id)
+                role.members.append(member)
+                members.append(
+                    Member(
+                        member_id=member_id,
+                        company_id=company_id,
+                        type=enums.RoleType.Leader if m == 0 else enums.RoleType.Private,
+                    )
+                )
+
+            influence = rng.randint(0, 500)
+            guild_companies.append(
+                Company(
+                    id=company_id,
+                    guild_id=guild.id,
+                    name=f"Company {g}-{c} [Public Company]",
+                    color=color,
+                    type=rng.choice(list(enums.CompanyType)),
+                    influence=influence,
+                    total_influence=influence + rng.randint(0, 10_000),
+                    at_war=False,
+                    members=members,
+                )
+            )
+
+        # pair up the first companies of each guild as opponents
+        at_war = int(len(guild_companies) * scale.at_war_ratio) // 2 * 2
+        for first, second in zip(guild_companies[0:at_war:2], guild_companies[1:at_war:2]):
+            first.at_war = second.at_war = True
+            first.opponent_id, second.opponent_id = second.id, first.id
+
+        companies.extend(guild_companies)
+
+    async with db.begin() as session:
+        session.add_all(companies)
+
+    # members who are not in any company still chat and still have to be filtered out
+    for guild in guilds:
+        for n in range(max(scale.members_per_company, 1)):
+            lurker_id = LURKER_ID_BASE + (guild.id - GUILD_ID_BASE) * 1_000_000 + n
+            guild.add_member(FakeMember(guild, lurker_id, f"lurker-{n}"))
+
+    authors = [m for guild in guilds for m in guild.members]
+    total_messages = int(scale.messages_per_second * scale.duration)
+    messages = [
+        FakeMessage(
+            id=i,
+            author=rng.choice(authors),
+            content=_message_content(rng),
+            attachments=[
+                FakeAttachment(t) for t in rng.choices(ATTACHMENT_TYPES, k=rng.randint(0, 1))
+            ],
+        )
+        for i in range(total_messages)
+    ]
+
+    bot = FakeBot(db, Companies(db), guilds)
+    return BenchContext(scale, engine, db, bot, guilds, companies, messages)
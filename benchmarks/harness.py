@@ -0,0 +1,227 @@
+"""Timing, memory measurement and JSON reporting for benchmark scenarios"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+__all__ = (
+    "ScenarioResult",
+    "compare",
+    "measure_calls",
+    "measure_stream",
+    "percentiles",
+    "write_report",
+)
+
+# how many calls the tracemalloc pass makes; tracing allocations is far too slow to time with
+MEMORY_PASS_CALLS = 50
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    calls: int
+    errors: int
+    elapsed: float
+    throughput: float
+    latency_ms: Dict[str, float]
+    peak_memory_kb: float
+    error_types: Dict[str, int] = field(default_factory=dict)
+    extra: Dict[str, Any] = field(default_factory=dict)
+    # checks the scenario makes that did not hold, any of them fails the run
+    failures: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        lat = self.latency_ms
+        return (
+            f"{self.name:<45} {self.throughput:>12,.0f}/s  "
+            f"p50 {lat['p50']:>8.3f}ms  p99 {lat['p99']:>8.3f}ms  "
+            f"peak {self.peak_memory_kb:>9,.1f}KiB  errors {self.errors}"
+        )
+
+
+def percentiles(latencies: Sequence[float]) -> Dict[str, float]:
+    if not latencies:
+        return dict.fromkeys(("mean", "p50", "p90", "p99", "max"), 0.0)
+
+    ordered = sorted(latencies)
+
+    def pick(percent: float) -> float:
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": pick(50),
+        "p90": pick(90),
+        "p99": pick(99),
+        "max": ordered[-1],
+    }
+
+
+async def _peak_memory(op: Callable[[], Awaitable[Any]], calls: int) -> float:
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            try:
+                await op()
+            except Exception:
+                pass
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+async def measure_calls(
+    name: str, op: Callable[[], Awaitable[Any]], iterations: int, **extra: Any
+) -> ScenarioResult:
+    """Awaits `op` back to back and records the latency of each call"""
+    latencies: List[float] = []
+    errors: collections.Counter[str] = collections.Counter()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        try:
+            await op()
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - started
+
+    return ScenarioResult(
+        name=name,
+        calls=iterations,
+        errors=sum(errors.values()),
+        elapsed=elapsed,
+        throughput=iterations / elapsed if elapsed else 0.0,
+        latency_ms=percentiles(latencies),
+        peak_memory_kb=await _peak_memory(op, min(iterations, MEMORY_PASS_CALLS)),
+        error_types=dict(errors),
+        extra=extra,
+    )
+
+
+async def measure_stream(
+    name: str,
+    handler: Callable[[Any], Awaitable[Any]],
+    events: Sequence[Any],
+    rate: Optional[float],
+    **extra: Any,
+) -> ScenarioResult:
+    """Offers `events` to `handler` at `rate` events per second, or as fast as possible if None
+
+    Every event runs in its own task, the way the gateway dispatches listeners. Latency is taken
+    from when the event was due, so it includes any time spent waiting behind earlier events.
+    """
+    loop = asyncio.get_running_loop()
+    latencies: List[float] = []
+    errors: collections.Counter[str] = collections.Counter()
+
+    async def run(event: Any, due: float) -> None:
+        try:
+            await handler(event)
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append((loop.time() - due) * 1000)
+
+    tasks = []
+    started = loop.time()
+    for idx, event in enumerate(events):
+        due = started + idx / rate if rate else loop.time()
+        if (delay := due - loop.time()) > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(run(event, due)))
+
+        # yield so max-speed runs still interleave dispatch with handling
+        if not rate and idx % 100 == 0:
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+
+    # replay a burst of the stream with allocation tracing to find the peak
+    tracemalloc.start()
+    try:
+        await asyncio.gather(
+            *(handler(e) for e in events[: MEMORY_PASS_CALLS * 20]), return_exceptions=True
+        )
+        peak_memory_kb = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+    return ScenarioResult(
+        name=name,
+        calls=len(events),
+        errors=sum(errors.values()),
+        elapsed=elapsed,
+        throughput=len(events) / elapsed if elapsed else 0.0,
+        latency_ms=percentiles(latencies),
+        peak_memory_kb=peak_memory_kb,
+        error_types=dict(errors),
+        extra={"offered_rate": rate, **extra},
+    )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path: str, scale: Dict[str, Any], results: List[ScenarioResult]) -> None:
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "scale": scale,
+        },
+        "results": [asdict(r) for r in results],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def compare(baseline_path: str, candidate_path: str) -> str:
+    """Renders a table of throughput and latency changes between two reports"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    before = {r["name"]: r for r in baseline["results"]}
+    lines = [
+        f"{baseline['meta']['commit']} -> {candidate['meta']['commit']}",
+        f"{'scenario':<45} {'throughput':>12} {'p50':>9} {'p99':>9} {'peak mem':>9}",
+    ]
+
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    for result in candidate["results"]:
+        old = before.get(result["name"])
+        if old is None:
+            lines.append(f"{result['name']:<45} {'(new)':>12}")
+            continue
+
+        lines.append(
+            f"{result['name']:<45} "
+            f"{change(old['throughput'], result['throughput']):>12} "
+            f"{change(old['latency_ms']['p50'], result['latency_ms']['p50']):>9} "
+            f"{change(old['latency_ms']['p99'], result['latency_ms']['p99']):>9} "
+            f"{change(old['peak_memory_kb'], result['peak_memory_kb']):>9}"
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,119 @@
+"""Cold-start import cost of the bot, measured with `python -X importtime`
+
+Each run imports `dugs.__main__` and every extension in `dugs.cogs.MANIFEST` in a fresh
+interpreter. The check fails when the best run's total import time exceeds the budget, or when a
+module that is supposed to be imported lazily (see `dugs.utils.lazy_import`) shows up.
+"""
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.harness import ScenarioResult, percentiles
+
+__all__ = ("BUDGET_MS", "LAZY_MODULES", "ImportTime", "check_imports", "measure_imports")
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# total time spent importing modules; raise it deliberately, together with the change that needs it
+BUDGET_MS = 1000.0
+
+# modules only ever imported on first use; `thefuzz` itself is an empty package
+LAZY_MODULES = ("thefuzz.process", "thefuzz.fuzz", "Levenshtein", "rapidfuzz", "tabulate", "psutil")
+
+_IMPORT_SCRIPT = (
+    "import importlib, dugs.__main__, dugs.cogs\n"
+    "for extension in dugs.cogs.MANIFEST:\n"
+    "    importlib.import_module(extension)\n"
+)
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def _run() -> List[ImportTime]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _IMPORT_SCRIPT],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": str(ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if match := _LINE.match(line):
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append(ImportTime(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def measure_imports(runs: int = 3) -> Tuple[ScenarioResult, List[ImportTime]]:
+    """Imports the bot `runs` times and returns the timings plus the fastest run's modules"""
+    results = [_run() for _ in range(runs)]
+    totals = [sum(i.self_us for i in imports) / 1000 for imports in results]
+    best = results[totals.index(min(totals))]
+
+    by_package: Dict[str, float] = {}
+    for i in best:
+        package = i.module.split(".")[0]
+        by_package[package] = by_package.get(package, 0.0) + i.self_us / 1000
+
+    result = ScenarioResult(
+        name="startup.imports",
+        calls=runs,
+        errors=0,
+        elapsed=sum(totals) / 1000,
+        throughput=0.0,
+        latency_ms=percentiles(totals),
+        peak_memory_kb=0.0,
+        extra={
+            "best_ms": min(totals),
+            "modules": len(best),
+            "by_package_ms": dict(sorted(by_package.items(), key=lambda kv: -kv[1])[:15]),
+        },
+    )
+    return result, best
+
+
+def check_imports(result: ScenarioResult, imports: List[ImportTime], budget_ms: float) -> List[str]:
+    """Returns the reasons the import check failed, if any"""
+    problems = []
+
+    best = result.extra["best_ms"]
+    if best > budget_ms:
+        problems.append(f"imports took {best:.0f}ms, over the {budget_ms:.0f}ms budget")
+
+    eager = sorted(
+        {
+            i.module
+            for i in imports
+            for lazy in LAZY_MODULES
+            if i.module == lazy or i.module.startswith(f"{lazy}.")
+        }
+    )
+    if eager:
+        problems.append(f"lazily imported modules were imported at startup: {', '.join(eager)}")
+
+    return problems
+
+
+def format_report(imports: List[ImportTime], limit: int = 20) -> str:
+    heaviest = sorted(imports, key=lambda i: i.self_us, reverse=True)[:limit]
+    lines = [f"{'self':>9} {'cumulative':>11}  module"]
+    lines += [
+        f"{i.self_us / 1000:>7.1f}ms {i.cumulative_us / 1000:>9.1f}ms  {i.module}" for i in heaviest
+    ]
+    return "\n".join(lines)
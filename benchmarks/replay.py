@@ -0,0 +1,384 @@
+"""Replays recorded gateway traffic into a real `Dugs` instance with the REST layer stubbed
+
+Recordings come from `dugs.replay.GatewayRecorder` (set `GATEWAY_RECORD_FILE` on a running bot)
+or from `synthesize`, which turns the benchmark fixtures into a message-only recording together
+with a matching database.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import datetime
+import gzip
+import itertools
+import json
+import shutil
+import sys
+import tempfile
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+import disnake
+from disnake.ext import commands, tasks
+from disnake.webhook.async_ import async_context
+
+from benchmarks.fixtures import Scale, build_context
+from benchmarks.harness import ScenarioResult, percentiles
+from dugs import constants
+from dugs.bot import Dugs
+from dugs.database import Base
+from dugs.journal import InfluenceJournal
+from dugs.replay import SETUP_EVENTS, RecordedEvent, read_recording
+
+__all__ = ("ReplayBot", "StubREST", "replay", "synthesize")
+
+BOT_USER_ID = 999_999_999_999_999_999
+
+# when the event currently being dispatched was due, inherited by the listener tasks it spawns
+_due: ContextVar[float] = ContextVar("replay_due")
+
+_snowflakes = itertools.count(500_000_000_000_000_000)
+
+
+def _user_payload(id: int, name: str, bot: bool = False) -> Dict[str, Any]:
+    return {
+        "id": str(id),
+        "username": name,
+        "global_name": name,
+        "discriminator": "0",
+        "avatar": None,
+        "bot": bot,
+    }
+
+
+def _message_payload(channel_id: Any, content: str = "", **extra: Any) -> Dict[str, Any]:
+    return {
+        "id": str(next(_snowflakes)),
+        "channel_id": str(channel_id),
+        "author": _user_payload(BOT_USER_ID, "dugs", bot=True),
+        "content": content or "",
+        "timestamp": disnake.utils.utcnow().isoformat(),
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+        **extra,
+    }
+
+
+class StubREST:
+    """Answers REST calls with just enough of a payload for disnake to build its models"""
+
+    def __init__(self) -> None:
+        self.calls: collections.Counter[str] = collections.Counter()
+
+    async def request(self, route: Any, *, files: Any = None, form: Any = None, **kwargs: Any):
+        self.calls[f"{route.method} {route.path}"] += 1
+        payload = kwargs.get("json") or {}
+
+        if route.path.startswith("/channels/{channel_id}/messages"):
+            if route.method in ("POST", "PATCH"):
+                return _message_payload(route.channel_id, payload.get("content"))
+
+        if route.path == "/guilds/{guild_id}/roles" and route.method == "POST":
+            return {
+                "id": str(next(_snowflakes)),
+                "name": payload.get("name", "role"),
+                "color": payload.get("color", 0),
+                "hoist": False,
+                "position": 1,
+                "permissions": "0",
+                "managed": False,
+                "mentionable": False,
+            }
+
+        if route.path == "/users/@me/channels":
+            recipient = payload.get("recipient_id", 0)
+            return {
+                "id": str(next(_snowflakes)),
+                "type": 1,
+                "recipients": [_user_payload(recipient, "recipient")],
+            }
+
+        return None
+
+
+class StubWebhookAdapter:
+    """Stands in for the adapter interaction responses and followups are sent through"""
+
+    def __init__(self, rest: StubREST) -> None:
+        self.rest = rest
+
+    def __getattr__(self, name: str) -> Callable[..., Coroutine[Any, Any, Any]]:
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            self.rest.calls[f"webhook {name}"] += 1
+            if name.endswith("_message") or name == "execute_webhook":
+                return _message_payload(0)
+            return None
+
+        return call
+
+
+class ReplayBot(Dugs):
+    """`Dugs` that times each listener from when its event was due and counts listener errors"""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.latencies: Dict[str, List[float]] = collections.defaultdict(list)
+        self.errors: Dict[str, collections.Counter[str]] = collections.defaultdict(
+            collections.Counter
+        )
+        self.pending: set[asyncio.Task] = set()
+
+    def _schedule_event(self, coro: Any, event_name: str, *args: Any, **kwargs: Any):
+        task = super()._schedule_event(coro, event_name, *args, **kwargs)
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        return task
+
+    async def _run_event(self, coro: Any, event_name: str, *args: Any, **kwargs: Any) -> None:
+        await super()._run_event(coro, event_name, *args, **kwargs)
+        if (due := _due.get(None)) is not None:
+            self.latencies[event_name].append((asyncio.get_running_loop().time() - due) * 1000)
+
+    async def on_error(self, event_method: str, *args: Any, **kwargs: Any) -> None:
+        self.errors[event_method][sys.exc_info()[0].__name__] += 1
+
+    async def drain(self) -> None:
+        while self.pending:
+            await asyncio.gather(*list(self.pending), return_exceptions=True)
+        # the listeners only queued the activity they saw
+        await self.ingestion.join()
+
+    def stop_task_loops(self) -> None:
+        for cog in self.cogs.values():
+            for name, value in vars(type(cog)).items():
+                if isinstance(value, tasks.Loop):
+                    getattr(cog, name).cancel()
+
+
+async def replay(
+    recording: str, *, speed: Optional[float] = 1.0, database: Optional[str] = None
+) -> List[ScenarioResult]:
+    """Feeds a recording through a fresh bot's gateway parsers
+
+    `speed` scales the recorded inter-event gaps: 1.0 is real time, 10.0 is ten times faster and
+    None replays as fast as possible. `database` is copied and used as the bot's database;
+    otherwise the bot starts with an empty one.
+    """
+    events: List[RecordedEvent] = list(read_recording(recording))
+    setup = [e for e in events if e.type in SETUP_EVENTS]
+    traffic = [e for e in events if e.type not in SETUP_EVENTS]
+    loop = asyncio.get_running_loop()
+    rest = StubREST()
+
+    with tempfile.TemporaryDirectory(prefix="dugs-replay-") as directory:
+        db_file = Path(directory) / "replay.db"
+        if database:
+            shutil.copyfile(database, db_file)
+        constants.Database.sqlite_bind = f"sqlite+aiosqlite:///{db_file}"
+
+        async_context.set(StubWebhookAdapter(rest))
+        bot = ReplayBot(
+            intents=disnake.Intents.all(),
+            chunk_guilds_at_startup=False,
+            guild_ready_timeout=0,
+            command_sync_flags=commands.CommandSyncFlags.none(),
+        )
+        bot.http.request = rest.request
+        # always warm from the database and leave no snapshot behind
+        bot.snapshot_path = None
+        bot.companies.journal = InfluenceJournal(Path(directory) / "influence.journal")
+
+        try:
+            if not database:
+                async with bot.db_engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+
+            await bot.load_extensions()
+
+            # the cache warms while the guilds arrive, the way it does during a real startup
+            warmup = asyncio.create_task(bot.warm_cache())
+
+            parsers = bot._connection.parsers
+            for event in setup:
+                parsers[event.type](event.data)
+            await asyncio.wait_for(bot.wait_until_ready(), timeout=30)
+            await warmup
+
+            bot.loop_monitor.start()
+            first_ts = traffic[0].timestamp if traffic else 0.0
+            started = loop.time()
+
+            for idx, event in enumerate(traffic):
+                due = started + (event.timestamp - first_ts) / speed if speed else loop.time()
+                if (delay := due - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+
+                token = _due.set(due)
+                try:
+                    parsers[event.type](event.data)
+                finally:
+                    _due.reset(token)
+
+                if not speed and idx % 100 == 0:
+                    await asyncio.sleep(0)
+
+            await bot.drain()
+            elapsed = loop.time() - started
+        finally:
+            bot.stop_task_loops()
+            await bot.close()
+            await bot.db_engine.dispose()
+
+    counts = collections.Counter(e.type for e in traffic)
+    common = {
+        "speed": speed,
+        "recording": str(recording),
+        "events": dict(counts),
+        "rest_calls": dict(rest.calls),
+        "loop_lag": bot.loop_monitor.histogram.to_dict(),
+        "ingestion": bot.ingestion.stats(),
+    }
+    results = [
+        ScenarioResult(
+            name="replay.total",
+            calls=len(traffic),
+            errors=sum(sum(c.values()) for c in bot.errors.values()),
+            elapsed=elapsed,
+            throughput=len(traffic) / elapsed if elapsed else 0.0,
+            latency_ms=percentiles([lat for lats in bot.latencies.values() for lat in lats]),
+            peak_memory_kb=0.0,
+            extra=common,
+        )
+    ]
+    for event_name, latencies in sorted(bot.latencies.items()):
+        results.append(
+            ScenarioResult(
+                name=f"replay.{event_name}",
+                calls=len(latencies),
+                errors=sum(bot.errors[event_name].values()),
+                elapsed=elapsed,
+                throughput=len(latencies) / elapsed if elapsed else 0.0,
+                latency_ms=percentiles(latencies),
+                peak_memory_kb=0.0,
+                error_types=dict(bot.errors[event_name]),
+            )
+        )
+
+    return results
+
+
+async def synthesize(scale: Scale, directory: Path) -> Path:
+    """Writes `recording.jsonl.gz` and a matching `bench.db` built from the benchmark fixtures
+
+    The recording holds a READY, a GUILD_CREATE per guild and the fixture message stream spaced
+    at the scale's messages per second.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    ctx = await build_context(scale, directory)
+    await ctx.close()
+
+    joined_at = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc).isoformat()
+    path = directory / "recording.jsonl.gz"
+
+    def member_payload(member: Any) -> Dict[str, Any]:
+        return {
+            "user": _user_payload(member.id, member.name),
+            "roles": [str(r) for r in member._roles],
+            "joined_at": joined_at,
+            "deaf": False,
+            "mute": False,
+        }
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+
+        def write(event: str, timestamp: float, data: Dict[str, Any]) -> None:
+            f.write(json.dumps({"t": event, "ts": timestamp, "d": data}))
+            f.write("\n")
+
+        write(
+            "READY",
+            0.0,
+            {
+                "v": 10,
+                "user": _user_payload(BOT_USER_ID, "dugs", bot=True),
+                "guilds": [{"id": str(g.id), "unavailable": True} for g in ctx.guilds],
+                "session_id": "replay",
+                "resume_gateway_url": "",
+                "application": {"id": str(BOT_USER_ID), "flags": 0},
+            },
+        )
+
+        for guild in ctx.guilds:
+            roles = [guild.default_role, *guild.roles]
+            write(
+                "GUILD_CREATE",
+                0.0,
+                {
+                    "id": str(guild.id),
+                    "name": guild.name,
+                    "unavailable": False,
+                    "owner_id": str(BOT_USER_ID),
+                    "member_count": guild.member_count,
+                    "roles": [
+                        {
+                            "id": str(r.id),
+                            "name": r.name,
+                            "color": int(r.color),
+                            "hoist": False,
+                            "position": r.position,
+                            "permissions": "0",
+                            "managed": False,
+                            "mentionable": False,
+                        }
+                        for r in roles
+                    ],
+                    "channels": [
+                        {
+                            "id": str(c.id),
+                            "type": 0,
+                            "name": c.name,
+                            "position": 0,
+                            "permission_overwrites": [],
+                        }
+                        for c in guild.text_channels
+                    ],
+                    "members": [member_payload(m) for m in guild.members],
+                    "emojis": [],
+                    "stickers": [],
+                    "features": [],
+                    "threads": [],
+                    "voice_states": [],
+                    "presences": [],
+                },
+            )
+
+        for idx, message in enumerate(ctx.messages):
+            data = _message_payload(
+                message.channel.id,
+                message.content,
+                guild_id=str(message.guild.id),
+                author=_user_payload(message.author.id, message.author.name),
+                member={k: v for k, v in member_payload(message.author).items() if k != "user"},
+                attachments=[
+                    {
+                        "id": str(next(_snowflakes)),
+                        "filename": "upload",
+                        "size": 1,
+                        "url": "https://cdn.invalid/upload",
+                        "proxy_url": "https://cdn.invalid/upload",
+                        **({"content_type": a.content_type} if a.content_type else {}),
+                    }
+                    for a in message.attachments
+                ],
+            )
+            write("MESSAGE_CREATE", 1.0 + idx / scale.messages_per_second, data)
+
+    return path
@@ -0,0 +1,814 @@
+"""Benchmark scenarios for the cache, the scoring path and the cogs' hot loops
+
+Each scenario is an async function taking the shared `BenchContext` and an iteration count and
+returning a `ScenarioResult`. Register new ones with the `scenario` decorator.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import disnake
+from sqlalchemy import Select, bindparam, event, func, select
+
+from benchmarks.fakes import FakeThread
+from benchmarks.fixtures import BenchContext
+from benchmarks.harness import ScenarioResult, measure_calls, measure_stream
+from dugs import companies as companies_module
+from dugs import (
+    constants,
+    enums,
+    ingest,
+    lanes,
+    ratelimit,
+    scoring,
+    snapshot,
+    statement_cache,
+    unit_of_work,
+)
+from dugs.database import Company, InfluenceBucket, Member
+from dugs.journal import InfluenceJournal
+from dugs.cogs.events import Events
+from dugs.cogs.leaderboard import Leaderboard
+from dugs.cogs.tasks import Tasks
+
+__all__ = ("SCENARIOS", "scenario")
+
+ScenarioFunc = Callable[[BenchContext, int], Awaitable[ScenarioResult]]
+
+SCENARIOS: Dict[str, ScenarioFunc] = {}
+
+
+def scenario(name: str) -> Callable[[ScenarioFunc], ScenarioFunc]:
+    def decorator(func: ScenarioFunc) -> ScenarioFunc:
+        SCENARIOS[name] = func
+        return func
+
+    return decorator
+
+
+def _cycle(iterable):
+    return itertools.cycle(list(iterable)).__next__
+
+
+async def fill_cache(ctx: BenchContext) -> None:
+    """Warms `Companies` the same way the bot does during startup"""
+    await ctx.bot.companies.warm()
+
+
+@scenario("companies.warm")
+async def warm(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    companies = ctx.bot.companies
+
+    async def op() -> None:
+        companies._cache.clear()
+        companies._at_war.clear()
+        await fill_cache(ctx)
+
+    return await measure_calls("companies.warm", op, max(iterations // 50, 5))
+
+
+@scenario("companies.load_snapshot")
+async def load_snapshot(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """A warm restart: the same cache as `companies.warm`, restored from a snapshot"""
+    companies = ctx.bot.companies
+    stamp = "bench"
+    path = Path(ctx.engine.url.database).with_name("bench.snapshot")
+    data = companies.dump_snapshot(stamp)
+    snapshot.write(path, data)
+
+    async def op() -> None:
+        companies._cache.clear()
+        companies._at_war.clear()
+        companies.load_snapshot(path, stamp)
+
+    return await measure_calls(
+        "companies.load_snapshot", op, max(iterations // 50, 5), snapshot_kb=len(data) / 1024
+    )
+
+
+@scenario("companies.get_guild_companies")
+async def get_guild_companies(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_guild = _cycle(ctx.guilds)
+
+    async def op() -> None:
+        await ctx.bot.companies.get_guild_companies(next_guild().id)
+
+    return await measure_calls("companies.get_guild_companies", op, iterations)
+
+
+@scenario("companies.get_guild_companies[cold]")
+async def get_guild_companies_cold(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_guild = _cycle(ctx.guilds)
+    companies = ctx.bot.companies
+
+    async def op() -> None:
+        guild_id = next_guild().id
+        cached = companies._cache.pop(guild_id, None)
+        # otherwise a guild missing from the cache has no companies
+        complete, companies._complete = companies._complete, False
+        try:
+            await companies.get_guild_companies(guild_id)
+        finally:
+            companies._complete = complete
+            if cached is not None:
+                companies._cache[guild_id] = cached
+
+    return await measure_calls("companies.get_guild_companies[cold]", op, max(iterations // 10, 10))
+
+
+@scenario("companies.get_company")
+async def get_company(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_company = _cycle(ctx.companies)
+
+    async def op() -> None:
+        company = next_company()
+        await ctx.bot.companies.get_company(company.guild_id, company.id)
+
+    return await measure_calls("companies.get_company", op, iterations)
+
+
+@scenario("companies.get_company_named")
+async def get_company_named(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_company = _cycle(ctx.companies)
+
+    async def op() -> None:
+        company = next_company()
+        await ctx.bot.companies.get_company_named(company.guild_id, company.name)
+
+    return await measure_calls("companies.get_company_named", op, iterations)
+
+
+@scenario("companies.get_member_company")
+async def get_member_company(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_member = _cycle(m for g in ctx.guilds for role in g.roles for m in role.members)
+
+    async def op() -> None:
+        member = next_member()
+        await ctx.bot.companies.get_member_company(member.guild.id, member)
+
+    return await measure_calls("companies.get_member_company", op, iterations)
+
+
+@scenario("companies.get_member_company[any]")
+async def get_member_company_any(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """Any member of the guild, including the ones without a company"""
+    next_member = _cycle(m for g in ctx.guilds for m in g.members)
+
+    async def op() -> None:
+        member = next_member()
+        await ctx.bot.companies.get_member_company(member.guild.id, member)
+
+    return await measure_calls("companies.get_member_company[any]", op, iterations)
+
+
+@scenario("companies.find_role_drift")
+async def find_role_drift(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_guild = _cycle(ctx.guilds)
+
+    async def op() -> None:
+        ctx.bot.companies.find_role_drift(next_guild())
+
+    return await measure_calls("companies.find_role_drift", op, iterations)
+
+
+@scenario("companies.get_companies_at_war")
+async def get_companies_at_war(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_guild = _cycle(ctx.guilds)
+
+    async def op() -> None:
+        await ctx.bot.companies.get_companies_at_war(next_guild().id)
+
+    return await measure_calls("companies.get_companies_at_war", op, iterations)
+
+
+@scenario("companies.get_guild_view")
+async def get_guild_view(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    next_guild = _cycle(ctx.guilds)
+
+    async def op() -> None:
+        await ctx.bot.companies.get_guild_view(next_guild().id)
+
+    return await measure_calls("companies.get_guild_view", op, iterations)
+
+
+@scenario("companies.publish_view")
+async def publish_view(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """Building a guild's view again, what every change to the guild adds"""
+    next_guild = _cycle(ctx.guilds)
+    companies = ctx.bot.companies
+
+    async def op() -> None:
+        companies._publish(next_guild().id)
+
+    return await measure_calls("companies.publish_view", op, iterations)
+
+
+@scenario("companies.query_counts")
+async def query_counts(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """Each read of `Companies` with nothing cached, one after the other
+
+    The statements each read runs and the rows they return are reported per method. Rows are
+    counted by running every SELECT again as `SELECT count(*) FROM (...)`.
+    """
+    companies = ctx.bot.companies
+    company = ctx.companies[0]
+    guild = next(g for g in ctx.guilds if g.id == company.guild_id)
+    member = next(m for role in guild.roles for m in role.members)
+    reads = {
+        "warm": companies.warm,
+        "get_guild_companies": lambda: companies.get_guild_companies(guild.id),
+        "get_company_summaries": lambda: companies.get_company_summaries(guild.id),
+        "get_company": lambda: companies.get_company(guild.id, company.id),
+        "get_company_named": lambda: companies.get_company_named(guild.id, company.name),
+        "get_member_company": lambda: companies.get_member_company(guild.id, member),
+        "get_companies_at_war": lambda: companies.get_companies_at_war(guild.id),
+    }
+    statements: List[Tuple[str, Any]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append((statement, parameters))
+
+    async def op() -> None:
+        for read in reads.values():
+            companies._cache.clear()
+            companies._at_war.clear()
+            companies._complete = False
+            await read()
+
+    counts = {}
+    engine = ctx.engine.sync_engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with sqlite3.connect(ctx.engine.url.database) as conn:
+            for name, read in reads.items():
+                companies._cache.clear()
+                companies._at_war.clear()
+                companies._complete = False
+                statements.clear()
+                await read()
+                rows = sum(
+                    conn.execute(f"SELECT count(*) FROM ({statement})", parameters).fetchone()[0]
+                    for statement, parameters in statements
+                    if statement.lstrip().upper().startswith("SELECT")
+                )
+                counts[name] = {"queries": len(statements), "rows": rows}
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    try:
+        return await measure_calls("companies.query_counts", op, max(iterations // 50, 5), **counts)
+    finally:
+        await fill_cache(ctx)
+
+
+async def _statements(ctx: BenchContext, name: str, iterations: int, prebuilt: bool):
+    """A company looked up by name, with the statement built per call or built once
+
+    The lookup `get_company_named` makes when the company is not cached. The engine's compiled
+    cache is hit either way; what differs is building the statement and its cache key.
+    """
+    next_company = _cycle(ctx.companies)
+    stats = statement_cache.CompiledCacheStats(ctx.engine)
+
+    def build() -> Select:
+        return (
+            select(Company)
+            .where(Company.guild_id == bindparam("guild_id"), Company.name == bindparam("name"))
+            .options(*companies_module._company_loads)
+        )
+
+    async def op() -> None:
+        company = next_company()
+        statement = companies_module._named_company if prebuilt else build()
+        async with ctx.db() as session:
+            result = await session.execute(
+                statement, {"guild_id": company.guild_id, "name": company.name}
+            )
+            result.scalar_one()
+
+    try:
+        result = await measure_calls(name, op, max(iterations // 10, 10))
+    finally:
+        stats.close()
+
+    # what is left of the difference without the database: the statement and its cache key,
+    # which the engine builds on every execute to look the compiled form up
+    rounds = 1000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        statement = companies_module._named_company if prebuilt else build()
+        statement._generate_cache_key()
+    result.extra.update(
+        stats.stats(), statement_us=(time.perf_counter() - started) / rounds * 1_000_000
+    )
+    return result
+
+
+@scenario("companies.statements[built]")
+async def statements_built(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    return await _statements(ctx, "companies.statements[built]", iterations, prebuilt=False)
+
+
+@scenario("companies.statements[prebuilt]")
+async def statements_prebuilt(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    return await _statements(ctx, "companies.statements[prebuilt]", iterations, prebuilt=True)
+
+
+# the most statements and commits one member flow may take, outside and inside a unit of work
+MEMBER_FLOW_BUDGET = {False: (3, 3), True: (3, 1)}
+
+
+async def _member_flow(
+    ctx: BenchContext, name: str, iterations: int, scoped: bool
+) -> ScenarioResult:
+    """A member joining a company, the company being updated and the member leaving again
+
+    The Companies calls of the join and leave commands. The statements and commits of one flow are
+    counted on the engine and reported as `queries_per_flow` and `commits_per_flow`; more than
+    `MEMBER_FLOW_BUDGET` allows fails the run, as does the member's row outliving the flow.
+    """
+    await fill_cache(ctx)
+    companies = ctx.bot.companies
+    next_company = _cycle(ctx.companies)
+    member_ids = itertools.count(900_000_000_000_000_000)
+    counts = {"queries": 0, "commits": 0}
+    flowed: List[int] = []
+
+    def count_query(*args: Any) -> None:
+        counts["queries"] += 1
+
+    def count_commit(*args: Any) -> None:
+        counts["commits"] += 1
+
+    async def flow() -> None:
+        company = next_company()
+        member_id = next(member_ids)
+        flowed.append(member_id)
+        company = await companies.get_company(company.guild_id, company.id)
+        await companies.add_company_member(
+            Member(member_id=member_id, company_id=company.id, type=enums.RoleType.Private)
+        )
+        await companies.update_company(company.guild_id, company)
+        await companies.remove_company_member(company.id, member_id)
+        await companies.get_company(company.guild_id, company.id)
+
+    async def op() -> None:
+        if not scoped:
+            return await flow()
+        async with unit_of_work.scope(ctx.db):
+            await flow()
+
+    engine = ctx.engine.sync_engine
+    event.listen(engine, "before_cursor_execute", count_query)
+    event.listen(engine, "commit", count_commit)
+    try:
+        await op()
+    finally:
+        event.remove(engine, "before_cursor_execute", count_query)
+        event.remove(engine, "commit", count_commit)
+
+    result = await measure_calls(
+        name,
+        op,
+        max(iterations // 10, 10),
+        queries_per_flow=counts["queries"],
+        commits_per_flow=counts["commits"],
+    )
+
+    queries, commits = MEMBER_FLOW_BUDGET[scoped]
+    if counts["queries"] > queries:
+        result.failures.append(f"{counts['queries']} statements per flow, the budget is {queries}")
+    if counts["commits"] > commits:
+        result.failures.append(f"{counts['commits']} commits per flow, the budget is {commits}")
+    async with ctx.db() as session:
+        left = await session.scalar(select(func.count()).where(Member.member_id.in_(flowed)))
+    if left:
+        result.failures.append(f"{left} members were still on their company after leaving it")
+    if result.errors:
+        result.failures.append(f"{result.errors} flows raised {result.error_types}")
+    return result
+
+
+@scenario("companies.member_flow")
+async def member_flow(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    return await _member_flow(ctx, "companies.member_flow", iterations, scoped=False)
+
+
+@scenario("companies.member_flow[unit_of_work]")
+async def member_flow_unit_of_work(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """The same flow in a single unit of work, as a command runs it"""
+    return await _member_flow(ctx, "companies.member_flow[unit_of_work]", iterations, scoped=True)
+
+
+@scenario("companies.archive_rejoin")
+async def archive_rejoin(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """The bot leaving a guild, a member joining a company elsewhere, and the bot rejoining
+
+    The guild with the newest member rows is archived, so the new member's row takes the id one of
+    its members had. Each round checks the guild comes back with every member and its influence
+    history, that neither is left in the live tables while it is archived, and that the new member
+    is kept. The guild's wars, which rejoining ends, are put back afterwards.
+    """
+    await fill_cache(ctx)
+    companies = ctx.bot.companies
+    guild = ctx.guilds[-1]
+    elsewhere = next(c for c in ctx.companies if c.guild_id != guild.id)
+    member_ids = itertools.count(910_000_000_000_000_000)
+    table = Company.__table__
+    buckets = InfluenceBucket.__table__
+    failures = []
+
+    async def live_rows(guild_id: int) -> Tuple[int, int]:
+        async with ctx.db() as session:
+            members = await session.scalar(
+                select(func.count())
+                .select_from(Member)
+                .join(Company, Member.company_id == Company.id)
+                .where(Company.guild_id == guild_id)
+            )
+            history = await session.scalar(
+                select(func.count()).select_from(buckets).where(buckets.c.guild_id == guild_id)
+            )
+        return members, history
+
+    async def roster(guild_id: int) -> List[Tuple[int, int, enums.RoleType]]:
+        return sorted(
+            (m.company_id, m.member_id, m.type)
+            for c in await companies.get_guild_companies(guild_id)
+            for m in c.members
+        )
+
+    # some history to move along with the companies
+    first = ctx.companies[-1]
+    await companies.add_influence(guild.id, first.id, first.members[0].member_id, 1)
+    await companies.flush_influence()
+    members = await roster(guild.id)
+    history = (await live_rows(guild.id))[1]
+    async with ctx.db() as session:
+        result = await session.execute(
+            select(table.c.id, table.c.at_war, table.c.opponent_id, table.c.war_expires_at).where(
+                table.c.guild_id == guild.id
+            )
+        )
+        wars = result.all()
+
+    async def op() -> None:
+        member_id = next(member_ids)
+        await companies.depart_guild(guild.id, 0)
+        await companies.archive_guild(guild.id)
+        if await live_rows(guild.id) != (0, 0):
+            failures.append(f"guild {guild.id} left rows in the live tables once archived")
+        await companies.add_company_member(
+            Member(member_id=member_id, company_id=elsewhere.id, type=enums.RoleType.Private)
+        )
+        try:
+            await companies.rejoin_guild(guild.id)
+            if await roster(guild.id) != members:
+                failures.append(f"guild {guild.id} came back with different members")
+            if (await live_rows(guild.id))[1] != history:
+                failures.append(f"guild {guild.id} came back with different influence history")
+            company = await companies.get_company(elsewhere.guild_id, elsewhere.id)
+            if company.get_member(member_id) is None:
+                failures.append(f"member {member_id} of company {elsewhere.id} was lost")
+        finally:
+            await companies.remove_company_member(elsewhere.id, member_id)
+
+    try:
+        result = await measure_calls(
+            "companies.archive_rejoin", op, max(iterations // 100, 5), members=len(members)
+        )
+    finally:
+        async with ctx.db.begin() as session:
+            await session.execute(
+                table.update()
+                .where(table.c.id == bindparam("company"))
+                .values(
+                    at_war=bindparam("war"),
+                    opponent_id=bindparam("opponent"),
+                    war_expires_at=bindparam("expires"),
+                ),
+                [
+                    {"company": i, "war": war, "opponent": opponent, "expires": expires}
+                    for i, war, opponent, expires in wars
+                ],
+            )
+        companies._cache.clear()
+        companies._at_war.clear()
+        await fill_cache(ctx)
+
+    if result.errors:
+        failures.append(f"{result.errors} rounds raised {result.error_types}")
+    # the same failure every round is reported once
+    result.failures.extend(dict.fromkeys(failures))
+    return result
+
+
+SETTLE_BATCH = 16
+
+
+async def _settle_influence(ctx: BenchContext, name: str, iterations: int, stale: bool):
+    """`SETTLE_BATCH` companies settling their wars at once, each in its own transaction
+
+    With `stale` every row is changed behind the cache first, as another process would, so each
+    compare-and-swap conflicts once and is retried. Conflicts per batch are reported as
+    `conflicts_per_batch`. The companies' influence is put back afterwards.
+    """
+    await fill_cache(ctx)
+    companies = ctx.bot.companies
+    next_company = _cycle([await companies.get_company(c.guild_id, c.id) for c in ctx.companies])
+    table = Company.__table__
+    saved = {}
+    batches = 0
+    conflicts = companies.conflicts
+
+    async def op() -> None:
+        nonlocal batches
+        batch = [next_company() for _ in range(SETTLE_BATCH)]
+        for company in batch:
+            saved.setdefault(company.id, (company, company.influence, company.total_influence))
+            company.influence += 1
+        if stale:
+            async with ctx.db.begin() as session:
+                await session.execute(
+                    table.update()
+                    .where(table.c.id.in_([c.id for c in batch]))
+                    .values(version=table.c.version + 1)
+                )
+        await asyncio.gather(*(companies.settle_influence(c) for c in batch))
+        batches += 1
+
+    try:
+        result = await measure_calls(name, op, max(iterations // 10, 10))
+    finally:
+        async with ctx.db.begin() as session:
+            await session.execute(
+                table.update()
+                .where(table.c.id == bindparam("company"))
+                .values(influence=bindparam("influence"), total_influence=bindparam("total")),
+                [{"company": i, "influence": v, "total": t} for i, (_, v, t) in saved.items()],
+            )
+        for company, influence, total in saved.values():
+            company.influence, company.total_influence = influence, total
+
+    result.extra["conflicts_per_batch"] = (companies.conflicts - conflicts) / max(batches, 1)
+    return result
+
+
+@scenario("companies.settle_influence")
+async def settle_influence(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    return await _settle_influence(ctx, "companies.settle_influence", iterations, stale=False)
+
+
+@scenario("companies.settle_influence[stale]")
+async def settle_influence_stale(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    return await _settle_influence(ctx, "companies.settle_influence[stale]", iterations, stale=True)
+
+
+LANE_BATCH = 64
+# how long each change holds its lane, standing in for a database round trip
+LANE_HOLD = 0.001
+
+
+async def _guild_lanes(ctx: BenchContext, name: str, iterations: int, guilds: int):
+    """`LANE_BATCH` changes arriving at once, spread over `guilds` guilds
+
+    Changes to different guilds overlap, those to one guild queue behind each other. The lanes'
+    metrics are reported in `extra`.
+    """
+    guild_lanes = lanes.GuildLanes()
+
+    async def change(guild_id: int) -> None:
+        async with guild_lanes.lane(guild_id):
+            await asyncio.sleep(LANE_HOLD)
+
+    async def op() -> None:
+        await asyncio.gather(*(change(i % guilds) for i in range(LANE_BATCH)))
+
+    result = await measure_calls(name, op, max(iterations // 50, 10))
+    result.extra.update(guild_lanes.stats())
+    return result
+
+
+@scenario("lanes.spread")
+async def guild_lanes_spread(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    return await _guild_lanes(ctx, "lanes.spread", iterations, guilds=LANE_BATCH)
+
+
+@scenario("lanes.one_guild")
+async def guild_lanes_one_guild(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    return await _guild_lanes(ctx, "lanes.one_guild", iterations, guilds=1)
+
+
+@scenario("events.calculate_influence")
+async def calculate_influence(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    cog = Events(ctx.bot)
+    next_message = _cycle(ctx.messages)
+
+    async def op() -> None:
+        cog.calculate_influence(next_message())
+
+    return await measure_calls("events.calculate_influence", op, iterations * 10)
+
+
+SCORING_BATCH = 64
+
+
+@scenario("scoring.score_messages")
+async def score_messages(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    scorer = scoring.Scorer(scoring.RuleSet())
+    messages = list(ctx.messages)
+    batches = _cycle(
+        messages[start : start + SCORING_BATCH] for start in range(0, len(messages), SCORING_BATCH)
+    )
+
+    async def op() -> None:
+        scorer.score_messages(batches())
+
+    result = await measure_calls("scoring.score_messages", op, iterations, batch=SCORING_BATCH)
+    result.extra["messages_per_second"] = result.throughput * SCORING_BATCH
+    return result
+
+
+@scenario("events.on_message")
+async def on_message(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    cog = Events(ctx.bot)
+
+    return await _ingest_stream(
+        ctx,
+        "events.on_message",
+        cog,
+        cog.on_message,
+        ctx.messages,
+        ctx.scale.messages_per_second,
+    )
+
+
+async def _ingest_stream(
+    ctx: BenchContext,
+    name: str,
+    cog: Events,
+    handler: Callable[[Any], Awaitable[Any]],
+    events: Sequence[Any],
+    rate: Optional[float],
+) -> ScenarioResult:
+    """Streams `events` to one of the cog's listeners with a fresh ingestion queue draining them
+
+    The listeners only enqueue, so the stream's latency is the cost on the gateway task; how long
+    the queue took to catch up once the stream ended is reported as `drain_ms`.
+    """
+    ingestion = ctx.bot.ingestion = ingest.IngestionQueue(
+        constants.Ingestion.queue_size,
+        constants.Ingestion.batch_size,
+        constants.Ingestion.batch_delay,
+    )
+    ingestion.start(cog.credit_batch)
+    try:
+        result = await measure_stream(name, handler, events, rate)
+        started = time.perf_counter()
+        await ingestion.join()
+        drain_ms = (time.perf_counter() - started) * 1000
+    finally:
+        await ingestion.stop()
+
+    stats = ingestion.stats()
+    result.extra.update(
+        drain_ms=drain_ms,
+        batches=stats["batches"],
+        mean_batch=stats["handled"] / stats["batches"] if stats["batches"] else 0.0,
+        max_depth=stats["max_depth"],
+        queue_dropped=stats["dropped"],
+        batch_failures=stats["failed"],
+    )
+    if (limiter := cog.influence_limiter) is not None:
+        result.extra.update(rate_limited=limiter.dropped, rate_limit_members=len(limiter))
+    return result
+
+
+@scenario("events.on_raw_reaction_add")
+async def on_raw_reaction_add(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """One reaction per message of the stream, offered as fast as the handler takes them"""
+    cog = Events(ctx.bot)
+    emoji = disnake.PartialEmoji(name="\N{THUMBS UP SIGN}")
+    payloads = []
+    for message in ctx.messages:
+        payload = disnake.RawReactionActionEvent(
+            {
+                "message_id": message.id,
+                "channel_id": message.channel.id,
+                "user_id": message.author.id,
+                "guild_id": message.guild.id,
+            },
+            emoji,
+            "REACTION_ADD",
+        )
+        payload.member = message.author
+        payloads.append(payload)
+
+    return await _ingest_stream(
+        ctx, "events.on_raw_reaction_add", cog, cog.on_raw_reaction_add, payloads, None
+    )
+
+
+@scenario("events.on_thread_create")
+async def on_thread_create(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """One new thread per message of the stream, offered as fast as the handler takes them"""
+    cog = Events(ctx.bot)
+    threads = [FakeThread(message.id, message.author) for message in ctx.messages]
+
+    return await _ingest_stream(
+        ctx, "events.on_thread_create", cog, cog.on_thread_create, threads, None
+    )
+
+
+@scenario("ratelimit.token_buckets")
+async def token_buckets(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """Members spread over more ids than there are slots, so slots keep being reused"""
+    capacity = 200_000
+    limiter = ratelimit.TokenBuckets(rate=0.2, burst=5, capacity=capacity)
+    members = itertools.cycle(range(capacity * 3 // 2)).__next__
+    clock = itertools.count(0, 0.001).__next__
+
+    async def op() -> None:
+        limiter.allow(members(), clock())
+
+    result = await measure_calls("ratelimit.token_buckets", op, max(iterations * 100, capacity))
+    result.extra.update(
+        members=len(limiter), evicted=limiter.evicted, dropped=limiter.dropped, capacity=capacity
+    )
+    return result
+
+
+@scenario("events.on_message_journaled")
+async def on_message_journaled(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    """`events.on_message` with every increment group-committed to an influence journal"""
+    cog = Events(ctx.bot)
+    companies = ctx.bot.companies
+    journal = InfluenceJournal(Path(ctx.engine.url.database).with_name("bench.journal"))
+    await asyncio.to_thread(journal.open, 0)
+    companies.journal = journal
+
+    try:
+        result = await _ingest_stream(
+            ctx,
+            "events.on_message_journaled",
+            cog,
+            cog.on_message,
+            ctx.messages,
+            ctx.scale.messages_per_second,
+        )
+        flushed = await companies.flush_influence()
+    finally:
+        companies.journal = None
+        await journal.close()
+
+    result.extra.update(
+        syncs=journal.syncs,
+        records_per_sync=journal.synced_records / journal.syncs if journal.syncs else 0.0,
+        companies_flushed=flushed,
+    )
+    return result
+
+
+@scenario("leaderboard.ranked_companies_strings")
+async def ranked_companies_strings(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    cog = Leaderboard(ctx.bot)
+    next_guild = _cycle(ctx.guilds)
+    companies = ctx.bot.companies
+
+    async def op() -> None:
+        cog.ranked_companies_strings(await companies.get_company_summaries(next_guild().id))
+
+    return await measure_calls("leaderboard.ranked_companies_strings", op, iterations)
+
+
+@scenario("leaderboard.leaderboard_embed")
+async def leaderboard_embed(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    cog = Leaderboard(ctx.bot)
+    next_guild = _cycle(ctx.guilds)
+    companies = ctx.bot.companies
+
+    async def op() -> None:
+        cog.leaderboard_embed(await companies.get_company_summaries(next_guild().id))
+
+    return await measure_calls("leaderboard.leaderboard_embed", op, iterations)
+
+
+@scenario("tasks.check_war_complete")
+async def check_war_complete(ctx: BenchContext, iterations: int) -> ScenarioResult:
+    cog = Tasks(ctx.bot)
+    try:
+        return await measure_calls(
+            "tasks.check_war_complete",
+            lambda: cog.check_war_complete.coro(cog),
+            max(iterations // 50, 5),
+        )
+    finally:
+        cog.check_war_complete.cancel()
+        cog.save_cache_snapshot.cancel()
+        cog.flush_influence.cancel()
+        cog.roll_up_influence_history.cancel()
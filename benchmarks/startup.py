@@ -0,0 +1,128 @@
+"""Measures the time from process start to gateway connect for `python -m dugs`
+
+Every run starts a fresh interpreter that runs `dugs.__main__.main` with `Dugs.login` and
+`Dugs.connect` replaced, so it stops where it would open the gateway connection, once the cache
+that is warmed alongside the handshake is ready. Runs
+alternate between an empty database, which has to be migrated, and the already-migrated database
+left behind by the previous run.
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.harness import ScenarioResult, percentiles
+
+__all__ = ("measure_startup",)
+
+ROOT = Path(__file__).resolve().parent.parent
+PHASES = ("imports", "extensions", "connect", "database", "warm")
+
+
+def _child(started: float) -> None:
+    import asyncio
+
+    marks: Dict[str, Any] = {}
+
+    def mark(phase: str) -> None:
+        marks[phase] = (time.time() - started) * 1000
+
+    import dugs.__main__ as entry
+    from dugs import migrations
+    from dugs.bot import Dugs
+
+    mark("imports")
+
+    prepare_database = migrations.prepare_database
+    load_extensions = Dugs.load_extensions
+
+    async def timed_prepare_database(*args: Any, **kwargs: Any) -> None:
+        await prepare_database(*args, **kwargs)
+        mark("database")
+
+    async def timed_load_extensions(self: Dugs, *args: Any, **kwargs: Any) -> None:
+        await load_extensions(self, *args, **kwargs)
+        mark("extensions")
+
+    async def login(self: Dugs, token: str) -> None:
+        pass
+
+    async def connect(self: Dugs, **kwargs: Any) -> None:
+        mark("connect")
+        marks["alembic_imported"] = "alembic" in sys.modules
+        # the database and the cache are prepared while the handshake would be in flight
+        await self.wait_until_warm()
+        mark("warm")
+
+    migrations.prepare_database = timed_prepare_database
+    Dugs.load_extensions = timed_load_extensions
+    Dugs.login = login
+    Dugs.connect = connect
+
+    asyncio.run(entry.main())
+    print(json.dumps(marks))
+
+
+def _spawn(env: Dict[str, str]) -> Dict[str, Any]:
+    started = time.time()
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", repr(started)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _result(name: str, runs: List[Dict[str, Any]]) -> ScenarioResult:
+    totals = [run["connect"] for run in runs]
+    elapsed = sum(totals) / 1000
+    return ScenarioResult(
+        name=name,
+        calls=len(runs),
+        errors=0,
+        elapsed=elapsed,
+        throughput=len(runs) / elapsed if elapsed else 0.0,
+        latency_ms=percentiles(totals),
+        peak_memory_kb=0.0,
+        extra={
+            "phases_ms": {p: percentiles([run[p] for run in runs])["p50"] for p in PHASES},
+            "alembic_imported": sum(run["alembic_imported"] for run in runs),
+        },
+    )
+
+
+def measure_startup(runs: int = 5) -> List[ScenarioResult]:
+    """Starts the bot `runs` times against a fresh and against a migrated database"""
+    fresh, migrated = [], []
+
+    with tempfile.TemporaryDirectory(prefix="dugs-startup-") as directory:
+        db_file = Path(directory) / "dugs.db"
+        env = {
+            **os.environ,
+            "SQLITE_BIND": f"sqlite+aiosqlite:///{db_file}",
+            "ALEMBIC": f"sqlite:///{db_file}",
+            "PYTHONPATH": str(ROOT),
+        }
+
+        for _ in range(runs):
+            db_file.unlink(missing_ok=True)
+            fresh.append(_spawn(env))
+            migrated.append(_spawn(env))
+
+    return [
+        _result("startup.fresh_database", fresh),
+        _result("startup.migrated_database", migrated),
+    ]
+
+
+if __name__ == "__main__":
+    _child(float(sys.argv[1]))
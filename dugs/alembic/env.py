@@ -25,7 +25,8 @@ target_metadata = Base.metadata
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
-config.set_main_option("sqlalchemy.url", Database.alembic_sqlite_bind)
+if Database.alembic_sqlite_bind:
+    config.set_main_option("sqlalchemy.url", Database.alembic_sqlite_bind)
 
 
 def run_migrations_offline() -> None:
@@ -59,6 +60,12 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # the bot runs upgrades on its own engine's connection, see `dugs.migrations`
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -66,10 +73,14 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        _run_with_connection(connection)
+
+
+def _run_with_connection(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
 
-        with context.begin_transaction():
-            context.run_migrations()
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
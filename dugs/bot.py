@@ -1,6 +1,8 @@
+import asyncio
 import datetime
-import os
+from pathlib import Path
 from sys import version as sys_version
+from typing import Any, Callable, Coroutine, Optional, Sequence
 
 import disnake
 from disnake import __version__ as disnake_version
@@ -8,25 +10,119 @@ from disnake.ext import commands
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from dugs import __version__ as bot_version
-from dugs import constants, log
+from dugs import (
+    constants,
+    ingest,
+    log,
+    monitor,
+    replay,
+    snapshot,
+    statement_cache,
+    tracing,
+    unit_of_work,
+)
+from dugs.cogs import MANIFEST
 from dugs.companies import Companies
+from dugs.journal import InfluenceJournal
 
 logger = log.get_logger(__name__)
 
+# gateway events whose listeners each run inside their own root span
+TRACED_EVENTS = ("on_message", "on_raw_reaction_add", "on_thread_create", "on_button_click")
+
 
 class Dugs(commands.InteractionBot):
     def __init__(self, **kwargs: any) -> None:
         super().__init__(**kwargs)
 
         self.start_time = disnake.utils.utcnow()
-        self.db_engine = engine = create_async_engine(constants.Database.sqlite_bind)
+        self.db_engine = engine = create_async_engine(
+            constants.Database.sqlite_bind, query_cache_size=constants.Database.query_cache_size
+        )
+        self.statement_cache = statement_cache.CompiledCacheStats(engine)
         self.db_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-        self.companies: Companies = Companies(self.db_session)
+        journal = None
+        if constants.Journal.path:
+            journal = InfluenceJournal(
+                Path(constants.Journal.path), sync_delay=constants.Journal.sync_delay
+            )
+        self.companies: Companies = Companies(self.db_session, journal=journal)
+        # gateway activity on its way to `companies`, drained by the events cog
+        self.ingestion = ingest.IngestionQueue(
+            constants.Ingestion.queue_size,
+            constants.Ingestion.batch_size,
+            constants.Ingestion.batch_delay,
+        )
+        self._cache_warm = asyncio.Event()
+        self.snapshot_path = Path(constants.Snapshot.path) if constants.Snapshot.path else None
+
+        log.configure(
+            json_output=constants.Logging.json,
+            sample_rates=constants.Logging.sample_rates,
+            rate_limits=constants.Logging.rate_limits,
+        )
+        self.tracer = tracing.configure()
+        tracing.instrument_engine(engine)
+        unit_of_work.instrument_engine(engine)
+        tracing.instrument_http(self.http)
+
+        self.loop_monitor = monitor.LoopMonitor(
+            interval=constants.Monitor.loop_lag_interval,
+            threshold=constants.Monitor.loop_lag_threshold,
+        )
+
+        self.gateway_recorder: Optional[replay.GatewayRecorder] = None
+        if constants.Replay.record_file:
+            self.gateway_recorder = replay.GatewayRecorder(
+                constants.Replay.record_file, anonymize=constants.Replay.anonymize
+            )
+            self.gateway_recorder.install(self._connection.parsers)
 
     @property
     def db(self) -> async_sessionmaker[AsyncSession]:
         return self.db_session
 
+    def is_warm(self) -> bool:
+        """Whether the company cache has been filled from the database"""
+        return self._cache_warm.is_set()
+
+    async def wait_until_warm(self) -> None:
+        """Waits until the company cache has been filled from the database"""
+        await self._cache_warm.wait()
+
+    async def warm_cache(self) -> None:
+        """Fills the company cache, releasing handlers waiting on `wait_until_warm` even on failure
+
+        The snapshot from the last shutdown is used when the database has not changed since;
+        otherwise every company is loaded from the database. A cold cache is still correct,
+        lookups just fall back to the database. Influence still in the journal is credited last.
+        """
+        try:
+            await self._fill_cache()
+        except Exception:
+            logger.exception("Failed to warm the company cache, falling back to database lookups")
+
+        try:
+            if replayed := await self.companies.replay_journal():
+                logger.info(f"Replayed {replayed} influence journal records")
+        except Exception:
+            logger.exception("Failed to replay the influence journal, influence is not journaled")
+        finally:
+            self._cache_warm.set()
+
+    async def _fill_cache(self) -> None:
+        if self.snapshot_path and (stamp := await snapshot.database_stamp(self.db_engine)):
+            try:
+                count = self.companies.load_snapshot(self.snapshot_path, stamp)
+            except snapshot.SnapshotError as e:
+                logger.info(f"Not using the cache snapshot: {e}")
+            else:
+                logger.info(f"Restored {count} companies from `{self.snapshot_path}`")
+                return
+
+        count = await self.companies.warm()
+        logger.info(f"Cached {count} companies in {len(self.companies._cache)} guilds")
+
     async def on_ready(self) -> None:
         message = (
             "----------------------------------------------------------------------\n"
@@ -40,13 +136,96 @@ class Dugs(commands.InteractionBot):
         for line in message.split("\n"):
             logger.info(line)
 
-    async def load_extensions(self, path: str) -> None:
-        """Loads all extensions in a directory"""
+    async def _run_event(
+        self,
+        coro: Callable[..., Coroutine[Any, Any, Any]],
+        event_name: str,
+        *args: Any,
+        **kwargs: Any,
+    ) -> None:
+        if event_name not in TRACED_EVENTS:
+            return await super()._run_event(coro, event_name, *args, **kwargs)
+
+        with tracing.span(event_name, listener=coro.__qualname__) as s:
+
+            async def run(*args: Any, **kwargs: Any) -> None:
+                # inside the error handling of `_run_event`, so a failed listener is rolled back
+                async with unit_of_work.scope(self.db_session) as work:
+                    await coro(*args, **kwargs)
+                s.set_attribute("db.queries", work.queries)
+
+            await super()._run_event(run, event_name, *args, **kwargs)
+
+    async def process_application_commands(
+        self, interaction: disnake.ApplicationCommandInteraction
+    ) -> None:
+        with tracing.span(
+            "application_command", command=interaction.data.name, guild_id=interaction.guild_id
+        ) as s:
+            # commands read companies from the cache
+            await self.wait_until_warm()
+            # one session for the whole command, committed once it succeeded or at a checkpoint
+            async with unit_of_work.scope(self.db_session) as work:
+                await super().process_application_commands(interaction)
+                if getattr(interaction, "command_failed", False):
+                    work.discard()
+            s.set_attribute("db.queries", work.queries)
+
+    async def process_app_command_autocompletion(
+        self, inter: disnake.ApplicationCommandInteraction
+    ) -> None:
+        with tracing.span("autocomplete", command=inter.data.name, guild_id=inter.guild_id) as s:
+            await self.wait_until_warm()
+            async with unit_of_work.scope(self.db_session) as work:
+                await super().process_app_command_autocompletion(inter)
+            s.set_attribute("db.queries", work.queries)
+
+    async def save_snapshot(self) -> None:
+        """Writes the warm cache to `snapshot_path` for the next restart"""
+        if not self.snapshot_path or not self.is_warm():
+            return
+
+        # the stamp and the dump have to agree on which influence has been flushed
+        async with self.companies.influence_lock:
+            if not (stamp := await snapshot.database_stamp(self.db_engine)):
+                return
+            data = self.companies.dump_snapshot(stamp)
+
+        await asyncio.to_thread(snapshot.write, self.snapshot_path, data)
+        logger.info(f"Wrote a {len(data) / 1024:.1f}KiB cache snapshot to `{self.snapshot_path}`")
+
+    async def connect(self, *args: Any, **kwargs: Any) -> None:
+        self.loop_monitor.start()
+        await super().connect(*args, **kwargs)
+
+    async def close(self) -> None:
+        self.loop_monitor.stop()
+        await super().close()
+        try:
+            await self.ingestion.stop()
+        except Exception:
+            logger.exception("Failed to credit the queued activity")
+        try:
+            await self.companies.flush_influence()
+            if self.companies.journal:
+                await self.companies.journal.close()
+        except Exception:
+            logger.exception("Failed to flush influence, it is replayed from the journal on start")
+        try:
+            await self.save_snapshot()
+        except Exception:
+            logger.exception("Failed to write the cache snapshot")
+        self.tracer.shutdown()
+        if self.gateway_recorder:
+            self.gateway_recorder.close()
 
-        for extension in os.listdir(path):
-            if "__" in extension or not extension.endswith("py"):
-                continue
+    async def load_extensions(self, extensions: Sequence[str] = MANIFEST) -> None:
+        """Loads extensions in the given order, see `dugs.cogs.MANIFEST`
 
-            extension = f"dugs.cogs.{extension[:-3]}"
+        Each extension's module body runs once, in `load_extension`. What the extensions depend on
+        is already imported along with this module, and their heavy dependencies are imported
+        lazily, see `utils.lazy_import`, so there is nothing left to import ahead of them.
+        """
+        for extension in extensions:
             super().load_extension(extension)
             logger.info(f"Cog loaded: {extension}")
@@ -0,0 +1,13 @@
+# extensions loaded at startup, in this order
+MANIFEST = (
+    "dugs.cogs.errors",
+    "dugs.cogs.events",
+    "dugs.cogs.tasks",
+    "dugs.cogs.roles",
+    "dugs.cogs.guilds",
+    "dugs.cogs.company",
+    "dugs.cogs.admin",
+    "dugs.cogs.leaderboard",
+    "dugs.cogs.commands",
+    "dugs.cogs.help",
+)
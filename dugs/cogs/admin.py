@@ -3,12 +3,9 @@ import datetime
 
 import disnake
 from disnake.ext import commands
-from sqlalchemy.future import select
-from sqlalchemy.orm import subqueryload
 
-from dugs import components, log
+from dugs import components, log, unit_of_work
 from dugs.bot import Dugs
-from dugs.database import Company
 
 logger = log.get_logger(__name__)
 
@@ -24,28 +21,13 @@ class Admin(commands.Cog):
         """Delete all companies in this guild"""
         await inter.response.defer(ephemeral=True)
 
-        # remove guild and all companies from cache
-        self.bot.companies._cache.pop(inter.guild.id, {}).values()
-
-        session = self.bot.db()
-        deleted_count = 0
-        async with session.begin_nested() if session.in_transaction() else session.begin() as trans:
-            result = await session.execute(
-                select(Company)
-                .where(Company.guild_id == inter.guild.id)
-                .options(subqueryload(Company.opponent), subqueryload(Company.members))
-            )
-            companies = result.scalars().all()
-
-            for company in companies:
-                deleted_count += 1
-                await session.delete(company)
-
-            await trans.commit()
+        company_ids = await self.bot.companies.clear_guild(inter.guild.id)
+        # the roles are deleted slowly, without holding the database up meanwhile
+        await unit_of_work.checkpoint()
 
         expire_message_sent = False
 
-        for company in companies:
+        for company_id in company_ids:
             if not expire_message_sent:
                 if (disnake.utils.utcnow() + datetime.timedelta(seconds=2)) >= inter.expires_at:
                     await inter.edit_original_response(
@@ -53,11 +35,11 @@ class Admin(commands.Cog):
                     )
                     expire_message_sent = True
 
-            role = inter.guild.get_role(company.id)
+            role = inter.guild.get_role(company_id)
             await role.delete(reason=f"Associated company was cleared by {inter.author}")
             await asyncio.sleep(2)
 
-        message = f"{inter.author.mention}, {deleted_count} companies and their associated roles have been deleted."
+        message = f"{inter.author.mention}, {len(company_ids)} companies and their associated roles have been deleted."
 
         if expire_message_sent:
             await inter.channel.send(message)
@@ -69,7 +51,7 @@ class Admin(commands.Cog):
     async def view_companies(self, inter: disnake.GuildCommandInteraction) -> None:
         """View this guild's companies' rosters"""
 
-        companies = await self.bot.companies.get_guild_companies(inter.guild.id)
+        companies = (await self.bot.companies.get_guild_view(inter.guild.id)).companies.values()
 
         if not companies:
             await inter.response.send_message(
@@ -1,20 +1,28 @@
 from platform import python_version
 
 import disnake
-import psutil
 from disnake.ext import commands
 
 from dugs import __version__ as bot_version
-from dugs import components, log
+from dugs import components, log, utils
 from dugs.bot import Dugs
 
 logger = log.get_logger(__name__)
 
+# only needed by /botinfo
+psutil = utils.lazy_import("psutil")
+
 
 class General(commands.Cog):
     def __init__(self, bot: Dugs) -> None:
         self.bot = bot
-        self.process = psutil.Process()
+        self._process = None
+
+    @property
+    def process(self) -> "psutil.Process":
+        if self._process is None:
+            self._process = psutil.Process()
+        return self._process
 
     @commands.slash_command(name="botinfo")
     async def botinfo(self, interaction: disnake.CommandInteraction) -> None:
@@ -28,11 +36,19 @@ class General(commands.Cog):
 
         memory = self.process.memory_info()
         memory = memory.rss / 1024**2
+        lag = self.bot.loop_monitor.histogram
+        ingestion = self.bot.ingestion
+        statements = self.bot.statement_cache
+        lanes = self.bot.companies.lanes
 
         embed = self.format_status_embed(
             e,
             resource_info=f"CPU: `{self.process.cpu_percent():.1f}%`\nRAM: `{memory:.2f} MB`",
             latency=f"`{self.bot.latency * 1000:.2f}ms`",
+            loop_lag=f"p50 `{lag.percentile(50):.0f}ms`\np99 `{lag.percentile(99):.0f}ms`\nmax `{lag.max_ms:.0f}ms`",
+            ingestion=f"Queued `{ingestion.depth}`/`{ingestion.maxsize}`\nDropped `{ingestion.dropped:,}`",
+            sql_cache=f"Hit rate `{statements.hit_rate:.1%}`\nMisses `{statements.misses:,}`",
+            guild_lanes=f"Queued `{lanes.queued}`\nMax depth `{lanes.max_depth}`\nFairness `{lanes.fairness:.2f}`",
             python_version=f"`v{python_version()}`",
             disnake_version=f"`v{disnake.__version__}`",
             commands=f"`{len(self.bot.application_commands)}`",
@@ -2,14 +2,16 @@ import datetime
 
 import disnake
 from disnake.ext import commands
-from thefuzz import process
 
-from dugs import components, enums, log, utils
+from dugs import components, enums, log, unit_of_work, utils
 from dugs.bot import Dugs
 from dugs.database import Company, Member
 
 logger = log.get_logger(__name__)
 
+# only needed by autocomplete
+process = utils.lazy_import("thefuzz.process")
+
 
 class CompanyCommands(commands.Cog):
     def __init__(self, bot: Dugs) -> None:
@@ -91,6 +93,7 @@ class CompanyCommands(commands.Cog):
             ],
         )
         await self.bot.companies.add_company(inter.guild.id, company)
+        await unit_of_work.checkpoint()
 
         invite = self.bot.get_global_command_named("invite-to-company")
 
@@ -143,6 +146,7 @@ class CompanyCommands(commands.Cog):
             member_id=inter.author.id, company_id=_company.id, type=enums.RoleType.Private
         )
         await self.bot.companies.add_company_member(member)
+        await unit_of_work.checkpoint()
 
         await inter.response.send_message(f"Welcome to {_company.mention}, {inter.author.mention}")
 
@@ -160,10 +164,13 @@ class CompanyCommands(commands.Cog):
         role = inter.guild.get_role(company.id)
 
         await self.bot.companies.remove_company_member(company.id, inter.author.id)
+        # the roles are changed once the row is gone, without holding the database up meanwhile
+        await unit_of_work.checkpoint()
         await inter.author.remove_roles(role)
         message = f"You have been relieved of your duties in {company.name}."
 
-        if len(role.members) == 0:
+        # the role's members only change once the gateway catches up, the company is gone already
+        if await self.bot.companies.get_company(inter.guild.id, company.id) is None:
             await role.delete(reason="Associated company roster was empty")
             message += f"This leaves {company.name} without any members, so it will be deleted."
 
@@ -235,23 +242,12 @@ class CompanyCommands(commands.Cog):
         """
         company = await self.bot.companies.get_member_company(inter.guild.id, inter.author)
 
-        leader = None
-        private = None
-        for m in company.members:
-            if m.id == inter.author.id:
-                m.type = enums.RoleType.Private
-                private = m.mention
-            if m.id == int(member):
-                m.type = enums.RoleType.Leader
-                leader = m.mention
-
-            if private and leader:
-                break
-
-        await self.bot.companies.update_company(inter.guild.id, company)
+        # raises `errors.CompanyConflict` if the leadership changed since the company was read
+        await self.bot.companies.change_leader(company, inter.author.id, int(member))
+        await unit_of_work.checkpoint()
 
         await inter.response.send_message(
-            f"{company.mention}, {private} has stepped down and appointed {leader} as your new leader!"
+            f"{company.mention}, {inter.author.mention} has stepped down and appointed <@{member}> as your new leader!"
         )
 
     @commands.slash_command(name="show-company-roster")
@@ -337,8 +333,17 @@ class CompanyCommands(commands.Cog):
         self, inter: disnake.GuildCommandInteraction, string: str
     ) -> str:
         """Handles autocompleting from a company's roster"""
-        company = await self.bot.companies.get_member_company(inter.guild.id, inter.author)
-        members = [inter.guild.get_member(m.id) for m in company.members if m.id != inter.author.id]
+        view = await self.bot.companies.get_guild_view(inter.guild.id)
+        company_ids = view.member_companies.get(inter.author.id)
+        if not company_ids:
+            return {}
+
+        members = [
+            member
+            for m in view.companies[company_ids[0]].members
+            if m.member_id != inter.author.id
+            and (member := inter.guild.get_member(m.member_id)) is not None
+        ]
         output = process.extract(string, {str(m.id): m.display_name for m in members}, limit=25)
 
         return {o[0]: o[-1] for o in output}
@@ -351,7 +356,7 @@ class CompanyCommands(commands.Cog):
     ) -> str:
         """Handles autocompletion of guilds for the user to select from"""
 
-        companies = await self.bot.companies.get_guild_companies(inter.guild.id)
+        companies = await self.bot.companies.get_company_summaries(inter.guild.id)
         if inter.application_command.name == "join-company":
             output = process.extract(
                 string,
@@ -3,7 +3,7 @@ import traceback
 import disnake
 from disnake.ext import commands
 
-from dugs import components, log
+from dugs import components, errors, log
 from dugs.bot import Dugs
 
 logger = log.get_logger(__name__)
@@ -56,7 +56,7 @@ class ErrorHandler(commands.Cog):
             )
             return
 
-        if isinstance(error, ValueError):
+        if isinstance(error, (ValueError, errors.CompanyConflict)):
             await inter.response.send_message(str(error), ephemeral=True)
             return
 
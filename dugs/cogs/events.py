@@ -1,60 +1,139 @@
-from typing import List
+import asyncio
+from typing import Dict, List, Optional, Tuple
 
 import disnake
 from disnake.ext import commands
 
-from dugs import log
+from dugs import constants, log, ratelimit, scoring, unit_of_work
 from dugs.bot import Dugs
 from dugs.database import Member
 from dugs.enums import RoleType
+from dugs.ingest import Activity
 
 logger = log.get_logger(__name__)
 
-MIN_CHARACTERS = 2
-MIN_VALID_WORDS = 3
-VALID_WORD_INFLUENCE = 1
-VALID_IMAGE_INFLUENCE = 5
-VALID_VIDEO_INFLUENCE = 10
-
 
 class Events(commands.Cog):
     def __init__(self, bot: Dugs) -> None:
         self.bot = bot
+        self.scoring = scoring.ScoringEngine.from_file(constants.Scoring.rules_file)
+        self.influence_limiter: Optional[ratelimit.TokenBuckets] = None
+        if constants.RateLimit.influence_rate > 0:
+            self.influence_limiter = ratelimit.TokenBuckets(
+                constants.RateLimit.influence_rate,
+                constants.RateLimit.influence_burst,
+                constants.RateLimit.influence_members,
+            )
 
     def calculate_influence(self, message: disnake.Message) -> int:
-        influence = 0
+        guild_id = message.guild.id if message.guild else None
+        return self.scoring.scorer(guild_id).score_message(message)
+
+    def calculate_reaction_influence(self, payload: disnake.RawReactionActionEvent) -> int:
+        return self.scoring.scorer(payload.guild_id).score_reaction(payload)
+
+    def calculate_thread_influence(self, thread: disnake.Thread) -> int:
+        return self.scoring.scorer(thread.guild.id).score_thread(thread)
+
+    async def cog_load(self) -> None:
+        self.bot.ingestion.start(self.credit_batch)
+
+    def may_earn(self, guild_id: int, member_id: int) -> bool:
+        """Whether the member's activity can earn influence, checked before it is scored
+
+        Members outside every war and members over their rate limit cannot. Only the guild's
+        published view is looked at; without one the activity is scored and `credit_batch` checks
+        the war again.
+        """
+        view = self.bot.companies.peek_guild_view(guild_id)
+        if view is not None and member_id not in view.war_members:
+            return False
+
+        limiter = self.influence_limiter
+        return limiter is None or limiter.allow(member_id)
+
+    def offer_influence(self, guild_id: int, member_id: int, influence: int) -> None:
+        """Queues influence for `credit_batch`, activity that earns none is not even queued"""
+        if influence:
+            self.bot.ingestion.offer(Activity(guild_id, member_id, influence))
+
+    async def credit_batch(self, batch: List[Activity]) -> None:
+        """Credits a batch of activity to the companies at war its members belong to
+
+        Each guild's war members are read from its view once per batch and influence is summed per
+        company and member, so a busy member costs one increment per batch however much they sent.
+        Members outside any war earn nothing, the rate limit was already applied by `may_earn`. The
+        influence is written to the database in batches, see `Companies.add_influence`.
+        """
+        # a cold cache has no wars to credit, so influence earned now would be lost
+        await self.bot.wait_until_warm()
+
+        guilds: Dict[int, List[Activity]] = {}
+        for activity in batch:
+            guilds.setdefault(activity.guild_id, []).append(activity)
+
+        # guild id, company id, member id
+        deltas: Dict[Tuple[int, int, int], int] = {}
+
+        for guild_id, activities in guilds.items():
+            war_members = (await self.bot.companies.get_guild_view(guild_id)).war_members
+            if not war_members:
+                continue
 
-        valid_words = [word for word in message.content.split() if len(word) >= MIN_CHARACTERS]
-        if len(valid_words) >= MIN_VALID_WORDS:
-            influence += VALID_WORD_INFLUENCE
+            for activity in activities:
+                company_ids = war_members.get(activity.member_id)
+                if not company_ids:
+                    continue
 
-        if message.attachments:
-            for attachment in message.attachments:
-                if "image" in attachment.content_type:
-                    influence += VALID_IMAGE_INFLUENCE
-                if "video" in attachment.content_type:
-                    influence += VALID_VIDEO_INFLUENCE
+                for company_id in company_ids:
+                    key = (guild_id, company_id, activity.member_id)
+                    deltas[key] = deltas.get(key, 0) + activity.influence
 
-        return influence
+        # concurrent increments share one journal sync
+        await asyncio.gather(
+            *(
+                self.bot.companies.add_influence(guild_id, company_id, member_id, delta)
+                for (guild_id, company_id, member_id), delta in deltas.items()
+            )
+        )
 
     @commands.Cog.listener()
     async def on_message(self, message: disnake.Message) -> None:
         """Executed when a `message_create` event is received from Discord."""
 
-        if message.author.bot:
+        if message.author.bot or message.guild is None:
             return
+        if not self.may_earn(message.guild.id, message.author.id):
+            return
+
+        self.offer_influence(message.guild.id, message.author.id, self.calculate_influence(message))
 
-        companies_at_war = await self.bot.companies.get_companies_at_war(message.guild.id)
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: disnake.RawReactionActionEvent) -> None:
+        """Credits reactions, scored from the gateway payload so the message is never needed"""
 
-        if not companies_at_war:
+        if payload.guild_id is None or payload.member is None or payload.member.bot:
+            return
+        if not self.may_earn(payload.guild_id, payload.user_id):
             return
 
-        for company in companies_at_war:
-            if not message.author in company.members:
-                continue
+        self.offer_influence(
+            payload.guild_id, payload.user_id, self.calculate_reaction_influence(payload)
+        )
 
-            company.influence += self.calculate_influence(message)
-            await self.bot.companies.update_company(message.guild.id, company)
+    @commands.Cog.listener()
+    async def on_thread_create(self, thread: disnake.Thread) -> None:
+        """Credits the member who started a thread, replies in it arrive through `on_message`"""
+
+        owner = thread.guild.get_member(thread.owner_id)
+        if owner is not None and owner.bot:
+            return
+        if not self.may_earn(thread.guild.id, thread.owner_id):
+            return
+
+        self.offer_influence(
+            thread.guild.id, thread.owner_id, self.calculate_thread_influence(thread)
+        )
 
     @commands.Cog.listener("on_button_click")
     async def handle_company_invite(self, inter: disnake.MessageInteraction) -> None:
@@ -78,6 +157,7 @@ class Events(commands.Cog):
             )
             return
 
+        await self.bot.wait_until_warm()
         company = await self.bot.companies.get_company(int(guild_id), int(company_id))
         guild = inter.guild or self.bot.get_guild(int(guild_id))
         member = inter.author if inter.guild else guild.get_member(inter.author.id)
@@ -88,9 +168,11 @@ class Events(commands.Cog):
                 f"You have denied the invitation to `{company.name}`", ephemeral=True
             )
         else:
-            member = Member(member_id=inter.author.id, type=RoleType.Private, company_id=company_id)
-            company.members.append(member)
+            member = Member(
+                member_id=inter.author.id, type=RoleType.Private, company_id=int(company_id)
+            )
             await self.bot.companies.add_company_member(member)
+            await unit_of_work.checkpoint()
 
             await inter.response.send_message(
                 f"You are now a member of {company.name}!", ephemeral=True
@@ -132,7 +214,6 @@ class Events(commands.Cog):
 
             def parse_options(options: List[disnake.Option]) -> None:
                 for option in options:
-                    print(option.type)
                     if option.type is disnake.OptionType.sub_command:
                         invoked_command_name.append(option.name)
                         return
@@ -0,0 +1,75 @@
+import time
+
+import disnake
+from disnake.ext import commands, tasks
+
+from dugs import constants, log
+from dugs.bot import Dugs
+
+logger = log.get_logger(__name__)
+
+
+class Guilds(commands.Cog):
+    """Keeps only the guilds the bot is in cached and in the hot tables
+
+    A guild the bot leaves is dropped from the cache right away. Its companies are archived
+    once it has been gone for the grace period, and are brought back if the bot rejoins.
+    """
+
+    def __init__(self, bot: Dugs) -> None:
+        self.bot = bot
+        self.archive_departed_guilds.start()
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: disnake.Guild) -> None:
+        await self.bot.wait_until_warm()
+        await self.bot.companies.depart_guild(guild.id, int(time.time()))
+        logger.info(f"Left `{guild.name}` ({guild.id}), its companies will be archived")
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: disnake.Guild) -> None:
+        await self.bot.wait_until_warm()
+        if count := await self.bot.companies.rejoin_guild(guild.id):
+            logger.info(f"Rejoined `{guild.name}` ({guild.id}), restored {count} companies")
+
+    @tasks.loop(seconds=constants.Guilds.archive_interval)
+    async def archive_departed_guilds(self) -> None:
+        """Archives guilds left more than the grace period ago
+
+        Guilds the bot left or rejoined while it was offline raise no event, they are caught up
+        on here as well.
+        """
+        companies = self.bot.companies
+        now = int(time.time())
+        live = {guild.id for guild in self.bot.guilds}
+        departed = await companies.get_departed_guilds()
+
+        for guild_id in departed.keys() & live:
+            await companies.rejoin_guild(guild_id)
+            del departed[guild_id]
+
+        for guild_id in companies.cached_guild_ids() - live - departed.keys():
+            await companies.depart_guild(guild_id, now)
+            departed[guild_id] = now
+
+        grace = constants.Guilds.archive_grace_days * 24 * 60 * 60
+        for guild_id, departed_at in departed.items():
+            if departed_at > now - grace:
+                continue
+
+            try:
+                count = await companies.archive_guild(guild_id)
+            except Exception:
+                logger.exception(f"Failed to archive the companies of guild {guild_id}")
+            else:
+                logger.info(f"Archived {count} companies of guild {guild_id}")
+
+    @archive_departed_guilds.before_loop
+    async def before_archive_departed_guilds(self) -> None:
+        # the guilds the bot is in are only known once it is ready
+        await self.bot.wait_until_ready()
+        await self.bot.wait_until_warm()
+
+
+def setup(bot: Dugs) -> None:
+    bot.add_cog(Guilds(bot))
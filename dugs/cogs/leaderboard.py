@@ -1,21 +1,35 @@
-from typing import List
+from typing import Dict, List, Optional, Sequence
 
 import disnake
 from disnake.ext import commands
-from tabulate import tabulate
 
-from dugs import components
+from dugs import components, constants, enums, history, utils
 from dugs.bot import Dugs
-from dugs.database import Company
+from dugs.companies import CompanySummary
+
+# only needed to render the leaderboard
+tabulate = utils.lazy_import("tabulate")
+
+WINDOW_TITLES = {
+    enums.LeaderboardWindow.Season: "this season",
+    enums.LeaderboardWindow.Week: "last 7 days",
+    enums.LeaderboardWindow.Day: "last 24 hours",
+}
 
 
 class Leaderboard(commands.Cog):
     def __init__(self, bot: Dugs) -> None:
         self.bot = bot
 
-    def ranked_companies_strings(self, companies: List[Company]) -> List[List[any]]:
+    def ranked_companies_strings(
+        self, companies: Sequence[CompanySummary], influence: Optional[Dict[int, int]] = None
+    ) -> List[List[any]]:
+        """Ranks the companies by total influence, or by `influence` per company id if given"""
+        if influence is None:
+            influence = {company.id: company.total_influence for company in companies}
+
         sorted_companies = sorted(
-            companies, key=lambda company: company.total_influence, reverse=True
+            companies, key=lambda company: influence.get(company.id, 0), reverse=True
         )
 
         rank = 0
@@ -24,13 +38,14 @@ class Leaderboard(commands.Cog):
         current_chunk = []
 
         for company in sorted_companies:
-            if company.total_influence != last_influence:
+            company_influence = influence.get(company.id, 0)
+            if company_influence != last_influence:
                 rank += 1
 
             new_line = (
                 f"{rank:<8}",
                 f"{company.name:<65}",
-                f"{company.total_influence:<8}",
+                f"{company_influence:<8}",
             )
 
             # calculate current length by joining all the strings in all the tuples in the current_chunk
@@ -43,23 +58,32 @@ class Leaderboard(commands.Cog):
             else:
                 current_chunk.append(new_line)
 
-            last_influence = company.total_influence
+            last_influence = company_influence
 
         if current_chunk:
             chunks.append(current_chunk)
 
         return chunks
 
-    def leaderboard_embed(self, companies: List[Company]) -> List[disnake.Embed]:
-        chunked_companies = self.ranked_companies_strings(companies)
+    def leaderboard_embed(
+        self,
+        companies: Sequence[CompanySummary],
+        influence: Optional[Dict[int, int]] = None,
+        window: enums.LeaderboardWindow = enums.LeaderboardWindow.AllTime,
+    ) -> List[disnake.Embed]:
+        chunked_companies = self.ranked_companies_strings(companies, influence)
         embeds = []
 
+        title = "Company Leaderboard"
+        if window is not enums.LeaderboardWindow.AllTime:
+            title += f" ({WINDOW_TITLES[window]})"
+
         for idx, chunk in enumerate(chunked_companies):
             if idx == 0:
-                embed = disnake.Embed(title="Company Leaderboard")
+                embed = disnake.Embed(title=title)
             else:
-                embed = disnake.Embed(title="Company Leaderboard (continued)")
-            table = tabulate(
+                embed = disnake.Embed(title=f"{title} (continued)")
+            table = tabulate.tabulate(
                 chunk,
                 headers=["Rank", "Company", "Influence"],
                 tablefmt="simple",
@@ -72,10 +96,21 @@ class Leaderboard(commands.Cog):
         return embeds
 
     @commands.slash_command(name="company-leaderboard")
-    async def company_leaderboard(self, inter: disnake.GuildCommandInteraction) -> None:
-        """Display the guild's company leaderboard"""
-
-        companies = await self.bot.companies.get_guild_companies(inter.guild.id)
+    async def company_leaderboard(
+        self,
+        inter: disnake.GuildCommandInteraction,
+        window: enums.LeaderboardWindow = enums.LeaderboardWindow.AllTime,
+    ) -> None:
+        """
+        Display the guild's company leaderboard
+
+        Parameters
+        ----------
+        window: enums.LeaderboardWindow
+            Only count influence earned in the last day, week or this season
+        """
+
+        companies = await self.bot.companies.get_company_summaries(inter.guild.id)
 
         if not companies:
             await inter.response.send_message(
@@ -83,7 +118,17 @@ class Leaderboard(commands.Cog):
             )
             return
 
-        embeds = self.leaderboard_embed(companies)
+        influence = None
+        if window is not enums.LeaderboardWindow.AllTime:
+            since = history.window_start(
+                window,
+                disnake.utils.utcnow(),
+                constants.History.season_start,
+                constants.History.season_days,
+            )
+            influence = await self.bot.companies.get_window_influence(inter.guild.id, since)
+
+        embeds = self.leaderboard_embed(companies, influence, window)
         if len(embeds) == 1:
             await inter.response.send_message(
                 embed=embeds[0], components=components.TrashButton(inter.author.id)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Dict, Iterable, Optional, Set
+
+import disnake
+from disnake.ext import commands, tasks
+
+from dugs import constants, log
+from dugs.bot import Dugs
+
+logger = log.get_logger(__name__)
+
+
+class Roles(commands.Cog):
+    """Keeps the `member` and `company` tables in line with the company roles
+
+    Gateway events mark the members whose roles may have changed, and `reconcile_roles` compares
+    just those members a little later, once the command that changed the role has also written
+    the row. `sweep_roles` compares every member of every guild now and then to catch anything
+    the events missed, such as changes made while the bot was offline.
+    """
+
+    def __init__(self, bot: Dugs) -> None:
+        self.bot = bot
+        # guild id -> member id -> when the member was first marked
+        self._dirty: Dict[int, Dict[int, float]] = {}
+        # guilds that lost a role, which might have been a company's
+        self._lost_roles: Set[int] = set()
+
+        self.reconcile_roles.start()
+        self.sweep_roles.start()
+
+    def mark(self, guild_id: int, member_id: int) -> None:
+        """Has the member's roles compared with their rows on the next pass"""
+        self._dirty.setdefault(guild_id, {}).setdefault(member_id, time.monotonic())
+
+    def _take_due(self, guild_id: int) -> Set[int]:
+        dirty = self._dirty.get(guild_id, {})
+        settled = time.monotonic() - constants.Roles.reconcile_delay
+        due = {member_id for member_id, marked in dirty.items() if marked <= settled}
+        for member_id in due:
+            del dirty[member_id]
+        if not dirty:
+            self._dirty.pop(guild_id, None)
+        return due
+
+    @staticmethod
+    def _members_known(guild: disnake.Guild) -> bool:
+        # an unavailable guild has no members cached, and members that were never chunked would
+        # all look like they lost their roles
+        return not guild.unavailable and guild.chunked
+
+    async def reconcile(
+        self, guild: disnake.Guild, member_ids: Optional[Iterable[int]] = None
+    ) -> None:
+        """Fixes where the roles and rows disagree, for `member_ids` or every member"""
+        companies = self.bot.companies
+        drift = companies.find_role_drift(guild, member_ids)
+        if not drift:
+            return
+
+        changes = await companies.apply_role_drift(drift)
+        logger.info(
+            f"Reconciled company roles in `{guild.name}` ({guild.id}): "
+            f"{changes['removed']} rows removed, {changes['added']} added, "
+            f"{changes['promoted']} leaders promoted, {changes['deleted']} companies deleted"
+        )
+
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: disnake.RawGuildMemberRemoveEvent) -> None:
+        self.mark(payload.guild_id, payload.user.id)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: disnake.Member, after: disnake.Member) -> None:
+        if before._roles != after._roles:
+            self.mark(after.guild.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: disnake.Role) -> None:
+        self._lost_roles.add(role.guild.id)
+
+    @tasks.loop(seconds=constants.Roles.reconcile_interval)
+    async def reconcile_roles(self) -> None:
+        """Reconciles the members marked by gateway events, one transaction per guild"""
+        for guild_id in list(self._dirty.keys() | self._lost_roles):
+            if (guild := self.bot.get_guild(guild_id)) is None:
+                self._dirty.pop(guild_id, None)
+                self._lost_roles.discard(guild_id)
+                continue
+            if not self._members_known(guild):
+                # the marks are kept for a pass once the guild's members are in
+                continue
+
+            member_ids = self._take_due(guild_id)
+            if not member_ids and guild_id not in self._lost_roles:
+                continue
+            self._lost_roles.discard(guild_id)
+
+            try:
+                await self.reconcile(guild, member_ids)
+            except Exception:
+                logger.exception(f"Failed to reconcile company roles in `{guild.name}`")
+                for member_id in member_ids:
+                    self.mark(guild_id, member_id)
+
+    @tasks.loop(seconds=constants.Roles.sweep_interval)
+    async def sweep_roles(self) -> None:
+        """Compares every member of every guild, giving way to other work between guilds"""
+        for guild in list(self.bot.guilds):
+            if not self._members_known(guild):
+                continue
+
+            try:
+                await self.reconcile(guild)
+            except Exception:
+                logger.exception(f"Failed to sweep company roles in `{guild.name}`")
+
+            await asyncio.sleep(0)
+
+    @reconcile_roles.before_loop
+    async def before_reconcile_roles(self) -> None:
+        await self.bot.wait_until_ready()
+        await self.bot.wait_until_warm()
+
+    @sweep_roles.before_loop
+    async def before_sweep_roles(self) -> None:
+        # roles come from the gateway, the members from the cache
+        await self.bot.wait_until_ready()
+        await self.bot.wait_until_warm()
+
+
+def setup(bot: Dugs) -> None:
+    bot.add_cog(Roles(bot))
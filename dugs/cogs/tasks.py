@@ -1,22 +1,22 @@
-from typing import List
-
 import disnake
 from disnake.ext import commands, tasks
-from sqlalchemy.future import select
-from sqlalchemy.orm import subqueryload
 
-from dugs import errors, log
+from dugs import constants, errors, log
 from dugs.bot import Dugs
 from dugs.database import Company
 
 logger = log.get_logger(__name__)
 
+TOP_CONTRIBUTORS = 5
+
 
 class Tasks(commands.Cog):
     def __init__(self, bot: Dugs) -> None:
         self.bot = bot
         self.check_war_complete.start()
-        self.fill_company_cache.start()
+        self.save_cache_snapshot.start()
+        self.flush_influence.start()
+        self.roll_up_influence_history.start()
 
     def calculate_winner(self, company: Company):
         opponent = company.opponent
@@ -43,10 +43,15 @@ class Tasks(commands.Cog):
                 continue
 
             for company in companies_at_war:
+                war_company_ids = (company.id, company.opponent.id)
+                contributors = await self.bot.companies.get_top_contributors(
+                    war_company_ids, TOP_CONTRIBUTORS
+                )
+
                 try:
                     winner, loser = self.calculate_winner(company)
                 except errors.TieError as e:
-                    embed.description = f"The war between {e.company1.role.mention} and {e.company2.role.mention} is over and resulted in a tie!"
+                    embed.description = f"The war between {e.company1.mention} and {e.company2.mention} is over and resulted in a tie!"
                     embed.clear_fields()
                     for company in (e.company1, e.company2):
                         embed.add_field(
@@ -54,8 +59,8 @@ class Tasks(commands.Cog):
                         )
 
                 else:
-                    embed.description = f"The war between {winner.role.mention} and {loser.role.mention} is over and **{winner.role.mention}** has come away with victory!"
-                    embed.color = winner.role.color
+                    embed.description = f"The war between {winner.mention} and {loser.mention} is over and **{winner.mention}** has come away with victory!"
+                    embed.color = winner.color
                     embed.clear_fields()
                     for company in (winner, loser):
                         embed.add_field(
@@ -64,56 +69,59 @@ class Tasks(commands.Cog):
 
                 finally:
                     for company in (company, company.opponent):
-                        company.total_influence += company.influence
-                        company.influence = 0
+                        await self.bot.companies.settle_influence(company)
 
-                        await self.bot.companies.update_company(guild.id, company)
+                    await self.bot.companies.clear_contributions(war_company_ids)
+
+                if contributors:
+                    embed.add_field(
+                        name="Top contributors",
+                        value="\n".join(
+                            f"{rank}. <@{member_id}> ({influence} influence)"
+                            for rank, (influence, member_id, _) in enumerate(contributors, 1)
+                        ),
+                        inline=False,
+                    )
 
                 embeds.append(embed)
 
             war_channel = disnake.utils.get(guild.text_channels, name="war-announcements")
             await war_channel.send(embeds=embeds)
 
-    @tasks.loop(count=1)
-    async def fill_company_cache(self) -> None:
-        session = self.bot.db()
+    @tasks.loop(seconds=constants.Snapshot.interval)
+    async def save_cache_snapshot(self) -> None:
+        """Keeps a recent snapshot around in case the bot does not shut down cleanly"""
+        await self.bot.save_snapshot()
 
-        async with session.begin() as trans:
-            result = await session.execute(
-                select(Company).options(
-                    subqueryload(Company.members), subqueryload(Company.opponent)
-                )
-            )
-            companies: List[Company] = result.scalars().all()
+    @tasks.loop(seconds=constants.Journal.flush_interval)
+    async def flush_influence(self) -> None:
+        """Writes the influence earned since the last flush to the database"""
+        await self.bot.companies.flush_influence()
 
-        if not companies:
-            return
+    @tasks.loop(seconds=constants.History.rollup_interval)
+    async def roll_up_influence_history(self) -> None:
+        """Keeps the influence history small enough for windowed leaderboards to stay cheap"""
+        removed = await self.bot.companies.roll_up_history(constants.History.retention_days)
+        if any(removed.values()):
+            logger.debug(f"Rolled up influence history buckets: {removed}")
 
-        logger.info(f"Caching {len(companies)} companies in {len(self.bot.guilds)} guilds")
+    @save_cache_snapshot.before_loop
+    async def before_save_cache_snapshot(self) -> None:
+        await self.bot.wait_until_warm()
 
-        for guild in self.bot.guilds:
-            self.bot.companies._cache[guild.id] = {
-                c.id: c for c in companies if c.guild_id == guild.id
-            }
-
-            added_opponents = set()
-            if guild.id not in self.bot.companies._at_war:
-                self.bot.companies._at_war[guild.id] = []
-
-            for company in companies:
-                if (
-                    company.at_war
-                    and company.opponent_id
-                    and company.opponent_id not in added_opponents
-                ):
-                    self.bot.companies._at_war[guild.id].append(company)
-                    added_opponents.add(company.opponent_id)
+    @flush_influence.before_loop
+    async def before_flush_influence(self) -> None:
+        await self.bot.wait_until_warm()
+
+    @roll_up_influence_history.before_loop
+    async def before_roll_up_influence_history(self) -> None:
+        await self.bot.wait_until_warm()
 
     @check_war_complete.before_loop
-    @fill_company_cache.before_loop
     async def before_war_check(self) -> None:
-        """Ensures bot is ready before war_check task is allowed to start"""
+        """Ensures bot is ready and the cache warm before war_check task is allowed to start"""
         await self.bot.wait_until_ready()
+        await self.bot.wait_until_warm()
 
 
 def setup(bot: Dugs) -> None:
@@ -1,123 +1,897 @@
-from typing import Dict, List, Optional
+import asyncio
+import contextlib
+import heapq
+import time
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NoReturn,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 import disnake
+from sqlalchemy import bindparam, delete, update
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.future import select
-from sqlalchemy.orm import subqueryload
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from dugs.database import Company, Member
+from dugs import (
+    enums,
+    errors,
+    guild_view,
+    history,
+    lanes,
+    log,
+    reconcile,
+    snapshot,
+    tracing,
+    unit_of_work,
+)
+from dugs.database import (
+    ArchivedCompany,
+    ArchivedInfluenceBucket,
+    ArchivedMember,
+    Company,
+    DepartedGuild,
+    InfluenceBucket,
+    JournalCheckpoint,
+    Member,
+    WarContribution,
+)
+from dugs.guild_view import CompanySummary, GuildView
+from dugs.journal import InfluenceJournal
+
+logger = log.get_logger(__name__)
+
+_company_table = Company.__table__
+_member_table = Member.__table__
+_archived_company_table = ArchivedCompany.__table__
+_archived_member_table = ArchivedMember.__table__
+_bucket_table = InfluenceBucket.__table__
+_archived_bucket_table = ArchivedInfluenceBucket.__table__
+_contribution_table = WarContribution.__table__
+# member rows are moved to and from the archive without their ids: once a row is deleted SQLite
+# hands its id out again, so the id it had may belong to another member by the time it moves back
+_member_columns = [c for c in _member_table.c if c.name != "id"]
+_archived_member_columns = [c for c in _archived_member_table.c if c.name != "id"]
+
+# guild id, company id, member id
+ContributionKey = Tuple[int, int, int]
+
+# compare-and-swap attempts of a commutative update before the conflict is raised after all
+_CAS_ATTEMPTS = 5
+
+
+# loader options per kind of read, relationships refuse to load on access otherwise
+# every company of a guild: opponents are in the same guild, so the identity map has them
+_guild_loads = (selectinload(Company.members), selectinload(Company.opponent))
+# a single company: its opponent was not loaded along with it
+_company_loads = (
+    selectinload(Company.members),
+    selectinload(Company.opponent).selectinload(Company.members),
+)
+
+# the reads that reach the database from commands and autocomplete, built once so neither the
+# statement nor its cache key is built again on every call
+_guild_companies = (
+    select(Company).where(Company.guild_id == bindparam("guild_id")).options(*_guild_loads)
+)
+_company_summaries = select(Company.id, Company.name, Company.type, Company.total_influence).where(
+    Company.guild_id == bindparam("guild_id")
+)
+_named_company = (
+    select(Company)
+    .where(Company.guild_id == bindparam("guild_id"), Company.name == bindparam("name"))
+    .options(*_company_loads)
+)
+_member_company = (
+    select(Company)
+    .where(
+        Company.guild_id == bindparam("guild_id"),
+        Company.members.any(Member.member_id == bindparam("member_id")),
+    )
+    .options(*_company_loads)
+)
+
+
+def _merge(target: Dict, source: Dict) -> None:
+    for key, delta in source.items():
+        target[key] = target.get(key, 0) + delta
+
+
+def _detach(session: AsyncSession, companies: Iterable[Optional[Company]]) -> None:
+    # cached companies are changed outside of any session, e.g. by `add_influence`, and written
+    # explicitly; left in a unit of work's session they would be flushed as they are on commit
+    for company in companies:
+        if company is not None and company in session:
+            session.expunge(company)
 
 
 class Companies:
-    """Handles caching the created companies"""
+    """Handles caching the created companies
 
-    def __init__(self, session: async_sessionmaker[AsyncSession]):
+    Influence is credited to the cached companies right away and written to the database in batches
+    by `flush_influence`; with a `journal` every increment is durable before it is acknowledged.
+
+    Changes to a company's war, leader and total influence are compare-and-swaps on its `version`,
+    so writers need no lock between them: influence is moved with relative updates, which are
+    retried when they conflict, while changes that would overwrite another writer's raise
+    `errors.CompanyConflict`. Within a guild, changes run one at a time in the guild's lane, see
+    `dugs.lanes`, and readers get an immutable `GuildView` of the guild, see `get_guild_view`.
+    """
+
+    def __init__(
+        self,
+        session: async_sessionmaker[AsyncSession],
+        journal: Optional[InfluenceJournal] = None,
+    ):
         self.session = session
+        self.journal = journal
         self._cache: dict[int, Dict[int, Company]] = {}
         self._at_war: dict[int, List[Optional[Company]]] = {}
+        # whether every company is cached, so members without a cached company's role have none
+        self._complete = False
+        # lookups where a member had a company's role without being one of its members
+        self.role_drift = 0
+        # compare-and-swap updates that found the company changed since it was read
+        self.conflicts = 0
 
-    async def get_guild_companies(self, guild_id: int) -> List[Company]:
-        companies = self._cache.get(guild_id, {}).values()
-        if not companies:
-            session = self.session()
-            async with session.begin() as trans:
+        # influence credited in the cache but not yet in the database, per company id
+        self._pending_influence: Dict[int, int] = {}
+        # the same influence by the minute it was earned in, for the history
+        self._pending_buckets: Dict[history.BucketKey, int] = {}
+        # and by the member who earned it, for the war contributions
+        self._pending_contributions: Dict[ContributionKey, int] = {}
+        # the last journal record included in `_pending_influence`
+        self._pending_sequence = 0
+        # held while influence is being written to the database
+        self.influence_lock = asyncio.Lock()
+        # orders the changes to each guild's companies
+        self.lanes = lanes.GuildLanes()
+        # the published view of each cached guild, see `get_guild_view`
+        self._views: Dict[int, GuildView] = {}
+
+    @contextlib.asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[AsyncSession]:
+        """Yields the session of the current unit of work, or a transaction of its own
+
+        Inside a unit of work nothing is committed here, the unit commits once it is done.
+        """
+        if (work := unit_of_work.current()) is not None:
+            yield work.session
+            return
+
+        async with self.session.begin() as session:
+            yield session
+
+    @contextlib.asynccontextmanager
+    async def _change(self, guild_id: int) -> AsyncIterator[None]:
+        """Runs a change to the guild in its lane and retires the guild's view once it is done
+
+        The next read publishes a new view, so a burst of changes costs a single one. Inside a unit
+        of work the change's writes are flushed before the lane is left, so they reach the database
+        in the lane's order even though the unit commits them later.
+        """
+        async with self.lanes.lane(guild_id):
+            try:
+                yield
+                if (work := unit_of_work.current()) is not None:
+                    await work.flush()
+            finally:
+                self._views.pop(guild_id, None)
+
+    def _publish(self, guild_id: int) -> GuildView:
+        """Publishes a view of the guild's companies as they are cached now
+
+        Called between changes to the guild. A change that reads the guild's view itself is handed
+        one that is not published, it may not be done with the cache yet.
+        """
+        view = guild_view.build(
+            guild_id, self._cache.get(guild_id, {}).values(), self._at_war.get(guild_id, ())
+        )
+        if guild_id in self._cache and not self.lanes.holds(guild_id):
+            self._views[guild_id] = view
+        return view
+
+    def _cache_company(self, company: Company) -> None:
+        self._cache.setdefault(company.guild_id, {})[company.id] = company
+        self._views.pop(company.guild_id, None)
+
+    def _on_rollback(self, guild_id: int, undo: Callable[[], None]) -> None:
+        # outside a unit of work the cache is only changed once the transaction is committed
+        if (work := unit_of_work.current()) is None:
+            return
+
+        def rollback() -> None:
+            undo()
+            self._views.pop(guild_id, None)
+
+        work.on_rollback(rollback)
+
+    def _find_cached(self, company_id: int) -> Optional[Company]:
+        for companies in self._cache.values():
+            if (company := companies.get(company_id)) is not None:
+                return company
+        return None
+
+    async def _guild_of(self, company_id: int) -> int:
+        """Returns the id of the company's guild, for changes that only know the company"""
+        if (company := self._find_cached(company_id)) is not None:
+            return company.guild_id
+
+        async with self._transaction() as session:
+            return (await self._load_company(session, company_id)).guild_id
+
+    @tracing.traced()
+    async def warm(self) -> int:
+        """Loads every company into the cache and returns how many were loaded
+
+        Companies are grouped by their own `guild_id`, so this does not depend on the gateway
+        having delivered the guilds yet. Guilds the bot has left are not loaded.
+        """
+        session = self.session()
+        async with session.begin() as trans:
+            result = await session.execute(
+                select(Company)
+                .where(Company.guild_id.not_in(select(DepartedGuild.guild_id)))
+                .options(*_guild_loads)
+            )
+            companies: List[Company] = result.scalars().all()
+
+        self._views.clear()
+        self._cache_companies(companies)
+        self._complete = True
+        return len(companies)
+
+    def _cache_companies(self, companies: Iterable[Company]) -> None:
+        added_opponents = set()
+        for company in companies:
+            self._cache_company(company)
+            at_war = self._at_war.setdefault(company.guild_id, [])
+
+            # one entry per war, the opponent is reached through `company.opponent`
+            if company.at_war and company.opponent_id and company.id not in added_opponents:
+                at_war.append(company)
+                added_opponents.add(company.opponent_id)
+
+    def dump_snapshot(self, stamp: str) -> bytes:
+        """Serializes the cache as the database has it, see `dugs.snapshot`
+
+        Influence not yet flushed is left out, it is restored from the journal instead. Hold
+        `influence_lock` from taking `stamp` until this returns.
+        """
+        companies = (c for guild in self._cache.values() for c in guild.values())
+        return snapshot.dump(companies, self._at_war, stamp, self._pending_influence)
+
+    async def replay_journal(self) -> int:
+        """Opens the journal and credits the influence it holds that the database does not
+
+        Call it once the cache is warm. Returns how many records were replayed.
+        """
+        if self.journal is None:
+            return 0
+
+        async with self.session() as session:
+            checkpoint = await session.get(JournalCheckpoint, JournalCheckpoint.ID)
+        sequence = checkpoint.sequence if checkpoint else 0
+
+        records = await asyncio.to_thread(self.journal.open, sequence)
+        for record in records:
+            self._add_pending(
+                record.guild_id,
+                record.company_id,
+                record.member_id,
+                history.minute(record.timestamp),
+                record.delta,
+            )
+            self._pending_sequence = record.sequence
+
+            if company := self._cache.get(record.guild_id, {}).get(record.company_id):
+                company.influence += record.delta
+
+        return len(records)
+
+    def _add_pending(
+        self, guild_id: int, company_id: int, member_id: int, minute: int, delta: int
+    ) -> None:
+        self._pending_influence[company_id] = self._pending_influence.get(company_id, 0) + delta
+        bucket = (guild_id, company_id, minute)
+        self._pending_buckets[bucket] = self._pending_buckets.get(bucket, 0) + delta
+        contribution = (guild_id, company_id, member_id)
+        self._pending_contributions[contribution] = (
+            self._pending_contributions.get(contribution, 0) + delta
+        )
+
+    @tracing.traced()
+    async def add_influence(
+        self, guild_id: int, company_id: int, member_id: int, delta: int
+    ) -> None:
+        """Credits `delta` influence earned by `member_id` to the company
+
+        The cache is updated immediately and the database on the next `flush_influence`. With a
+        journal this returns once the increment is on disk; waiting for the disk happens outside
+        the guild's lane, so increments that arrive meanwhile share the sync. Nothing is credited
+        to a company that was deleted since the caller read its guild's view.
+        """
+        journal = self.journal if self.journal and self.journal.is_open() else None
+        minute = history.minute(time.time())
+        async with self.lanes.lane(guild_id):
+            if (company := self._cache.get(guild_id, {}).get(company_id)) is None:
+                return
+            if journal:
+                self._pending_sequence = journal.append(guild_id, company.id, member_id, delta)
+
+            self._add_pending(guild_id, company.id, member_id, minute, delta)
+            company.influence += delta
+
+        if journal:
+            try:
+                await journal.sync()
+            except Exception:
+                # not acknowledged, so it must not be credited either
+                self._add_pending(guild_id, company.id, member_id, minute, -delta)
+                company.influence -= delta
+                raise
+
+    @tracing.traced()
+    async def flush_influence(self) -> int:
+        """Writes the pending influence to the database in one transaction
+
+        The influence is added to the history and the members' war contributions in the same
+        transaction. Returns how many companies were updated. The journal is compacted afterwards.
+        """
+        async with self.influence_lock:
+            if not self._pending_influence:
+                return 0
+
+            pending, buckets = self._pending_influence, self._pending_buckets
+            contributions = self._pending_contributions
+            sequence = self._pending_sequence
+            self._pending_influence, self._pending_buckets = {}, {}
+            self._pending_contributions = {}
+
+            try:
+                async with self.session.begin() as session:
+                    # deltas commute with every other update, so they leave the version alone
+                    await session.execute(
+                        update(_company_table)
+                        .where(_company_table.c.id == bindparam("company"))
+                        .values(influence=_company_table.c.influence + bindparam("delta")),
+                        [{"company": c, "delta": d} for c, d in pending.items()],
+                    )
+                    await history.record(session, buckets)
+                    await self._record_contributions(session, contributions)
+                    if self.journal and self.journal.is_open():
+                        await session.merge(
+                            JournalCheckpoint(id=JournalCheckpoint.ID, sequence=sequence)
+                        )
+            except BaseException:
+                _merge(self._pending_influence, pending)
+                _merge(self._pending_buckets, buckets)
+                _merge(self._pending_contributions, contributions)
+                raise
+
+            if self.journal:
+                await self.journal.compact(sequence)
+
+            return len(pending)
+
+    async def _record_contributions(
+        self, session: AsyncSession, contributions: Dict[ContributionKey, int]
+    ) -> None:
+        statement = insert(_contribution_table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[_contribution_table.c.company_id, _contribution_table.c.member_id],
+            set_={"influence": _contribution_table.c.influence + statement.excluded.influence},
+        )
+        await session.execute(
+            statement,
+            [
+                {"guild_id": g, "company_id": c, "member_id": m, "influence": i}
+                for (g, c, m), i in contributions.items()
+            ],
+        )
+
+    @tracing.traced()
+    async def get_top_contributors(
+        self, company_ids: Iterable[int], limit: int
+    ) -> List[Tuple[int, int, int]]:
+        """Returns the `limit` members who earned the most influence for the given companies
+
+        Each entry is (influence, member id, company id), highest influence first. Influence that
+        has not been flushed yet is included.
+        """
+        company_ids = set(company_ids)
+        async with self.session() as session:
+            result = await session.execute(
+                select(
+                    _contribution_table.c.company_id,
+                    _contribution_table.c.member_id,
+                    _contribution_table.c.influence,
+                ).where(_contribution_table.c.company_id.in_(company_ids))
+            )
+            totals = {(c, m): i for c, m, i in result}
+
+        for (_, company_id, member_id), delta in self._pending_contributions.items():
+            if company_id in company_ids:
+                totals[(company_id, member_id)] = totals.get((company_id, member_id), 0) + delta
+
+        return heapq.nlargest(limit, ((i, m, c) for (c, m), i in totals.items() if i > 0))
+
+    @tracing.traced()
+    async def clear_contributions(self, company_ids: Iterable[int]) -> None:
+        """Forgets the war contributions to the given companies, once their war has been settled"""
+        company_ids = set(company_ids)
+        async with self.influence_lock:
+            self._pending_contributions = {
+                key: delta
+                for key, delta in self._pending_contributions.items()
+                if key[1] not in company_ids
+            }
+            async with self.session.begin() as session:
+                await session.execute(
+                    delete(_contribution_table).where(
+                        _contribution_table.c.company_id.in_(company_ids)
+                    )
+                )
+
+    @tracing.traced()
+    async def get_window_influence(self, guild_id: int, since: int) -> Dict[int, int]:
+        """Returns the influence each company of the guild earned since `since`, by company id
+
+        `since` is a unix timestamp, see `history.window_start`.
+        """
+        async with self._transaction() as session:
+            totals = await history.window_totals(session, guild_id, since)
+
+        for (bucket_guild_id, company_id, minute), delta in self._pending_buckets.items():
+            if bucket_guild_id == guild_id and minute >= since:
+                totals[company_id] = totals.get(company_id, 0) + delta
+
+        return totals
+
+    @tracing.traced()
+    async def roll_up_history(self, retention_days: int) -> Dict[str, int]:
+        """Rolls the influence history up, see `history.roll_up`"""
+        async with self.session.begin() as session:
+            return await history.roll_up(session, time.time(), retention_days)
+
+    def load_snapshot(self, path: Path, stamp: str) -> int:
+        """Fills the cache from a snapshot and returns how many companies were loaded
+
+        Raises `snapshot.SnapshotError` when the snapshot cannot be used.
+        """
+        cache, at_war = snapshot.load(path, stamp)
+        self._views.clear()
+        self._cache.update(cache)
+        self._at_war.update(at_war)
+        self._complete = True
+        return sum(len(guild) for guild in cache.values())
+
+    def cached_guild_ids(self) -> Set[int]:
+        return set(self._cache)
+
+    @tracing.traced()
+    async def get_departed_guilds(self) -> Dict[int, int]:
+        """Returns when the bot left each guild whose companies have not been archived yet"""
+        async with self.session() as session:
+            result = await session.execute(
+                select(DepartedGuild.guild_id, DepartedGuild.departed_at)
+            )
+            return dict(result.all())
+
+    @tracing.traced()
+    async def depart_guild(self, guild_id: int, departed_at: int) -> None:
+        """Drops the guild from the cache and remembers when the bot left it
+
+        The companies stay in the database until `archive_guild`; influence already credited to
+        them is still written by the next flush.
+        """
+        async with self._change(guild_id):
+            async with self.session.begin() as session:
+                await session.merge(DepartedGuild(guild_id=guild_id, departed_at=departed_at))
+
+            self._cache.pop(guild_id, None)
+            self._at_war.pop(guild_id, None)
+            self.lanes.forget(guild_id)
+
+    @tracing.traced()
+    async def archive_guild(self, guild_id: int) -> int:
+        """Moves a departed guild's companies, members and influence history to the archive tables
+
+        The guild's wars are over and its war contributions are dropped. Returns how many
+        companies were archived.
+        """
+        async with self._change(guild_id):
+            # influence still pending for the guild has to reach the rows before they move
+            await self.flush_influence()
+
+            company_ids = select(_company_table.c.id).where(_company_table.c.guild_id == guild_id)
+            async with self.influence_lock, self.session.begin() as session:
+                await session.execute(
+                    insert(_archived_member_table).from_select(
+                        [c.name for c in _member_columns],
+                        select(*_member_columns).where(_member_table.c.company_id.in_(company_ids)),
+                    )
+                )
                 result = await session.execute(
-                    select(Company)
-                    .where(Company.guild_id == guild_id)
-                    .options(subqueryload(Company.members), subqueryload(Company.opponent))
+                    insert(_archived_company_table).from_select(
+                        [c.name for c in _company_table.c],
+                        select(_company_table).where(_company_table.c.guild_id == guild_id),
+                    )
+                )
+                await session.execute(
+                    delete(_member_table).where(_member_table.c.company_id.in_(company_ids))
+                )
+                await session.execute(
+                    insert(_archived_bucket_table).from_select(
+                        [c.name for c in _bucket_table.c],
+                        select(_bucket_table).where(_bucket_table.c.guild_id == guild_id),
+                    )
+                )
+                await session.execute(
+                    delete(_bucket_table).where(_bucket_table.c.guild_id == guild_id)
+                )
+                await session.execute(
+                    delete(_contribution_table).where(_contribution_table.c.guild_id == guild_id)
+                )
+                await session.execute(
+                    delete(_company_table).where(_company_table.c.guild_id == guild_id)
+                )
+                await session.execute(
+                    delete(DepartedGuild).where(DepartedGuild.guild_id == guild_id)
                 )
-                companies = result.scalars().all()
 
-            if not companies:
-                return []
+            return result.rowcount
 
-        self._cache[guild_id] = {c.id: c for c in companies}
-        return companies
+    @tracing.traced()
+    async def rejoin_guild(self, guild_id: int) -> int:
+        """Brings a guild the bot rejoined back into the cache, from the archive if needed
 
-    async def get_companies_at_war(self, guild_id: int) -> List[Company]:
-        companies = self._cache.get(guild_id, [])
-        added_companies = set()
+        Wars that were running when the guild was archived are not resumed. Returns how many
+        companies the guild has.
+        """
+        async with self._change(guild_id):
+            company_ids = select(_archived_company_table.c.id).where(
+                _archived_company_table.c.guild_id == guild_id
+            )
+            async with self.session.begin() as session:
+                await session.execute(
+                    delete(DepartedGuild).where(DepartedGuild.guild_id == guild_id)
+                )
+                await session.execute(
+                    insert(_company_table).from_select(
+                        [c.name for c in _archived_company_table.c],
+                        select(_archived_company_table).where(
+                            _archived_company_table.c.guild_id == guild_id
+                        ),
+                    )
+                )
+                await session.execute(
+                    update(_company_table)
+                    .where(
+                        _company_table.c.guild_id == guild_id, _company_table.c.id.in_(company_ids)
+                    )
+                    .values(
+                        at_war=False,
+                        opponent_id=None,
+                        war_expires_at=None,
+                        version=_company_table.c.version + 1,
+                    )
+                )
+                await session.execute(
+                    insert(_member_table).from_select(
+                        [c.name for c in _archived_member_columns],
+                        select(*_archived_member_columns).where(
+                            _archived_member_table.c.company_id.in_(company_ids)
+                        ),
+                    )
+                )
+                await session.execute(
+                    delete(_archived_member_table).where(
+                        _archived_member_table.c.company_id.in_(company_ids)
+                    )
+                )
+                await session.execute(
+                    insert(_bucket_table).from_select(
+                        [c.name for c in _archived_bucket_table.c],
+                        select(_archived_bucket_table).where(
+                            _archived_bucket_table.c.guild_id == guild_id
+                        ),
+                    )
+                )
+                await session.execute(
+                    delete(_archived_bucket_table).where(
+                        _archived_bucket_table.c.guild_id == guild_id
+                    )
+                )
+                await session.execute(
+                    delete(_archived_company_table).where(
+                        _archived_company_table.c.guild_id == guild_id
+                    )
+                )
 
-        if not companies:
-            session = self.session()
-            async with session.begin() as trans:
                 result = await session.execute(
-                    select(Company)
-                    .where(Company.guild_id == guild_id, Company.at_war is True)
-                    .options(subqueryload(Company.members), subqueryload(Company.opponent))
+                    select(Company).where(Company.guild_id == guild_id).options(*_guild_loads)
                 )
-                companies = result.scalars().all()
+                companies: List[Company] = result.scalars().all()
 
-            if not companies:
-                return
+            self._cache.pop(guild_id, None)
+            self._at_war.pop(guild_id, None)
+            self._cache_companies(companies)
+            return len(companies)
 
-            for c in companies:
-                if c.guild_id not in self._at_war:
-                    self._at_war[c.guild_id] = []
+    @tracing.traced()
+    async def get_guild_companies(self, guild_id: int) -> List[Company]:
+        if companies := self._cache.get(guild_id):
+            return companies.values()
+        if self._complete:
+            return []
 
-                if c.at_war and c.opponent_id and c.opponent_id not in added_companies:
-                    self._at_war[guild_id].append(c)
-                    added_companies.add(c.opponent_id)
+        async with self._transaction() as session:
+            result = await session.execute(_guild_companies, {"guild_id": guild_id})
+            companies = result.scalars().all()
+            _detach(session, companies)
 
-        return self._at_war.get(guild_id, [])
+        self._cache_companies(companies)
+        return companies
 
+    @tracing.traced()
+    async def get_company_summaries(self, guild_id: int) -> Sequence[CompanySummary]:
+        """Returns the id, name, type and total influence of each of the guild's companies
+
+        For reads that need nothing else, like the leaderboard and autocomplete. A cached guild's
+        come from its view; otherwise only those columns are selected, its members and wars are not
+        loaded.
+        """
+        if guild_id in self._cache:
+            return (await self.get_guild_view(guild_id)).summaries
+        if self._complete:
+            return ()
+
+        async with self._transaction() as session:
+            result = await session.execute(_company_summaries, {"guild_id": guild_id})
+            return [CompanySummary(*row) for row in result]
+
+    @tracing.traced()
+    async def get_guild_view(self, guild_id: int) -> GuildView:
+        """Returns the guild's companies as they were once the last change to them was done
+
+        The view is never changed, see `dugs.guild_view`. Keep using the same one for a consistent
+        read rather than asking again. While a change is running this is the view published before
+        it, or if there is none the reader waits for the change to be done.
+        """
+        if (view := self._views.get(guild_id)) is not None:
+            return view
+        if guild_id not in self._cache and not self._complete:
+            await self.get_guild_companies(guild_id)
+
+        if self.lanes.depth(guild_id) and not self.lanes.holds(guild_id):
+            async with self.lanes.lane(guild_id):
+                pass
+            # nothing else runs before the view is built, the next change has not started yet
+
+        return self._publish(guild_id)
+
+    def peek_guild_view(self, guild_id: int) -> Optional[GuildView]:
+        """Returns the guild's published view without waiting, if it has one
+
+        For the hot paths that only filter with it, see `get_guild_view` for reads that need one.
+        """
+        return self._views.get(guild_id)
+
+    @tracing.traced()
+    async def get_companies_at_war(self, guild_id: int) -> List[Company]:
+        """Returns one company of each of the guild's wars, the other side is its `opponent`
+
+        These are the cached companies, for changing them; readers use `get_guild_view`.
+        """
+        if guild_id not in self._cache and not self._complete:
+            # the wars are cached along with the guild's companies
+            await self.get_guild_companies(guild_id)
+
+        # a copy, changes made while the caller goes through the wars do not affect it
+        return list(self._at_war.get(guild_id, ()))
+
+    @tracing.traced()
     async def add_company(self, guild_id: int, company: Company) -> None:
-        if guild_id not in self._cache:
-            self._cache[guild_id] = {}
+        async with self._change(guild_id):
+            if guild_id not in self._cache:
+                self._cache[guild_id] = {}
+
+            self._cache[guild_id][company.id] = company
 
-        self._cache[guild_id][company.id] = company
+            async with self._transaction() as session:
+                session.add(company)
+                await session.flush()
+                if company.opponent_id is None:
+                    # there is nothing to load, and once detached it could not be loaded
+                    set_committed_value(company, "opponent", None)
+                _detach(session, (company,))
 
-        async with self.session.begin() as session:
-            session.add(company)
-            await session.commit()
+            self._on_rollback(guild_id, lambda: self._cache[guild_id].pop(company.id, None))
+
+    async def _compare_and_set(self, session: AsyncSession, company: Company, **values) -> bool:
+        """Writes `values` and bumps the version if the row is still at `company.version`
+
+        Returns whether it was written. The cached company's version follows the row's.
+        """
+        version = company.version
+        result = await session.execute(
+            update(_company_table)
+            .where(_company_table.c.id == company.id, _company_table.c.version == version)
+            .values(version=version + 1, **values)
+        )
+        if not result.rowcount:
+            self.conflicts += 1
+            return False
+
+        company.version = version + 1
+
+        def undo() -> None:
+            company.version = version
+
+        self._on_rollback(company.guild_id, undo)
+        return True
 
+    async def _refresh_company(self, session: AsyncSession, company: Company) -> bool:
+        """Replaces the cached company's columns and members with the database's
+
+        Returns False if the company is not in the database anymore.
+        """
+        result = await session.execute(
+            select(_company_table).where(_company_table.c.id == company.id)
+        )
+        if (row := result.one_or_none()) is None:
+            return False
+
+        for name, value in row._asdict().items():
+            setattr(company, name, value)
+        # the row does not have the influence that was not flushed yet
+        company.influence += self._pending_influence.get(company.id, 0)
+        company.opponent = self._find_cached(company.opponent_id) if company.opponent_id else None
+
+        result = await session.execute(select(Member).where(Member.company_id == company.id))
+        members = result.scalars().all()
+        _detach(session, members)
+        set_committed_value(company, "members", members)
+        return True
+
+    async def _conflict(self, session: AsyncSession, company: Company) -> NoReturn:
+        """Raises `errors.CompanyConflict` for a company whose compare-and-swap failed
+
+        The cached company is refreshed first, so trying again works against what the database
+        has now. A company that was deleted in the meantime raises `ValueError` instead.
+        """
+        if not await self._refresh_company(session, company):
+            raise ValueError(f"Company `{company.name}` does not exist in the database")
+        raise errors.CompanyConflict(company)
+
+    @tracing.traced()
     async def update_company(self, guild_id: int, company: Company) -> None:
-        """Adds a new company"""
-        if not guild_id in self._cache:
-            raise ValueError(f"Guild has not created in companies yet")
+        """Writes the company's war to the database
 
-        if not self._cache[guild_id].get(company.id, None):
-            raise ValueError(f"Company `{company.name}` does not exist")
+        Raises `errors.CompanyConflict` if the company was changed since it was read, e.g. by
+        another process. Its influence is not written, see `settle_influence`.
+        """
+        async with self._change(guild_id):
+            if not guild_id in self._cache:
+                raise ValueError(f"Guild has not created in companies yet")
 
-        self._cache[guild_id][company.id] = company
+            if not self._cache[guild_id].get(company.id, None):
+                raise ValueError(f"Company `{company.name}` does not exist")
 
-        async with self.session.begin() as session:
-            result = await self.session.execute(select(Company).where(Company.id == company.id))
-            _company = result.scalar_one_or_none()
+            self._cache[guild_id][company.id] = company
 
-            if not _company:
-                raise ValueError(f"Company `{company.name}` does not exist in the database")
+            async with self._transaction() as session:
+                if not await self._compare_and_set(
+                    session,
+                    company,
+                    at_war=company.at_war,
+                    war_expires_at=company.war_expires_at,
+                    opponent_id=company.opponent.id if company.opponent else None,
+                ):
+                    await self._conflict(session, company)
 
-            else:
-                _company.at_war = company.at_war
-                _company.war_expires_at = company.war_expires_at
-                _company.influence = company.influence
-                _company.total_influence = company.total_influence
-                _company.opponent = company.opponent
-                _company.opponent_id = company.opponent.id if company.opponent else None
+    @tracing.traced()
+    async def settle_influence(self, company: Company) -> None:
+        """Adds the influence the company earned in its war to its total influence
+
+        The influence is moved with relative updates, so a conflicting write cannot be overwritten
+        and the compare-and-swap is simply tried again against the refreshed company. Influence
+        credited while this runs stays with the company.
+        """
+        async with self._change(company.guild_id):
+            async with self._transaction() as session:
+                for _ in range(_CAS_ATTEMPTS):
+                    moved = company.influence
+                    if await self._compare_and_set(
+                        session,
+                        company,
+                        influence=_company_table.c.influence - moved,
+                        total_influence=_company_table.c.total_influence + moved,
+                    ):
+                        break
+                    if not await self._refresh_company(session, company):
+                        raise ValueError(f"Company `{company.name}` does not exist in the database")
+                else:
+                    raise errors.CompanyConflict(company)
+
+            company.influence -= moved
+            company.total_influence += moved
+
+            def undo() -> None:
+                company.influence += moved
+                company.total_influence -= moved
+
+            self._on_rollback(company.guild_id, undo)
+
+    @tracing.traced()
+    async def change_leader(self, company: Company, leader_id: int, member_id: int) -> None:
+        """Hands the leadership of the company over from `leader_id` to `member_id`
 
-            await session.commit()
+        Raises `errors.CompanyConflict` if the company was changed since it was read, e.g. its
+        leader already resigned from another command.
+        """
+        async with self._change(company.guild_id):
+            leader, successor = company.get_member(leader_id), company.get_member(member_id)
+            if leader is None or leader.type is not enums.RoleType.Leader:
+                raise ValueError(
+                    f"Only the leader of `{company.name}` can hand over its leadership"
+                )
+            if successor is None or successor is leader:
+                raise ValueError(f"The new leader has to be another member of `{company.name}`")
+
+            async with self._transaction() as session:
+                if not await self._compare_and_set(session, company):
+                    await self._conflict(session, company)
+                await session.execute(
+                    update(_member_table)
+                    .where(
+                        _member_table.c.company_id == company.id,
+                        _member_table.c.member_id == bindparam("member"),
+                    )
+                    .values(type=bindparam("role")),
+                    [
+                        {"member": leader_id, "role": enums.RoleType.Private},
+                        {"member": member_id, "role": enums.RoleType.Leader},
+                    ],
+                )
+
+            leader.type, successor.type = enums.RoleType.Private, enums.RoleType.Leader
 
+            def undo() -> None:
+                leader.type, successor.type = enums.RoleType.Leader, enums.RoleType.Private
+
+            self._on_rollback(company.guild_id, undo)
+
+    @tracing.traced()
     async def get_company(self, guild_id: int, id: int) -> Optional[Company]:
         """Attempts to get a company from the cache by it's ID"""
         company = self._cache.get(guild_id, {}).get(id)
-        if not company:
-            session = self.session()
-            async with session.begin() as trans:
-                result = await session.execute(
-                    select(Company)
-                    .where(Company.id == id)
-                    .options(subqueryload(Company.members), subqueryload(Company.opponent))
-                )
-                company = result.scalar_one_or_none()
+        if company or self._complete:
+            return company
 
-            if company is None:
-                return
+        async with self._transaction() as session:
+            company = await session.get(Company, id, options=_company_loads)
+            _detach(session, (company,))
 
-            self._cache[guild_id][company.id] = company
+        if company is None:
+            return
 
+        self._cache_company(company)
         return company
 
+    @tracing.traced()
     async def get_company_named(self, guild_id: int, name: str) -> Optional[Company]:
         """Attempts to get a company from the cache by it's name"""
         companies = await self.get_guild_companies(guild_id)
@@ -126,91 +900,304 @@ class Companies:
             if company.name.casefold() == name.casefold():
                 return company
 
-        session = self.session()
-        async with session.begin() as trans:
-            result = await session.execute(
-                select(Company)
-                .where(Company.guild_id == guild_id, Company.name == name)
-                .options(subqueryload(Company.members), subqueryload(Company.opponent))
-            )
+        if self._complete:
+            return None
+
+        async with self._transaction() as session:
+            result = await session.execute(_named_company, {"guild_id": guild_id, "name": name})
             company = result.scalar_one_or_none()
+            _detach(session, (company,))
 
         if company is None:
             return
 
-        self._cache[guild_id][company.id] = company
+        self._cache_company(company)
         return company
 
+    @tracing.traced()
     async def get_member_company(self, guild_id: int, member: disnake.Member) -> Optional[Company]:
-        companies = await self.get_guild_companies(guild_id)
+        """Returns the company `member` belongs to
 
-        for company in companies:
-            if member in company.members:
+        A company's id is its role's id, and the guild's cache is keyed by it, so the member's
+        company is whichever of their roles is a key of the cache. The database is only asked when
+        the member has a company's role without being one of its members, or when the cache may
+        not hold every company.
+        """
+        role_ids = getattr(member, "_roles", None)
+        if self._complete and role_ids is not None:
+            companies = self._cache.get(guild_id, {})
+            for role_id in role_ids:
+                if (company := companies.get(role_id)) is not None:
+                    break
+            else:
+                return None
+
+            if company.get_member(member.id) is not None:
                 return company
 
-        session = self.session()
-        async with session.begin() as trans:
+            self.role_drift += 1
+            logger.debug(
+                f"{member.id} has the role of `{company.name}` ({company.id}) but is not a member"
+            )
+        else:
+            for company in await self.get_guild_companies(guild_id):
+                if member in company.members:
+                    return company
+
+        async with self._transaction() as session:
             result = await session.execute(
-                select(Company)
-                .where(
-                    Company.guild_id == guild_id, Company.members.any(Member.member_id == member.id)
-                )
-                .options(subqueryload(Company.members), subqueryload(Company.opponent))
+                _member_company, {"guild_id": guild_id, "member_id": member.id}
             )
             company = result.scalar_one_or_none()
+            if company is None:
+                return None
+            _detach(session, (company,))
 
-        if company is None:
-            return
+        if (cached := self._find_cached(company.id)) is None:
+            self._cache_company(company)
+            return company
 
-        self._cache[guild_id][company.id] = company
-        return company
+        # the wars and the opponent point at the cached instance, which may hold influence not
+        # flushed yet, so it is brought up to date rather than replaced
+        async with self._change(cached.guild_id):
+            async with self._transaction() as session:
+                if not await self._refresh_company(session, cached):
+                    return None
+        return cached
 
-    async def remove_company_member(self, company_id: int, member_id: int) -> None:
-        session = self.session()
-        async with session.begin() as trans:
-            result = await session.execute(
-                select(Company)
-                .where(Company.id == company_id)
-                .options(subqueryload(Company.members), subqueryload(Company.opponent))
-            )
-            company = result.scalar_one_or_none()
+    def find_role_drift(
+        self, guild: disnake.Guild, member_ids: Optional[Iterable[int]] = None
+    ) -> reconcile.RoleDrift:
+        """Compares the guild's company roles with the cached rows, see `reconcile.find_drift`"""
+        return reconcile.find_drift(guild, self._cache.get(guild.id, {}), member_ids)
 
-            if company is None:
-                raise ValueError(f"Company does not exist with the id {company_id}")
+    @tracing.traced()
+    async def apply_role_drift(self, drift: reconcile.RoleDrift) -> Dict[str, int]:
+        """Brings the `member` and `company` tables in line with the roles in one transaction
 
-            for member in company.members:
-                if member.member_id == member_id:
-                    await session.delete(member)
-                    break
+        Stale rows are deleted and role holders without a row join as privates. Companies whose
+        role was deleted or that lost every member are deleted, ending any war they were in, and a
+        company that lost its leader has its longest-standing member promoted. Returns how many
+        of each were changed.
+        """
+        async with self._change(drift.guild_id):
+            companies = self._cache.get(drift.guild_id, {})
+            stale = drift.stale_rows()
+            stale_ids = {id(row) for row in stale}
 
-            await session.refresh(company)
+            # what the companies are left with once the stale rows are gone
+            remaining: Dict[int, List[Member]] = {}
+            for row in stale:
+                if (company := companies.get(row.company_id)) is not None:
+                    remaining.setdefault(
+                        company.id, [m for m in company.members if id(m) not in stale_ids]
+                    )
 
-            if len(company.members) == 0:
-                self._cache[company.guild_id].pop(company.id, None)
-                await session.delete(company)
+            added = [
+                Member(member_id=member_id, company_id=company_id, type=enums.RoleType.Private)
+                for company_id, member_id in drift.without_row
+                if company_id in companies
+            ]
+            joined = {row.company_id for row in added}
 
-            else:
-                self._cache[company.guild_id][company.id] = company
+            deleted = set(drift.missing_roles)
+            deleted.update(c for c, rows in remaining.items() if not rows and c not in joined)
 
-            await trans.commit()
+            promoted: List[Member] = []
+            for company_id, rows in remaining.items():
+                if company_id in deleted or any(r.type is enums.RoleType.Leader for r in rows):
+                    continue
+                if leader := min(
+                    (r for r in rows if r.id is not None), key=lambda r: r.id, default=None
+                ):
+                    promoted.append(leader)
 
-    async def add_company_member(self, member: Member) -> None:
-        session = self.session()
+            if not (stale or added or deleted or promoted):
+                return {"removed": 0, "added": 0, "promoted": 0, "deleted": 0}
 
-        async with session.begin() as trans:
-            result = await session.execute(
-                select(Company)
-                .where(Company.id == member.company_id)
-                .options(subqueryload(Company.members), subqueryload(Company.opponent))
+            async with self.session.begin() as session:
+                if pks := [row.id for row in stale if row.id is not None]:
+                    await session.execute(delete(_member_table).where(_member_table.c.id.in_(pks)))
+                if unsaved := [row for row in stale if row.id is None]:
+                    await session.execute(
+                        delete(_member_table).where(
+                            _member_table.c.company_id == bindparam("company"),
+                            _member_table.c.member_id == bindparam("member"),
+                        ),
+                        [{"company": row.company_id, "member": row.member_id} for row in unsaved],
+                    )
+                if promoted:
+                    await session.execute(
+                        update(_member_table)
+                        .where(_member_table.c.id.in_([row.id for row in promoted]))
+                        .values(type=enums.RoleType.Leader)
+                    )
+                    # a change of leader, like `change_leader`
+                    await session.execute(
+                        update(_company_table)
+                        .where(_company_table.c.id.in_({row.company_id for row in promoted}))
+                        .values(version=_company_table.c.version + 1)
+                    )
+                if deleted:
+                    await self._delete_companies(session, deleted)
+                session.add_all(row for row in added if row.company_id not in deleted)
+
+            for company_id, rows in remaining.items():
+                if (company := companies.get(company_id)) is not None:
+                    company.members[:] = rows
+            for row in promoted:
+                row.type = enums.RoleType.Leader
+                companies[row.company_id].version += 1
+            for row in added:
+                if row.company_id not in deleted:
+                    companies[row.company_id].members.append(row)
+            if deleted:
+                self._forget_companies(drift.guild_id, deleted)
+
+            return {
+                "removed": len(stale),
+                "added": sum(1 for row in added if row.company_id not in deleted),
+                "promoted": len(promoted),
+                "deleted": len(deleted),
+            }
+
+    def _forget_companies(self, guild_id: int, company_ids: Iterable[int]) -> None:
+        """Drops deleted companies from the cache and ends the wars they were in"""
+        companies = self._cache.get(guild_id, {})
+        for company_id in company_ids:
+            companies.pop(company_id, None)
+
+        for company in companies.values():
+            if company.opponent_id in company_ids:
+                company.version += 1
+                company.at_war = False
+                company.opponent_id = None
+                company.opponent = None
+                company.war_expires_at = None
+
+        if wars := self._at_war.get(guild_id):
+            wars[:] = [
+                war
+                for war in wars
+                if war is not None and war.id not in company_ids and war.opponent_id is not None
+            ]
+
+    async def _delete_companies(self, session: AsyncSession, company_ids: Set[int]) -> None:
+        """Deletes the companies and their members, ending the wars they were in"""
+        await session.execute(
+            update(_company_table)
+            .where(_company_table.c.opponent_id.in_(company_ids))
+            .values(
+                at_war=False,
+                opponent_id=None,
+                war_expires_at=None,
+                version=_company_table.c.version + 1,
             )
-            company = result.scalar_one_or_none()
+        )
+        await session.execute(
+            delete(_member_table).where(_member_table.c.company_id.in_(company_ids))
+        )
+        await session.execute(delete(_company_table).where(_company_table.c.id.in_(company_ids)))
 
-            if company is None:
-                raise ValueError(f"Company does not exist with id {member.company_id}")
+    @tracing.traced()
+    async def clear_guild(self, guild_id: int) -> List[int]:
+        """Deletes every company of the guild and their members, returning the deleted ids"""
+        async with self._change(guild_id):
+            async with self._transaction() as session:
+                result = await session.execute(
+                    select(_company_table.c.id).where(_company_table.c.guild_id == guild_id)
+                )
+                company_ids = set(result.scalars().all())
+                if company_ids:
+                    await self._delete_companies(session, company_ids)
+
+            companies = self._cache.pop(guild_id, None)
+            wars = self._at_war.pop(guild_id, None)
+
+            def undo() -> None:
+                if companies is not None:
+                    self._cache[guild_id] = companies
+                if wars is not None:
+                    self._at_war[guild_id] = wars
+
+            self._on_rollback(guild_id, undo)
+            return sorted(company_ids)
+
+    async def _load_company(self, session: AsyncSession, company_id: int) -> Company:
+        """Returns the cached company, loading and caching it if need be"""
+        if (company := self._find_cached(company_id)) is not None:
+            return company
+
+        company = await session.get(Company, company_id, options=_company_loads)
+        if company is None:
+            raise ValueError(f"Company does not exist with the id {company_id}")
+
+        _detach(session, (company,))
+        self._cache_company(company)
+        return company
+
+    @tracing.traced()
+    async def remove_company_member(self, company_id: int, member_id: int) -> None:
+        """Removes the member from the company, deleting the company if that leaves it empty"""
+        async with self._change(await self._guild_of(company_id)):
+            async with self._transaction() as session:
+                company = await self._load_company(session, company_id)
+                remaining = [m for m in company.members if m.member_id != member_id]
+
+                if remaining:
+                    await session.execute(
+                        delete(_member_table).where(
+                            _member_table.c.company_id == company_id,
+                            _member_table.c.member_id == member_id,
+                        )
+                    )
+                else:
+                    await self._delete_companies(session, {company_id})
+
+            members = company.members[:]
+            company.members[:] = remaining
+            guild_id = company.guild_id
+            wars, opponents = [], []
+            if not remaining:
+                # what `_forget_companies` changes, to put back if the unit of work is rolled back
+                wars = list(self._at_war.get(guild_id, ()))
+                opponents = [
+                    (c, c.version, c.at_war, c.opponent, c.war_expires_at)
+                    for c in self._cache.get(guild_id, {}).values()
+                    if c.opponent_id == company_id
+                ]
+                self._forget_companies(guild_id, {company_id})
+
+            def undo() -> None:
+                company.members[:] = members
+                if remaining:
+                    return
+
+                self._cache.setdefault(guild_id, {})[company_id] = company
+                self._at_war.setdefault(guild_id, [])[:] = wars
+                for opponent, version, at_war, opponent_company, war_expires_at in opponents:
+                    opponent.version = version
+                    opponent.at_war = at_war
+                    opponent.opponent_id = company_id
+                    opponent.opponent = opponent_company
+                    opponent.war_expires_at = war_expires_at
+
+            self._on_rollback(guild_id, undo)
+
+    @tracing.traced()
+    async def add_company_member(self, member: Member) -> None:
+        """Adds the member to their company, in the database and in the cache"""
+        async with self._change(await self._guild_of(member.company_id)):
+            async with self._transaction() as session:
+                company = await self._load_company(session, member.company_id)
+                session.add(member)
+                # Core statements later in the same unit of work do not autoflush
+                await session.flush()
 
-            session.add(member)
+            members = company.members[:]
+            company.members.append(member)
 
-            await session.refresh(company)
-            await trans.commit()
+            def undo() -> None:
+                company.members[:] = members
 
-            self._cache[company.guild_id][company.id] = company
+            self._on_rollback(company.guild_id, undo)
@@ -1,5 +1,7 @@
+import datetime
 import os
 from enum import Enum
+from typing import Dict
 
 from dugs.log import get_logger
 
@@ -22,3 +24,89 @@ class Client:
 class Database:
     sqlite_bind = os.getenv("SQLITE_BIND")
     alembic_sqlite_bind = os.getenv("ALEMBIC")
+    # compiled statements the engine keeps, see `dugs.statement_cache`
+    query_cache_size = int(os.getenv("SQL_QUERY_CACHE_SIZE", "500"))
+
+
+class Tracing:
+    exporter = os.getenv("TRACE_EXPORTER")
+    jsonl_path = os.getenv("TRACE_FILE", "dugs/logs/traces.jsonl")
+    otlp_endpoint = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+
+class Monitor:
+    loop_lag_interval = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+    loop_lag_threshold = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+
+
+class Replay:
+    record_file = os.getenv("GATEWAY_RECORD_FILE")
+    anonymize = os.getenv("GATEWAY_RECORD_ANONYMIZE", "true").lower() != "false"
+
+
+def _per_logger(name: str) -> Dict[str, float]:
+    """Parses `logger=value` pairs separated by commas, e.g. `dugs.cogs.events=0.1,disnake=0.5`"""
+    pairs = (item.partition("=") for item in os.getenv(name, "").split(","))
+    return {key.strip(): float(value) for key, _, value in pairs if key.strip()}
+
+
+class Logging:
+    json = os.getenv("LOG_JSON", "false").lower() == "true"
+    sample_rates = _per_logger("LOG_SAMPLE_RATES")
+    rate_limits = _per_logger("LOG_RATE_LIMITS")
+
+
+class Snapshot:
+    path = os.getenv("CACHE_SNAPSHOT_FILE", "dugs/cache.snapshot")
+    interval = float(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
+
+
+class Journal:
+    path = os.getenv("INFLUENCE_JOURNAL_FILE", "dugs/influence.journal")
+    sync_delay = float(os.getenv("INFLUENCE_JOURNAL_SYNC_DELAY", "0"))
+    flush_interval = float(os.getenv("INFLUENCE_FLUSH_INTERVAL", "10"))
+
+
+class History:
+    retention_days = int(os.getenv("INFLUENCE_HISTORY_DAYS", "120"))
+    rollup_interval = float(os.getenv("INFLUENCE_ROLLUP_INTERVAL", "600"))
+    season_start = datetime.datetime.fromisoformat(os.getenv("SEASON_START", "2026-01-01")).replace(
+        tzinfo=datetime.timezone.utc
+    )
+    season_days = int(os.getenv("SEASON_DAYS", "90"))
+
+
+class RateLimit:
+    # influence-earning messages per second per member, 0 (the default) disables the limit
+    influence_rate = float(os.getenv("INFLUENCE_RATE", "0"))
+    influence_burst = float(os.getenv("INFLUENCE_BURST", "5"))
+    influence_members = int(os.getenv("INFLUENCE_RATE_MEMBERS", "500000"))
+
+
+class Ingestion:
+    # activity waiting to be credited, more is dropped until the queue drains
+    queue_size = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+    batch_size = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+    batch_delay = float(os.getenv("INGEST_BATCH_DELAY", "0.05"))
+
+
+class Roles:
+    # seconds between passes over the members whose roles changed
+    reconcile_interval = float(os.getenv("ROLE_RECONCILE_INTERVAL", "10"))
+    # seconds a role change is left alone, so the command that made it can write its row first
+    reconcile_delay = float(os.getenv("ROLE_RECONCILE_DELAY", "5"))
+    # seconds between comparisons of every member against the `member` table
+    sweep_interval = float(os.getenv("ROLE_SWEEP_INTERVAL", "21600"))
+
+
+class Guilds:
+    # seconds between checks for departed guilds to archive
+    archive_interval = float(os.getenv("GUILD_ARCHIVE_INTERVAL", "3600"))
+    # days a departed guild's companies stay in the hot tables in case the bot is added back
+    archive_grace_days = float(os.getenv("GUILD_ARCHIVE_GRACE_DAYS", "7"))
+
+
+class Scoring:
+    # JSON rule sets, see `dugs.scoring`; the built-in rules are used without one
+    rules_file = os.getenv("SCORING_RULES_FILE")
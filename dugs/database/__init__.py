@@ -1,3 +1,8 @@
+from .archive import ArchivedCompany, ArchivedInfluenceBucket, ArchivedMember
 from .base import Base
+from .checkpoint import JournalCheckpoint
 from .company import Company
+from .departed_guild import DepartedGuild
+from .influence_bucket import InfluenceBucket
 from .member import Member
+from .war_contribution import WarContribution
@@ -0,0 +1,49 @@
+import datetime
+
+from sqlalchemy import BigInteger, Boolean, DateTime, Enum, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from dugs import enums
+
+from .base import Base
+
+
+class ArchivedCompany(Base):
+    """A `Company` of a guild the bot left, kept until the bot rejoins"""
+
+    __tablename__ = "archived_company"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    guild_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String(65))
+    color: Mapped[int] = mapped_column(Enum(enums.CompanyColor), nullable=False)
+    type: Mapped[enums.CompanyType] = mapped_column(Enum(enums.CompanyType), nullable=False)
+    influence: Mapped[int] = mapped_column(Integer, default=0)
+    total_influence: Mapped[int] = mapped_column(Integer, default=0)
+    at_war: Mapped[bool] = mapped_column(Boolean, default=False)
+    war_expires_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True, default=None)
+    opponent_id: Mapped[int] = mapped_column(BigInteger, nullable=True, default=None)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class ArchivedMember(Base):
+    """A `Member` of an `ArchivedCompany`"""
+
+    __tablename__ = "archived_member"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    member_id: Mapped[int] = mapped_column(BigInteger)
+    company_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    type: Mapped[enums.RoleType] = mapped_column(Enum(enums.RoleType))
+
+
+class ArchivedInfluenceBucket(Base):
+    """An `InfluenceBucket` of an `ArchivedCompany`"""
+
+    __tablename__ = "archived_influence_bucket"
+
+    company_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    resolution: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    start: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    guild_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
+    influence: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -0,0 +1,16 @@
+from sqlalchemy import BigInteger, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class JournalCheckpoint(Base):
+    """The sequence number of the last influence journal record written to the database"""
+
+    __tablename__ = "journal_checkpoint"
+
+    # the table only ever holds this one row
+    ID = 1
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    sequence: Mapped[int] = mapped_column(BigInteger, nullable=False)
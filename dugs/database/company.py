@@ -30,8 +30,15 @@ class Company(Base):
     opponent_id: Mapped[int] = mapped_column(
         BigInteger, ForeignKey("company.id"), nullable=True, default=None
     )
-    opponent: Mapped[Company] = relationship("Company", lazy="joined", cascade=("all", "delete"))
-    members: Mapped[List[Member]] = relationship("Member", lazy="joined", cascade=("all", "delete"))
+    # bumped by every compare-and-swap update, see `Companies.update_company`
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # loaded only when a query asks for them, see `dugs.companies` for the loader options
+    opponent: Mapped[Company] = relationship(
+        "Company", lazy="raise_on_sql", cascade=("all", "delete")
+    )
+    members: Mapped[List[Member]] = relationship(
+        "Member", lazy="raise_on_sql", cascade=("all", "delete")
+    )
 
     @property
     def mention(self) -> str:
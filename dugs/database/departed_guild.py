@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class DepartedGuild(Base):
+    """A guild the bot was removed from whose companies have not been archived yet"""
+
+    __tablename__ = "departed_guild"
+
+    guild_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    # unix timestamp of when the bot left
+    departed_at: Mapped[int] = mapped_column(BigInteger, nullable=False)
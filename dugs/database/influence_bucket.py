@@ -0,0 +1,19 @@
+from sqlalchemy import BigInteger, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class InfluenceBucket(Base):
+    """Influence a company earned during one minute, hour or day, see `dugs.history`"""
+
+    __tablename__ = "influence_bucket"
+    __table_args__ = (Index("ix_influence_bucket_guild_start", "guild_id", "start"),)
+
+    company_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    # bucket length in seconds
+    resolution: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    # unix timestamp of the start of the bucket, a multiple of `resolution`
+    start: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    guild_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    influence: Mapped[int] = mapped_column(Integer, nullable=False)
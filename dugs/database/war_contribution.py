@@ -0,0 +1,15 @@
+from sqlalchemy import BigInteger, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class WarContribution(Base):
+    """Influence a member has earned for their company in its current war"""
+
+    __tablename__ = "war_contribution"
+
+    company_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    member_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    guild_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    influence: Mapped[int] = mapped_column(Integer, nullable=False)
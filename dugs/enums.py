@@ -34,3 +34,12 @@ class CompanyColor(int, Enum):
 class RoleType(str, Enum):
     Leader = "Leader"
     Private = "Private"
+
+
+class LeaderboardWindow(str, Enum):
+    """How far back the company leaderboard counts influence"""
+
+    AllTime = "all-time"
+    Season = "season"
+    Week = "week"
+    Day = "day"
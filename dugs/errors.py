@@ -4,3 +4,11 @@ from dugs.database import Company
 class TieError(Exception):
     def __init__(self, *companies: Company) -> None:
         self.company1, self.company2 = companies
+
+
+class CompanyConflict(Exception):
+    """The company was changed by someone else since it was read, see `Companies.update_company`"""
+
+    def __init__(self, company: Company) -> None:
+        super().__init__(f"`{company.name}` was changed in the meantime, please try again")
+        self.company = company
@@ -0,0 +1,134 @@
+"""Immutable views of a guild's companies for readers.
+
+The cached `Company` rows are changed in place by every write, so reading them across an `await`,
+or from another thread, can see a change half done. `Companies` instead hands readers a
+`GuildView` of each guild. A change to the guild retires its view once the change is done and the
+next read publishes a new one in its place; a view is never changed after it was published, so
+readers take a reference and use it without locks, for as long as they like.
+
+Influence earned in the current war is left out, it changes with nearly every message. Read it
+from the cached companies or the history instead.
+"""
+import datetime
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from dugs import enums
+from dugs.database import Company, Member
+
+__all__ = ("CompanySummary", "CompanyView", "GuildView", "MemberView", "build")
+
+
+class CompanySummary(NamedTuple):
+    """The columns of a company that listing it needs, see `Companies.get_company_summaries`"""
+
+    id: int
+    name: str
+    type: enums.CompanyType
+    total_influence: int
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class MemberView:
+    """A `Member` as of the view"""
+
+    id: Optional[int]
+    member_id: int
+    company_id: int
+    type: enums.RoleType
+
+    __eq__ = Member.__eq__
+    __hash__ = object.__hash__
+    mention = Member.mention
+
+
+@dataclass(frozen=True, slots=True)
+class CompanyView:
+    """A `Company` as of the view, without its war's influence"""
+
+    id: int
+    guild_id: int
+    name: str
+    color: enums.CompanyColor
+    type: enums.CompanyType
+    total_influence: int
+    at_war: bool
+    war_expires_at: Optional[datetime.datetime]
+    opponent_id: Optional[int]
+    version: int
+    members: Tuple[MemberView, ...]
+
+    # the roster helpers only need the fields above
+    mention = Company.mention
+    get_leader = Company.get_leader
+    get_privates = Company.get_privates
+    get_member = Company.get_member
+    get_company_embed = Company.get_company_embed
+
+
+@dataclass(frozen=True, slots=True)
+class GuildView:
+    """A guild's companies after the last change to them"""
+
+    guild_id: int
+    companies: Mapping[int, CompanyView]
+    # the same companies for listing, in the same order
+    summaries: Tuple[CompanySummary, ...]
+    # one side of each war, the other is `companies[war.opponent_id]`
+    wars: Tuple[CompanyView, ...]
+    # the companies each member belongs to, and those of them that are at war
+    member_companies: Mapping[int, Tuple[int, ...]]
+    war_members: Mapping[int, Tuple[int, ...]]
+
+
+def _company_view(company: Company) -> CompanyView:
+    return CompanyView(
+        id=company.id,
+        guild_id=company.guild_id,
+        name=company.name,
+        color=company.color,
+        type=company.type,
+        total_influence=company.total_influence or 0,
+        at_war=bool(company.at_war),
+        war_expires_at=company.war_expires_at,
+        opponent_id=company.opponent_id,
+        version=company.version or 0,
+        members=tuple(
+            MemberView(id=m.id, member_id=m.member_id, company_id=m.company_id, type=m.type)
+            for m in company.members
+        ),
+    )
+
+
+def build(
+    guild_id: int, companies: Iterable[Company], at_war: Iterable[Optional[Company]]
+) -> GuildView:
+    """Copies the guild's cached companies and wars into a view"""
+    views = {company.id: _company_view(company) for company in companies}
+    wars = tuple(views[c.id] for c in at_war if c is not None and c.id in views)
+
+    member_companies: Dict[int, List[int]] = {}
+    for company in views.values():
+        for member in company.members:
+            member_companies.setdefault(member.member_id, []).append(company.id)
+
+    fighting = {id for war in wars for id in (war.id, war.opponent_id)}
+    war_members = {
+        member_id: tuple(id for id in ids if id in fighting)
+        for member_id, ids in member_companies.items()
+        if any(id in fighting for id in ids)
+    }
+
+    return GuildView(
+        guild_id=guild_id,
+        companies=MappingProxyType(views),
+        summaries=tuple(
+            CompanySummary(c.id, c.name, c.type, c.total_influence) for c in views.values()
+        ),
+        wars=wars,
+        member_companies=MappingProxyType(
+            {member_id: tuple(ids) for member_id, ids in member_companies.items()}
+        ),
+        war_members=MappingProxyType(war_members),
+    )
@@ -0,0 +1,137 @@
+"""Influence history in time buckets.
+
+Influence is recorded per company in minute buckets whenever it is flushed to the database.
+`roll_up` folds minute buckets older than `MINUTE_RETENTION` into hour buckets, hour buckets older
+than `HOUR_RETENTION` into day buckets, and drops day buckets past the retention. Buckets of
+different resolutions never overlap, so the influence earned since any point in time is a single
+range scan over a few hundred buckets per company at most, however many messages were sent.
+
+Windows are resolved to the bucket: a window starting in the middle of an hour or day bucket that
+has already been rolled up leaves that bucket out.
+"""
+import datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import and_, delete, func, literal, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dugs import enums
+from dugs.database import InfluenceBucket
+
+__all__ = ("BucketKey", "minute", "record", "roll_up", "window_start", "window_totals")
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+MINUTE_RETENTION = 2 * HOUR
+HOUR_RETENTION = 2 * DAY
+
+# guild id, company id, start of the minute
+BucketKey = Tuple[int, int, int]
+
+_table = InfluenceBucket.__table__
+
+
+def minute(timestamp: float) -> int:
+    """Returns the start of the minute bucket `timestamp` falls in"""
+    return int(timestamp) // MINUTE * MINUTE
+
+
+async def record(session: AsyncSession, buckets: Dict[BucketKey, int]) -> None:
+    """Adds influence to the minute buckets"""
+    statement = insert(_table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[_table.c.company_id, _table.c.resolution, _table.c.start],
+        set_={"influence": _table.c.influence + statement.excluded.influence},
+    )
+    await session.execute(
+        statement,
+        [
+            {
+                "guild_id": guild_id,
+                "company_id": company_id,
+                "resolution": MINUTE,
+                "start": start,
+                "influence": influence,
+            }
+            for (guild_id, company_id, start), influence in buckets.items()
+        ],
+    )
+
+
+async def _fold(session: AsyncSession, source: int, target: int, before: int) -> int:
+    """Moves the `source` buckets starting before `before` into `target` buckets"""
+    start = _table.c.start - _table.c.start % target
+    older = and_(_table.c.resolution == source, _table.c.start < before)
+
+    rolled = (
+        select(
+            _table.c.guild_id,
+            _table.c.company_id,
+            literal(target),
+            start,
+            func.sum(_table.c.influence),
+        )
+        .where(older)
+        .group_by(_table.c.guild_id, _table.c.company_id, start)
+    )
+    statement = insert(_table).from_select(
+        ["guild_id", "company_id", "resolution", "start", "influence"], rolled
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[_table.c.company_id, _table.c.resolution, _table.c.start],
+        set_={"influence": _table.c.influence + statement.excluded.influence},
+    )
+    await session.execute(statement)
+
+    result = await session.execute(delete(_table).where(older))
+    return result.rowcount
+
+
+async def roll_up(session: AsyncSession, now: float, retention_days: int) -> Dict[str, int]:
+    """Rolls minute and hour buckets up and prunes expired day buckets
+
+    Only whole hours and days are rolled up, a window never sees half of one. Returns how many
+    buckets were removed at each resolution.
+    """
+    now = int(now)
+    minutes = await _fold(session, MINUTE, HOUR, (now - MINUTE_RETENTION) // HOUR * HOUR)
+    hours = await _fold(session, HOUR, DAY, (now - HOUR_RETENTION) // DAY * DAY)
+
+    result = await session.execute(
+        delete(_table).where(
+            _table.c.resolution == DAY, _table.c.start < now - retention_days * DAY
+        )
+    )
+    return {"minute": minutes, "hour": hours, "day": result.rowcount}
+
+
+def window_start(
+    window: enums.LeaderboardWindow,
+    now: datetime.datetime,
+    season_start: datetime.datetime,
+    season_days: int,
+) -> int:
+    """Returns the unix timestamp `window` starts at
+
+    Seasons are consecutive `season_days` long periods counted from `season_start`.
+    """
+    if window is enums.LeaderboardWindow.Day:
+        return int(now.timestamp()) - DAY
+    if window is enums.LeaderboardWindow.Week:
+        return int(now.timestamp()) - 7 * DAY
+
+    season = datetime.timedelta(days=season_days)
+    return int((season_start + (now - season_start) // season * season).timestamp())
+
+
+async def window_totals(session: AsyncSession, guild_id: int, since: int) -> Dict[int, int]:
+    """Returns the influence each company of the guild earned since `since`, by company id"""
+    result = await session.execute(
+        select(_table.c.company_id, func.sum(_table.c.influence))
+        .where(_table.c.guild_id == guild_id, _table.c.start >= since)
+        .group_by(_table.c.company_id)
+    )
+    return dict(result.all())
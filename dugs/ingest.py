@@ -0,0 +1,140 @@
+"""Bounded queue between the gateway and the company cache.
+
+Gateway listeners only score an event and `offer` a small `Activity` tuple, which never awaits.
+A single worker task drains the queue in micro-batches and hands each batch to the handler, so the
+per-event cost on the gateway task is an enqueue, and lookups and writes are done once per batch.
+
+The queue is bounded: when the worker falls behind, new activity is dropped and counted rather
+than letting memory grow or the gateway wait.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from dugs import log
+
+__all__ = ("Activity", "IngestionQueue")
+
+logger = log.get_logger(__name__)
+
+
+class Activity(NamedTuple):
+    guild_id: int
+    member_id: int
+    influence: int
+
+
+class IngestionQueue:
+    """Collects activity and feeds it to a handler in batches
+
+    Parameters
+    ----------
+    maxsize: int
+        How much activity may wait before new activity is dropped
+    batch_size: int
+        The most activity handed to the handler at once
+    batch_delay: float
+        Seconds the worker waits for a batch to fill after the first activity arrives
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, batch_delay: float = 0.0) -> None:
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+
+        self._queue: asyncio.Queue[Activity] = asyncio.Queue(maxsize)
+        self._task: Optional[asyncio.Task] = None
+        # whether the queue has been full since a drop was last logged
+        self._overflowing = False
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.batches = 0
+        self.handled = 0
+        # activity in batches whose handler raised
+        self.failed = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def offer(self, activity: Activity) -> bool:
+        """Queues `activity` for the worker, returns False if the queue was full and it was dropped"""
+        try:
+            self._queue.put_nowait(activity)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if not self._overflowing:
+                self._overflowing = True
+                logger.warning(
+                    f"Ingestion queue is full ({self.maxsize}), dropping activity until it drains"
+                )
+            return False
+
+        self.enqueued += 1
+        if (depth := self._queue.qsize()) > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def start(self, handler: Callable[[List[Activity]], Awaitable[None]]) -> None:
+        """Starts draining into `handler` on the running loop"""
+        if self.running:
+            return
+
+        self._task = asyncio.get_running_loop().create_task(
+            self._drain(handler), name="dugs: ingestion"
+        )
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Waits up to `timeout` seconds for the queued activity to be handled, then stops"""
+        if not self.running:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopped ingestion with {self.depth} activities still queued")
+
+        self._task.cancel()
+        self._task = None
+
+    async def join(self) -> None:
+        """Waits until everything queued so far has been handled"""
+        await self._queue.join()
+
+    async def _drain(self, handler: Callable[[List[Activity]], Awaitable[None]]) -> None:
+        queue = self._queue
+
+        while True:
+            batch = [await queue.get()]
+            if self.batch_delay and queue.qsize() < self.batch_size:
+                await asyncio.sleep(self.batch_delay)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            self._overflowing = False
+            try:
+                await handler(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception(f"Failed to handle a batch of {len(batch)} activities")
+            finally:
+                self.batches += 1
+                self.handled += len(batch)
+                for _ in batch:
+                    queue.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "handled": self.handled,
+            "failed": self.failed,
+        }
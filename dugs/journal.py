@@ -0,0 +1,208 @@
+"""Append-only journal of influence increments.
+
+Influence is credited to the cached companies straight away and written to the database in batches
+by `Companies.flush_influence`. Every increment is appended to this journal in between, and is only
+acknowledged once its record is on disk. Appends made while a write is in flight are grouped into
+the next write, so a single fsync covers however many increments arrived in the meantime.
+
+Records are numbered. The database keeps the number of the last record it has applied
+(`JournalCheckpoint`), updated in the same transaction as the influence itself, so after a crash
+exactly the records past the checkpoint are replayed. Once a batch is committed the journal is
+compacted down to the records that came after it.
+
+Each record, little-endian:
+
+    sequence, guild id, company id, member id, delta, unix timestamp, crc32 of the fields before it
+"""
+import asyncio
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import BinaryIO, List, NamedTuple, Optional
+
+from dugs import log
+
+__all__ = ("InfluenceJournal", "InfluenceRecord", "read")
+
+logger = log.get_logger(__name__)
+
+_RECORD = struct.Struct("<Qqqqqd")
+_CRC = struct.Struct("<I")
+RECORD_SIZE = _RECORD.size + _CRC.size
+
+
+class InfluenceRecord(NamedTuple):
+    sequence: int
+    guild_id: int
+    company_id: int
+    member_id: int
+    delta: int
+    timestamp: float
+
+
+def _encode(record: InfluenceRecord) -> bytes:
+    body = _RECORD.pack(*record)
+    return body + _CRC.pack(zlib.crc32(body))
+
+
+def read(path: Path) -> List[InfluenceRecord]:
+    """Returns the intact records of the journal at `path`
+
+    Reading stops at the first torn or corrupt record. Only the last write can be interrupted by a
+    crash, and the increments in it were never acknowledged.
+    """
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return []
+
+    records = []
+    for offset in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        body = data[offset : offset + _RECORD.size]
+        (crc,) = _CRC.unpack_from(data, offset + _RECORD.size)
+        if zlib.crc32(body) != crc:
+            logger.warning(f"Influence journal `{path}` is corrupt after {len(records)} records")
+            break
+        records.append(InfluenceRecord(*_RECORD.unpack(body)))
+
+    return records
+
+
+class InfluenceJournal:
+    """Group-committed, append-only journal file
+
+    Parameters
+    ----------
+    path: Path
+        The journal file, created if it does not exist
+    sync_delay: float
+        How long a write waits for more appends to join it before syncing, in seconds
+    """
+
+    def __init__(self, path: Path, sync_delay: float = 0.0) -> None:
+        self.path = path
+        self.sync_delay = sync_delay
+        self.sequence = 0
+        self.syncs = 0
+        self.synced_records = 0
+
+        self._file: Optional[BinaryIO] = None
+        self._buffer: List[bytes] = []
+        self._pending: Optional[asyncio.Future] = None
+        self._in_flight: Optional[asyncio.Future] = None
+        self._writer: Optional[asyncio.Task] = None
+        # file writes and compaction must not interleave
+        self._lock = asyncio.Lock()
+
+    def is_open(self) -> bool:
+        return self._file is not None
+
+    def open(self, checkpoint: int) -> List[InfluenceRecord]:
+        """Opens the journal for appending and returns the records after `checkpoint`
+
+        Blocks on file IO, call it from a worker thread.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        records = read(self.path)
+
+        self._file = open(self.path, "ab")
+        # never append after a torn tail, it would hide every record that follows
+        self._file.truncate(len(records) * RECORD_SIZE)
+
+        # numbering carries on from the checkpoint even when the journal was compacted to nothing
+        self.sequence = max([checkpoint, *(r.sequence for r in records[-1:])])
+        return [r for r in records if r.sequence > checkpoint]
+
+    def append(self, guild_id: int, company_id: int, member_id: int, delta: int) -> int:
+        """Buffers a record for the next write and returns its sequence number
+
+        The record is durable once `sync` returns.
+        """
+        if self._file is None:
+            raise RuntimeError("The influence journal is not open")
+
+        self.sequence += 1
+        record = InfluenceRecord(self.sequence, guild_id, company_id, member_id, delta, time.time())
+        self._buffer.append(_encode(record))
+
+        if self._pending is None:
+            self._pending = asyncio.get_running_loop().create_future()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write(), name="dugs: influence journal")
+
+        return self.sequence
+
+    async def sync(self) -> None:
+        """Waits until every record appended so far is on disk"""
+        waiter = self._pending or self._in_flight
+        if waiter is not None:
+            await asyncio.shield(waiter)
+
+    def _sync(self, data: bytes) -> None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def _write(self) -> None:
+        while self._buffer:
+            if self.sync_delay:
+                await asyncio.sleep(self.sync_delay)
+
+            records = len(self._buffer)
+            data = b"".join(self._buffer)
+            self._buffer.clear()
+            waiter = self._in_flight = self._pending
+            self._pending = None
+
+            try:
+                async with self._lock:
+                    await asyncio.to_thread(self._sync, data)
+            except BaseException as e:
+                waiter.set_exception(e)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+            else:
+                self.syncs += 1
+                self.synced_records += records
+                waiter.set_result(None)
+            finally:
+                self._in_flight = None
+
+    def _compact(self, sequence: int) -> int:
+        records = [r for r in read(self.path) if r.sequence > sequence]
+        tmp = self.path.with_suffix(f"{self.path.suffix}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(b"".join(_encode(r) for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "ab")
+        return len(records)
+
+    async def compact(self, sequence: int) -> int:
+        """Drops the records up to and including `sequence` and returns how many are left
+
+        Call it once the records up to `sequence` have been committed to the database.
+        """
+        if self._file is None:
+            return 0
+
+        async with self._lock:
+            return await asyncio.to_thread(self._compact, sequence)
+
+    async def close(self) -> None:
+        """Writes out the buffered records and closes the file"""
+        if self._file is None:
+            return
+
+        await self.sync()
+        if self._writer is not None:
+            await self._writer
+
+        async with self._lock:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,139 @@
+"""Per-guild lanes that order the changes `Companies` makes to a guild's companies.
+
+Every guild has a lane of its own, an `asyncio.Lock`, which is handed over in the order it was
+asked for. Changes to one guild run one at a time and in order, so a member leaving a company
+cannot interleave with an invite to it being accepted, while different guilds never wait on each
+other. A lane only exists while it is held or waited on.
+
+A change that is already in a guild's lane enters it again without waiting, so it can make other
+changes to the same guild. The lane is held by the task that entered it: tasks the change spawns
+wait for it like any other.
+"""
+import asyncio
+import contextlib
+import time
+from typing import AsyncIterator, Dict, Optional, Union
+
+__all__ = ("GuildLanes",)
+
+
+class _Lane:
+    __slots__ = ("lock", "depth", "owner")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # changes in the lane, the one running included
+        self.depth = 0
+        # the task running its change
+        self.owner: Optional[asyncio.Task] = None
+
+
+class GuildLanes:
+    """Runs the changes to each guild one at a time, and counts how long they queued"""
+
+    def __init__(self) -> None:
+        self._lanes: Dict[int, _Lane] = {}
+        # changes that entered a lane
+        self.acquired = 0
+        # of those, the ones that found it taken and had to wait
+        self.contended = 0
+        # the most changes that were in a single lane at once
+        self.max_depth = 0
+        # seconds spent waiting for lanes, in total and the longest single wait
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # seconds waited and changes run per guild, for `fairness`
+        self._guild_waits: Dict[int, float] = {}
+        self._guild_changes: Dict[int, int] = {}
+
+    def depth(self, guild_id: int) -> int:
+        """Returns how many changes are in the guild's lane, the one running included"""
+        lane = self._lanes.get(guild_id)
+        return lane.depth if lane else 0
+
+    def holds(self, guild_id: int) -> bool:
+        """Whether the current task is running a change in the guild's lane"""
+        lane = self._lanes.get(guild_id)
+        return lane is not None and lane.owner is asyncio.current_task()
+
+    @property
+    def queued(self) -> int:
+        """How many changes are waiting for their guild's lane"""
+        return sum(max(lane.depth - 1, 0) for lane in self._lanes.values())
+
+    @property
+    def fairness(self) -> float:
+        """Jain's index of the guilds' average wait for their lane
+
+        1.0 when every guild waited as long on average, down to 1/n when a single one of n guilds
+        did all of the waiting.
+        """
+        waits = [self._guild_waits.get(g, 0.0) / n for g, n in self._guild_changes.items()]
+        squares = sum(w * w for w in waits)
+        if not squares:
+            return 1.0
+        return sum(waits) ** 2 / (len(waits) * squares)
+
+    @contextlib.asynccontextmanager
+    async def lane(self, guild_id: int) -> AsyncIterator[None]:
+        """Runs the block once the changes to the guild that came before it are done"""
+        task = asyncio.current_task()
+        lane = self._lanes.get(guild_id)
+        if lane is not None and lane.owner is task:
+            yield
+            return
+
+        if lane is None:
+            lane = self._lanes[guild_id] = _Lane()
+        lane.depth += 1
+        self.max_depth = max(self.max_depth, lane.depth)
+
+        started = time.perf_counter()
+        contended = lane.lock.locked()
+        try:
+            await lane.lock.acquire()
+        except BaseException:
+            self._leave(guild_id, lane)
+            raise
+        self._record(guild_id, time.perf_counter() - started if contended else 0.0)
+
+        lane.owner = task
+        try:
+            yield
+        finally:
+            lane.owner = None
+            lane.lock.release()
+            self._leave(guild_id, lane)
+
+    def _record(self, guild_id: int, waited: float) -> None:
+        self.acquired += 1
+        self._guild_changes[guild_id] = self._guild_changes.get(guild_id, 0) + 1
+        if not waited:
+            return
+
+        self.contended += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self._guild_waits[guild_id] = self._guild_waits.get(guild_id, 0.0) + waited
+
+    def _leave(self, guild_id: int, lane: _Lane) -> None:
+        lane.depth -= 1
+        if not lane.depth:
+            del self._lanes[guild_id]
+
+    def forget(self, guild_id: int) -> None:
+        """Drops the metrics of a guild the bot left"""
+        self._guild_waits.pop(guild_id, None)
+        self._guild_changes.pop(guild_id, None)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return {
+            "lanes": len(self._lanes),
+            "queued": self.queued,
+            "max_depth": self.max_depth,
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "wait_total_ms": self.wait_total * 1000,
+            "wait_max_ms": self.wait_max * 1000,
+            "fairness": self.fairness,
+        }
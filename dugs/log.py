@@ -1,6 +1,12 @@
+import atexit
+import json
 import logging
 import logging.handlers
+import queue
+import random
+import time
 from pathlib import Path
+from typing import Dict, Optional
 
 import coloredlogs
 
@@ -14,19 +20,109 @@ class IgnoreSpecificMessage(logging.Filter):
         return not any(warning in record.getMessage() for warning in warnings_to_ignore)
 
 
+class _LoggerPrefixFilter(logging.Filter):
+    """Base for filters configured per logger name prefix, e.g. `dugs.cogs` or `sqlalchemy`
+
+    The most specific matching prefix wins. Only records below WARNING are ever dropped.
+    """
+
+    def __init__(self, values: Dict[str, float]) -> None:
+        super().__init__()
+        self.values = values
+        self._matches: Dict[str, Optional[str]] = {}
+
+    def _prefix(self, name: str) -> Optional[str]:
+        try:
+            return self._matches[name]
+        except KeyError:
+            pass
+
+        candidates = [p for p in self.values if name == p or name.startswith(f"{p}.") or not p]
+        prefix = self._matches[name] = max(candidates, key=len, default=None)
+        return prefix
+
+
+class SamplingFilter(_LoggerPrefixFilter):
+    """Keeps only the given fraction of records from matching loggers"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        prefix = self._prefix(record.name)
+        return prefix is None or random.random() < self.values[prefix]
+
+
+class RateLimitFilter(_LoggerPrefixFilter):
+    """Allows at most the given number of records per second from each matching prefix"""
+
+    def __init__(self, values: Dict[str, float]) -> None:
+        super().__init__(values)
+        self._buckets: Dict[str, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        prefix = self._prefix(record.name)
+        if prefix is None:
+            return True
+
+        rate = self.values[prefix]
+        now = time.monotonic()
+        bucket = self._buckets.setdefault(prefix, [rate, now])
+
+        # refill lazily based on the time since the last record
+        bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+
+        if bucket[0] < 1:
+            return False
+
+        bucket[0] -= 1
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects, including any `extra=` fields"""
+
+    _reserved = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in self._reserved)
+
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+class _ThreadQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records untouched so all formatting happens on the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 # setup logging format
 format_string = "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
 formatter = logging.Formatter(format_string)
 
-# set stdout logger to INFO
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-logger.addFilter(IgnoreSpecificMessage())
+coloredlogs.DEFAULT_LEVEL_STYLES = {
+    "info": {"color": coloredlogs.DEFAULT_LEVEL_STYLES["info"]},
+    "critical": {"color": 9},
+    "warning": {"color": 11},
+}
 
 stdout_handler = logging.StreamHandler()
 stdout_handler.setLevel(logging.INFO)
-stdout_handler.setFormatter(formatter)
-logger.addHandler(stdout_handler)
+stdout_handler.setFormatter(coloredlogs.ColoredFormatter(format_string))
 
 
 # setup logging file
@@ -42,16 +138,24 @@ file_handler = logging.handlers.TimedRotatingFileHandler(
 
 file_handler.setLevel(logging.INFO)
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
-coloredlogs.DEFAULT_LEVEL_STYLES = {
-    "info": {"color": coloredlogs.DEFAULT_LEVEL_STYLES["info"]},
-    "critical": {"color": 9},
-    "warning": {"color": 11},
-}
+# loggers only put records on a queue; formatting, colouring and file I/O (including rotation)
+# happen on the listener thread so logging never blocks the event loop
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+queue_handler = _ThreadQueueHandler(log_queue)
+queue_handler.addFilter(IgnoreSpecificMessage())
+
+listener = logging.handlers.QueueListener(
+    log_queue, stdout_handler, file_handler, respect_handler_level=True
+)
+listener.start()
+atexit.register(listener.stop)
 
-# Apply coloredlogs to the stdout handler
-coloredlogs.install(level=logging.INFO, logger=logger, stream=stdout_handler.stream)
+# set stdout logger to INFO
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+logger.addFilter(IgnoreSpecificMessage())
+logger.addHandler(queue_handler)
 
 
 disnake_logger = logging.getLogger("disnake.client")
@@ -70,5 +174,34 @@ logger = logging.getLogger()
 logger.info("Logging has been initialized")
 
 
+def configure(
+    *,
+    json_output: bool = False,
+    sample_rates: Optional[Dict[str, float]] = None,
+    rate_limits: Optional[Dict[str, float]] = None,
+) -> None:
+    """Applies output format, sampling and rate limits to the logging pipeline
+
+    Parameters
+    ----------
+    json_output: bool
+        Write the log file as JSON lines instead of plain text
+    sample_rates: Dict[str, float]
+        Fraction of INFO and DEBUG records to keep per logger name prefix
+    rate_limits: Dict[str, float]
+        Maximum INFO and DEBUG records per second per logger name prefix
+    """
+    file_handler.setFormatter(JsonFormatter() if json_output else formatter)
+
+    for f in list(queue_handler.filters):
+        if isinstance(f, _LoggerPrefixFilter):
+            queue_handler.removeFilter(f)
+
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    if rate_limits:
+        queue_handler.addFilter(RateLimitFilter(rate_limits))
+
+
 def get_logger(*args, **kwargs) -> logging.Logger:
     return logging.getLogger(*args, **kwargs)
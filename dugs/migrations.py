@@ -0,0 +1,125 @@
+"""Startup schema check and on-demand migrations.
+
+Migration scripts are committed under `dugs/alembic/versions`. At startup the revision stored in
+the database is compared with `HEAD_REVISION`, which only costs a single query, and alembic is
+imported and run only when they differ.
+
+`SCHEMA_FINGERPRINT` is a hash of the models as of `HEAD_REVISION`. When a model changes, add a
+migration (`alembic revision --autogenerate`) and update both constants; the value to use is
+printed by `python -m dugs.migrations`. Until then a warning is logged on every start.
+"""
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+import sqlalchemy
+from sqlalchemy import Connection, MetaData
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from dugs import log
+from dugs.database import Base
+
+__all__ = (
+    "HEAD_REVISION",
+    "SCHEMA_FINGERPRINT",
+    "current_revision",
+    "fingerprint",
+    "prepare_database",
+)
+
+logger = log.get_logger(__name__)
+
+HEAD_REVISION = "3e5b1d0c8a47"
+SCHEMA_FINGERPRINT = "aa04e5c3b0f8cd13"
+
+SCRIPT_LOCATION = Path(__file__).parent / "alembic"
+
+
+def fingerprint(metadata: MetaData = Base.metadata) -> str:
+    """Returns a stable hash of the tables, columns, keys and indexes described by `metadata`"""
+    dialect = sqlite.dialect()
+    parts = []
+
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(
+                f"column {column.name} {column.type.compile(dialect=dialect)}"
+                f" nullable={column.nullable} pk={column.primary_key}"
+                f" fk={sorted(fk.target_fullname for fk in column.foreign_keys)}"
+            )
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            parts.append(f"index {index.name} {[c.name for c in index.columns]} {index.unique}")
+
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+async def current_revision(engine: AsyncEngine) -> Optional[str]:
+    """Returns the alembic revision stored in the database, if any"""
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(sqlalchemy.text("SELECT version_num FROM alembic_version"))
+        except sqlalchemy.exc.OperationalError:
+            return None
+        return result.scalar_one_or_none()
+
+
+async def prepare_database(engine: AsyncEngine) -> None:
+    """Brings the database up to `HEAD_REVISION`, importing alembic only if it is behind"""
+    if fingerprint() != SCHEMA_FINGERPRINT:
+        logger.warning(
+            f"Models no longer match the schema at revision {HEAD_REVISION}; "
+            "add a migration and update `dugs.migrations`"
+        )
+
+    revision = await current_revision(engine)
+    if revision == HEAD_REVISION:
+        logger.info(f"Database is up to date at revision {revision}")
+        return
+
+    logger.info(f"Migrating database from revision {revision} to {HEAD_REVISION}")
+    async with engine.begin() as conn:
+        await conn.run_sync(_migrate, revision)
+
+
+def _migrate(connection: Connection, revision: Optional[str]) -> None:
+    import alembic.command
+    import alembic.config
+    import alembic.script
+
+    cfg = alembic.config.Config()
+    cfg.set_main_option("script_location", str(SCRIPT_LOCATION))
+    cfg.attributes["connection"] = connection
+
+    known = {
+        script.revision
+        for script in alembic.script.ScriptDirectory.from_config(cfg).walk_revisions()
+    }
+    inspector = sqlalchemy.inspect(connection)
+    tables = set(inspector.get_table_names()) - {"alembic_version"}
+
+    if revision in known or not tables:
+        alembic.command.upgrade(cfg, "head")
+        return
+
+    # databases created by `create_all` or by revisions generated at runtime before migrations
+    # were shipped already have the schema but not a revision alembic knows about
+    missing = [
+        f"{table.name}.{column.name}"
+        for table in Base.metadata.tables.values()
+        for column in table.columns
+        if table.name not in tables
+        or column.name not in {c["name"] for c in inspector.get_columns(table.name)}
+    ]
+    if missing:
+        raise RuntimeError(
+            f"Database at unknown revision {revision} is missing {', '.join(missing)}"
+        )
+
+    logger.warning(f"Database at unknown revision {revision} matches the models, stamping head")
+    alembic.command.stamp(cfg, "head", purge=True)
+
+
+if __name__ == "__main__":
+    print(f"head revision: {HEAD_REVISION}\nmodel fingerprint: {fingerprint()}")
@@ -0,0 +1,181 @@
+"""Event loop lag monitoring and blocking-call detection.
+
+`LoopMonitor` runs a small task on the event loop that repeatedly sleeps for a fixed interval and
+records how late it woke up. A watchdog thread watches that task's heartbeat; when the loop has not
+come back within the threshold, the watchdog grabs the loop thread's current stack so the handler
+that is hogging the loop can be identified while it is still running.
+"""
+import asyncio
+import collections
+import datetime
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+from dugs import log
+
+__all__ = ("BlockingCall", "LagHistogram", "LoopMonitor")
+
+logger = log.get_logger(__name__)
+
+
+class LagHistogram:
+    """Fixed-bucket histogram of loop lag in milliseconds"""
+
+    BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, lag_ms: float) -> None:
+        for idx, bound in enumerate(self.BUCKETS_MS):
+            if lag_ms <= bound:
+                break
+        else:
+            idx = len(self.BUCKETS_MS)
+
+        self.counts[idx] += 1
+        self.total += 1
+        self.sum_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def percentile(self, percent: float) -> float:
+        """Returns the upper bound of the bucket containing the given percentile"""
+        if not self.total:
+            return 0.0
+
+        target = self.total * percent / 100
+        seen = 0
+        for idx, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(self.BUCKETS_MS[idx]) if idx < len(self.BUCKETS_MS) else self.max_ms
+
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, object]:
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        return {
+            "count": self.total,
+            "mean_ms": self.sum_ms / self.total if self.total else 0.0,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ms,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+@dataclass
+class BlockingCall:
+    """A stack captured from the loop thread while it was blocked"""
+
+    detected_at: datetime.datetime
+    blocked_for: float
+    task: Optional[str]
+    stack: List[str]
+
+
+class LoopMonitor:
+    """Measures event loop scheduling lag and captures stacks of blocking calls
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between lag samples
+    threshold: float
+        Seconds of lag after which the loop is considered blocked
+    max_captures: int
+        How many of the most recent blocking-call captures to keep
+    """
+
+    def __init__(self, interval: float = 0.25, threshold: float = 0.1, max_captures: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = LagHistogram()
+        self.captures: Deque[BlockingCall] = collections.deque(maxlen=max_captures)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._heartbeat = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Starts sampling on the running loop. Must be called from the loop thread."""
+        if self.running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+
+        self._task = self._loop.create_task(self._sample_lag(), name="dugs: loop monitor")
+        self._watchdog = threading.Thread(
+            target=self._watch, name="dugs-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - scheduled - self.interval
+
+            self.histogram.record(lag * 1000)
+            self._heartbeat = time.monotonic()
+
+            if lag > self.threshold:
+                logger.warning(f"Event loop lagged {lag * 1000:.1f}ms behind schedule")
+
+    def _watch(self) -> None:
+        last_captured = None
+
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.interval
+
+            # only capture once per stall
+            if blocked_for < self.threshold or heartbeat == last_captured:
+                continue
+
+            last_captured = heartbeat
+            self._capture(blocked_for)
+
+    def _capture(self, blocked_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+
+        task = asyncio.current_task(self._loop)
+        capture = BlockingCall(
+            detected_at=datetime.datetime.now(datetime.timezone.utc),
+            blocked_for=blocked_for,
+            task=task.get_name() if task else None,
+            stack=traceback.format_stack(frame),
+        )
+        self.captures.append(capture)
+
+        logger.warning(
+            f"Event loop blocked for at least {blocked_for * 1000:.0f}ms in task `{capture.task}`:\n"
+            + "".join(capture.stack)
+        )
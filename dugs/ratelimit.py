@@ -0,0 +1,138 @@
+"""Per-member token buckets kept in flat arrays.
+
+Every member gets a slot in three parallel arrays: their id, how many tokens their bucket held and
+when it was last touched. Member ids are mapped to slots by an open-addressing hash table that is
+itself an array, so the limiter holds no Python objects per member and its memory is fixed by its
+capacity: about 40 bytes per member.
+
+Buckets are refilled lazily when the member is next seen, nothing runs in the background. Once
+every slot is taken a new member reuses one, preferring a slot whose bucket has refilled
+completely, which holds no state worth keeping.
+"""
+import array
+import time
+from typing import Optional, Tuple
+
+__all__ = ("TokenBuckets",)
+
+# how many slots a new member may look at for a full bucket before taking the oldest assigned one
+_EVICTION_SCAN = 32
+
+# Fibonacci hashing spreads snowflakes, whose low bits are mostly a per-process counter
+_GOLDEN = 0x9E3779B97F4A7C15
+_U64 = (1 << 64) - 1
+
+
+class TokenBuckets:
+    """Allows each member `rate` events per second, in bursts of up to `burst`
+
+    Parameters
+    ----------
+    rate: float
+        Tokens added to a bucket per second
+    burst: float
+        How many tokens a bucket holds
+    capacity: int
+        How many members are tracked at once
+    """
+
+    def __init__(self, rate: float, burst: float, capacity: int) -> None:
+        if rate <= 0 or burst < 1 or capacity < 1:
+            raise ValueError("rate must be positive, burst at least 1 and capacity at least 1")
+
+        self.rate = rate
+        self.burst = burst
+        self.capacity = capacity
+
+        self._members = array.array("q")
+        self._tokens = array.array("d")
+        self._updated = array.array("d")
+        # the next slot considered for reuse, slots are reused in the order they were assigned
+        self._hand = 0
+
+        # slot + 1 per position, 0 is empty; kept at most half full so probes stay short
+        self._bits = max((capacity * 2 - 1).bit_length(), 1)
+        self._mask = (1 << self._bits) - 1
+        self._index = array.array("q", bytes(8 << self._bits))
+
+        self.allowed = 0
+        self.dropped = 0
+        # members forgotten while their bucket was not yet full
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def _home(self, member_id: int) -> int:
+        return ((member_id * _GOLDEN) & _U64) >> (64 - self._bits)
+
+    def _find(self, member_id: int) -> Tuple[int, int]:
+        """Returns the member's slot, -1 if they have none, and their position in the index"""
+        index, members, mask = self._index, self._members, self._mask
+        position = self._home(member_id)
+        while entry := index[position]:
+            if members[entry - 1] == member_id:
+                return entry - 1, position
+            position = (position + 1) & mask
+        return -1, position
+
+    def _remove(self, position: int) -> None:
+        # backward-shift deletion keeps every remaining entry reachable from its home position
+        index, members, mask = self._index, self._members, self._mask
+        index[position] = 0
+        hole = position
+        while entry := index[position := (position + 1) & mask]:
+            home = self._home(members[entry - 1])
+            if (position - home) & mask >= (position - hole) & mask:
+                index[hole] = entry
+                index[position] = 0
+                hole = position
+
+    def _assign(self, member_id: int, now: float) -> int:
+        if len(self._members) < self.capacity:
+            slot = len(self._members)
+            self._members.append(member_id)
+            self._tokens.append(0.0)
+            self._updated.append(0.0)
+            return slot
+
+        # a bucket that has refilled since it was last used is indistinguishable from a new one
+        full_after = self.burst / self.rate
+        slot = self._hand
+        for offset in range(_EVICTION_SCAN):
+            candidate = (self._hand + offset) % self.capacity
+            if now - self._updated[candidate] >= full_after:
+                slot = candidate
+                break
+        else:
+            self.evicted += 1
+
+        self._hand = (slot + 1) % self.capacity
+        self._remove(self._find(self._members[slot])[1])
+        self._members[slot] = member_id
+        return slot
+
+    def allow(self, member_id: int, now: Optional[float] = None) -> bool:
+        """Takes a token from the member's bucket, returns False if it is empty"""
+        if now is None:
+            now = time.monotonic()
+
+        slot, position = self._find(member_id)
+        if slot < 0:
+            slot = self._assign(member_id, now)
+            # the eviction may have moved entries around
+            _, position = self._find(member_id)
+            self._index[position] = slot + 1
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, self._tokens[slot] + (now - self._updated[slot]) * self.rate)
+
+        self._updated[slot] = now
+        if tokens < 1:
+            self._tokens[slot] = tokens
+            self.dropped += 1
+            return False
+
+        self._tokens[slot] = tokens - 1
+        self.allowed += 1
+        return True
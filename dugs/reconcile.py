@@ -0,0 +1,123 @@
+"""Finding where company roles and the `member` table disagree.
+
+Roles are what members see and what moderators edit, so they are taken as the truth. Both sides
+are reduced to sorted (company id, member id) keys, the role holders from the guild's member cache
+and the rows from the company cache, and a single merge over the two yields every difference at
+once: rows nobody holds the role for, role holders without a row and duplicate rows.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import disnake
+
+from dugs.database import Company, Member
+
+__all__ = ("RoleDrift", "find_drift")
+
+# company id, member id
+Key = Tuple[int, int]
+
+
+class RoleDrift(NamedTuple):
+    """Where a guild's company roles and the `member` table disagree, see `find_drift`"""
+
+    guild_id: int
+    # companies whose role was deleted
+    missing_roles: List[int]
+    # rows of members who no longer have their company's role
+    without_role: List[Member]
+    # (company id, member id) of members with a company's role but no row
+    without_row: List[Key]
+    # rows of members who are no longer in the guild
+    departed: List[Member]
+    # rows repeating another row of the same member and company
+    duplicates: List[Member]
+
+    def __bool__(self) -> bool:
+        return any(
+            (
+                self.missing_roles,
+                self.without_role,
+                self.without_row,
+                self.departed,
+                self.duplicates,
+            )
+        )
+
+    def stale_rows(self) -> List[Member]:
+        return self.without_role + self.departed + self.duplicates
+
+
+def _row_key(row: Member) -> Key:
+    return row.company_id, row.member_id
+
+
+def find_drift(
+    guild: disnake.Guild,
+    companies: Dict[int, Company],
+    member_ids: Optional[Iterable[int]] = None,
+) -> RoleDrift:
+    """Compares the roles of `guild` with the rows of its cached `companies`
+
+    Only `member_ids` are compared if given, otherwise every member. Comparing every member needs
+    the guild's members to be cached, or members with a company role look like they have no row.
+    Members with more than one company's role are left out of `without_row`, there is no telling
+    which company they meant to join.
+    """
+    drift = RoleDrift(guild.id, [], [], [], [], [])
+    wanted = None if member_ids is None else set(member_ids)
+
+    live = {}
+    for company_id, company in companies.items():
+        if guild.get_role(company_id) is None:
+            drift.missing_roles.append(company_id)
+        else:
+            live[company_id] = company
+
+    if wanted is None:
+        members = guild.members
+    else:
+        members = [m for m in map(guild.get_member, wanted) if m is not None]
+
+    holders: List[Key] = []
+    ambiguous = set()
+    for member in members:
+        held = [role_id for role_id in member._roles if role_id in live]
+        holders.extend((role_id, member.id) for role_id in held)
+        if len(held) > 1:
+            ambiguous.add(member.id)
+    holders.sort()
+
+    rows = [
+        row
+        for company in live.values()
+        for row in company.members
+        if wanted is None or row.member_id in wanted
+    ]
+    rows.sort(key=_row_key)
+
+    i = j = 0
+    matched: Optional[Key] = None
+    while i < len(holders) or j < len(rows):
+        holder = holders[i] if i < len(holders) else None
+        row = rows[j] if j < len(rows) else None
+        row_key = _row_key(row) if row is not None else None
+
+        if row_key is not None and row_key == matched:
+            drift.duplicates.append(row)
+            j += 1
+        elif row_key is not None and (holder is None or row_key < holder):
+            if guild.get_member(row.member_id) is None:
+                drift.departed.append(row)
+            else:
+                drift.without_role.append(row)
+            j += 1
+        elif row_key == holder:
+            matched = holder
+            i += 1
+            j += 1
+        else:
+            if holder[1] not in ambiguous:
+                drift.without_row.append(holder)
+            i += 1
+
+    return drift
@@ -0,0 +1,159 @@
+"""Recording of raw gateway events for offline replay.
+
+`GatewayRecorder` wraps the connection state's parsers for a handful of gateway events and
+appends every payload it sees to a gzip-compressed JSONL file, one `{"t", "ts", "d"}` object per
+line. `READY` and `GUILD_CREATE` are recorded alongside the traffic so a replay can rebuild the
+guild, channel, role and member cache before the traffic is fed back in.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from dugs import log
+
+__all__ = ("GatewayRecorder", "RecordedEvent", "SETUP_EVENTS", "anonymize", "read_recording")
+
+logger = log.get_logger(__name__)
+
+# events needed to rebuild the cache before traffic can be replayed
+SETUP_EVENTS = ("READY", "GUILD_CREATE")
+TRAFFIC_EVENTS = ("MESSAGE_CREATE", "INTERACTION_CREATE")
+
+# string fields that carry user-provided text or identifying names
+_MASKED_KEYS = {"content"}
+_HASHED_KEYS = {
+    "username",
+    "global_name",
+    "nick",
+    "name",
+    "topic",
+    "filename",
+    "url",
+    "proxy_url",
+    "avatar",
+    "banner",
+    "icon",
+    "splash",
+    "description",
+    "title",
+    "value",
+    "email",
+}
+# names the bot looks channels up by and which therefore must survive anonymizing
+_PRESERVED_VALUES = {"war-announcements"}
+
+_STOP = object()
+
+
+@dataclass
+class RecordedEvent:
+    type: str
+    timestamp: float
+    data: Dict[str, Any]
+
+
+def _hash(value: str) -> str:
+    return hashlib.blake2s(value.encode(), digest_size=5).hexdigest()
+
+
+def anonymize(payload: Any, key: Optional[str] = None) -> Any:
+    """Strips user text and names from a gateway payload
+
+    Message content keeps its whitespace and word lengths, since influence scoring depends on
+    them. Names are replaced by a stable hash so the same user or role keeps the same name across
+    events. Snowflakes and the interaction `data` object (command names, option values and
+    component custom ids, all defined by the bot) are left intact so replays still resolve.
+    """
+    if isinstance(payload, dict):
+        return {
+            k: v if k == "data" and "application_id" in payload else anonymize(v, k)
+            for k, v in payload.items()
+        }
+
+    if isinstance(payload, list):
+        return [anonymize(v, key) for v in payload]
+
+    if not isinstance(payload, str) or payload in _PRESERVED_VALUES:
+        return payload
+
+    if key in _MASKED_KEYS:
+        return re.sub(r"\S", "x", payload)
+
+    if key in _HASHED_KEYS:
+        return f"{key}-{_hash(payload)}"
+
+    return payload
+
+
+class GatewayRecorder:
+    """Records raw gateway payloads to a gzip-compressed JSONL file
+
+    Payloads are serialized on the event loop, since the state parsers may keep references to
+    them, and compressed and written by a background thread.
+    """
+
+    def __init__(
+        self, path: str, *, anonymize: bool = True, events: tuple = SETUP_EVENTS + TRAFFIC_EVENTS
+    ) -> None:
+        self.path = Path(path)
+        self.anonymize = anonymize
+        self.events = events
+        self.recorded = 0
+        self._started = time.monotonic()
+        self._queue: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+
+    def install(self, parsers: Dict[str, Callable[[Dict[str, Any]], Any]]) -> None:
+        """Wraps the given connection state parsers in place"""
+        for event in self.events:
+            parsers[event] = self._wrap(event, parsers[event])
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = threading.Thread(
+            target=self._write_loop, name="dugs-gateway-recorder", daemon=True
+        )
+        self._writer.start()
+        logger.info(f"Recording gateway events {', '.join(self.events)} to `{self.path}`")
+
+    def _wrap(self, event: str, parser: Callable[[Dict[str, Any]], Any]) -> Callable:
+        def record(data: Dict[str, Any]) -> Any:
+            self._queue.put((event, time.monotonic() - self._started, json.dumps(data)))
+            self.recorded += 1
+            return parser(data)
+
+        return record
+
+    def _write_loop(self) -> None:
+        with gzip.open(self.path, "at", encoding="utf-8") as f:
+            while (item := self._queue.get()) is not _STOP:
+                event, timestamp, raw = item
+                data = json.loads(raw)
+                if self.anonymize:
+                    data = anonymize(data)
+                f.write(json.dumps({"t": event, "ts": round(timestamp, 6), "d": data}))
+                f.write("\n")
+
+    def close(self) -> None:
+        if self._writer is None:
+            return
+        self._queue.put(_STOP)
+        self._writer.join(timeout=10)
+        self._writer = None
+        logger.info(f"Recorded {self.recorded} gateway events to `{self.path}`")
+
+
+def read_recording(path: str) -> Iterator[RecordedEvent]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                event = json.loads(line)
+                yield RecordedEvent(event["t"], event["ts"], event["d"])
@@ -0,0 +1,157 @@
+"""Influence scoring rules, compiled once per guild.
+
+A `RuleSet` describes what activity is worth; `Scorer` is a rule set compiled into the fastest
+form for scoring many events: the word rule becomes a single regular expression that stops as soon
+as enough valid words were seen, without building a list of words, and attachment content types
+are scored by dictionary lookup. `ScoringEngine` holds the default rule set plus any per-guild
+overrides and hands out one compiled scorer per guild.
+
+Rule sets can be loaded from a JSON file (`SCORING_RULES_FILE`):
+
+    {
+        "default": {"min_valid_words": 3, "attachments": {"image": 5, "video": 10}},
+        "guilds": {"1234567890": {"word_influence": 2}}
+    }
+
+Guild rule sets only list the fields that differ from the default.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+import disnake
+
+__all__ = ("RuleSet", "Scorer", "ScoringEngine")
+
+# distinct content types remembered per scorer, uploads only ever use a handful
+_MAX_CONTENT_TYPES = 256
+
+
+@dataclasses.dataclass(frozen=True)
+class RuleSet:
+    # a word is a run of non-whitespace characters at least this long
+    min_characters: int = 2
+    # messages with at least this many words earn `word_influence`
+    min_valid_words: int = 3
+    word_influence: int = 1
+    # influence per attachment by the major part of its content type, e.g. `image` in `image/png`
+    attachments: Mapping[str, int] = dataclasses.field(
+        default_factory=lambda: {"image": 5, "video": 10}
+    )
+    reaction_influence: int = 1
+    thread_influence: int = 2
+
+    def replace(self, **changes: Any) -> RuleSet:
+        return dataclasses.replace(self, **changes)
+
+
+class Scorer:
+    """A `RuleSet` compiled for scoring"""
+
+    def __init__(self, rules: RuleSet) -> None:
+        self.rules = rules
+        self.word_influence = rules.word_influence
+        self.reaction_influence = rules.reaction_influence
+        self.thread_influence = rules.thread_influence
+
+        # `min_valid_words` whole runs of at least `min_characters` non-whitespace characters; the
+        # search stops as soon as the rule is met, and the boundaries on both sides of a word keep
+        # backtracking linear in the length of the message
+        word = rf"(?<!\S)\S{{{max(rules.min_characters, 1)},}}(?!\S)"
+        if rules.min_valid_words > 0:
+            self._words: Optional[re.Pattern] = re.compile(
+                rf"{word}(?:.*?{word}){{{rules.min_valid_words - 1}}}", re.DOTALL
+            )
+        else:
+            self._words = None
+
+        self._attachments = dict(rules.attachments)
+        # content type -> influence, filled on first sight; attachments without one score nothing
+        self._content_types: Dict[Optional[str], int] = {None: 0}
+
+    def _content_type_influence(self, content_type: str) -> int:
+        influence = self._attachments.get(content_type.partition("/")[0].strip().lower(), 0)
+        if len(self._content_types) < _MAX_CONTENT_TYPES:
+            self._content_types[content_type] = influence
+        return influence
+
+    def score_message(self, message: disnake.Message) -> int:
+        influence = 0
+
+        if self._words is None or self._words.search(message.content):
+            influence += self.word_influence
+
+        if attachments := message.attachments:
+            content_types = self._content_types
+            for attachment in attachments:
+                content_type = attachment.content_type
+                score = content_types.get(content_type)
+                if score is None:
+                    score = self._content_type_influence(content_type)
+                influence += score
+
+        return influence
+
+    def score_messages(self, messages: Iterable[disnake.Message]) -> List[int]:
+        """Scores a batch of messages"""
+        score = self.score_message
+        return [score(message) for message in messages]
+
+    def score_reaction(self, payload: disnake.RawReactionActionEvent) -> int:
+        return self.reaction_influence
+
+    def score_thread(self, thread: disnake.Thread) -> int:
+        return self.thread_influence
+
+
+class ScoringEngine:
+    """The default rule set, per-guild overrides and their compiled scorers
+
+    Parameters
+    ----------
+    default: RuleSet
+        Rules for guilds without their own
+    scorer_class: Callable[[RuleSet], Scorer]
+        Compiles a rule set, replace it to score differently
+    """
+
+    def __init__(
+        self,
+        default: Optional[RuleSet] = None,
+        scorer_class: Callable[[RuleSet], Scorer] = Scorer,
+    ) -> None:
+        self.scorer_class = scorer_class
+        self._default = scorer_class(default or RuleSet())
+        self._guilds: Dict[int, Scorer] = {}
+
+    @classmethod
+    def from_file(cls, path: Optional[str], **kwargs: Any) -> ScoringEngine:
+        """Loads rule sets from a JSON file, see the module documentation"""
+        if not path:
+            return cls(**kwargs)
+
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        default = RuleSet(**data.get("default", {}))
+        engine = cls(default, **kwargs)
+        for guild_id, changes in data.get("guilds", {}).items():
+            engine.set_rules(int(guild_id), default.replace(**changes))
+
+        return engine
+
+    @property
+    def default(self) -> RuleSet:
+        return self._default.rules
+
+    def set_rules(self, guild_id: int, rules: Optional[RuleSet]) -> None:
+        """Gives a guild its own rule set, or puts it back on the default with None"""
+        if rules is None:
+            self._guilds.pop(guild_id, None)
+        else:
+            self._guilds[guild_id] = self.scorer_class(rules)
+
+    def scorer(self, guild_id: Optional[int]) -> Scorer:
+        return self._guilds.get(guild_id, self._default)
@@ -0,0 +1,275 @@
+"""Compact binary snapshots of the company cache for warm restarts.
+
+Layout, little-endian:
+
+    header      magic, format version, stamp length, stamp, guild/company/member/war counts
+    companies   one fixed-size record per company, its name and its members' fixed-size records
+    wars        (guild id, company id) for each entry of `Companies._at_war`
+
+The stamp identifies the database state the snapshot was taken from: the alembic revision plus
+the SQLite file's modification time and size. Any write to the database after the snapshot was
+taken changes the stamp, so a stale snapshot is never used; the cache is loaded from the database
+instead.
+"""
+import datetime
+import gc
+import math
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import attributes
+
+from dugs import enums, migrations
+from dugs.database import Company, Member
+
+__all__ = ("SnapshotError", "database_stamp", "dump", "load", "write")
+
+MAGIC = b"DUGSNAP"
+VERSION = 2
+
+_HEADER = struct.Struct("<7sBH")
+_COUNTS = struct.Struct("<IIII")
+# id, guild id, opponent id, influence, total influence, war expiry, color, type, at war,
+# version, name length, member count
+_COMPANY = struct.Struct("<qqqqqdIB?qHI")
+# id, member id, role type
+_MEMBER = struct.Struct("<qqB")
+_WAR = struct.Struct("<qq")
+
+_COMPANY_TYPES = tuple(enums.CompanyType)
+_COMPANY_TYPE_INDEX = {t: i for i, t in enumerate(_COMPANY_TYPES)}
+_ROLE_TYPES = tuple(enums.RoleType)
+_ROLE_TYPE_INDEX = {t: i for i, t in enumerate(_ROLE_TYPES)}
+
+
+def _loader(model: type) -> Callable[..., Any]:
+    """Returns a function building detached `model` instances the way a query would load them
+
+    Going through the mapper's constructor and `make_transient_to_detached` is several times
+    slower, which adds up over tens of thousands of members.
+    """
+    mapper = sqlalchemy.inspect(model)
+    manager = mapper.class_manager
+    identity_class, _, identity_token = mapper.identity_key_from_primary_key((0,))
+
+    def load(pk: int, **values: Any) -> Any:
+        instance = manager.new_instance()
+        state = attributes.instance_state(instance)
+        state.dict.update(values)
+        state.key = (identity_class, (pk,), identity_token)
+        return instance
+
+    return load
+
+
+_new_company = _loader(Company)
+_new_member = _loader(Member)
+
+
+class SnapshotError(Exception):
+    """The snapshot is missing, stale or unreadable"""
+
+
+async def database_stamp(engine: AsyncEngine) -> Optional[str]:
+    """Returns the stamp of the database's current state, None if it cannot be stamped"""
+    if engine.url.get_backend_name() != "sqlite" or not engine.url.database:
+        return None
+
+    revision = await migrations.current_revision(engine)
+    try:
+        stat = os.stat(engine.url.database)
+    except FileNotFoundError:
+        return None
+
+    return f"{revision}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _timestamp(value: Optional[datetime.datetime]) -> float:
+    if value is None:
+        return math.nan
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def _datetime(value: float) -> Optional[datetime.datetime]:
+    if math.isnan(value):
+        return None
+    # stored naive, the way SQLite hands them back
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc).replace(tzinfo=None)
+
+
+def dump(
+    companies: Iterable[Company],
+    at_war: Dict[int, List[Company]],
+    stamp: str,
+    pending_influence: Optional[Dict[int, int]] = None,
+) -> bytes:
+    """Serializes the cached companies and wars
+
+    `pending_influence` is influence per company id that is in the cache but not in the database.
+    """
+    pending_influence = pending_influence or {}
+    records = []
+    company_count = member_count = 0
+    guilds = set()
+
+    for company in companies:
+        name = company.name.encode()
+        # members without an id were never written to the database
+        members = [m for m in company.members if m.id is not None]
+        records.append(
+            _COMPANY.pack(
+                company.id,
+                company.guild_id,
+                company.opponent_id or 0,
+                (company.influence or 0) - pending_influence.get(company.id, 0),
+                company.total_influence or 0,
+                _timestamp(company.war_expires_at),
+                int(company.color),
+                _COMPANY_TYPE_INDEX[company.type],
+                bool(company.at_war),
+                company.version or 0,
+                len(name),
+                len(members),
+            )
+        )
+        records.append(name)
+        records.extend(_MEMBER.pack(m.id, m.member_id, _ROLE_TYPE_INDEX[m.type]) for m in members)
+        company_count += 1
+        member_count += len(members)
+        guilds.add(company.guild_id)
+
+    wars = [(guild_id, c.id) for guild_id, war in at_war.items() for c in war if c is not None]
+    records.extend(_WAR.pack(*war) for war in wars)
+
+    encoded_stamp = stamp.encode()
+    header = _HEADER.pack(MAGIC, VERSION, len(encoded_stamp)) + encoded_stamp
+    counts = _COUNTS.pack(len(guilds), company_count, member_count, len(wars))
+    return b"".join((header, counts, *records))
+
+
+def write(path: Path, data: bytes) -> None:
+    """Writes the snapshot atomically, readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f"{path.suffix}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path: Path, stamp: str) -> Tuple[Dict[int, Dict[int, Company]], Dict[int, List[Company]]]:
+    """Memory-maps the snapshot at `path` and rebuilds the cache from it
+
+    Returns the companies and the wars per guild. Raises `SnapshotError` if the snapshot does not
+    exist, was taken from a different database state or cannot be read.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        raise SnapshotError(f"No snapshot at `{path}`") from None
+
+    # tens of thousands of new objects trigger collection after collection while nothing can be
+    # garbage yet; pausing the collector makes loading several times faster
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return _decode(buf, stamp)
+    except (struct.error, KeyError, IndexError, UnicodeDecodeError, ValueError) as e:
+        raise SnapshotError(f"Snapshot at `{path}` is corrupt: {e}") from e
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _decode(
+    buf: mmap.mmap, stamp: str
+) -> Tuple[Dict[int, Dict[int, Company]], Dict[int, List[Company]]]:
+    magic, version, stamp_len = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError("Snapshot has an unknown format")
+
+    offset = _HEADER.size
+    snapshot_stamp = bytes(buf[offset : offset + stamp_len]).decode()
+    if snapshot_stamp != stamp:
+        raise SnapshotError(f"Snapshot is stale: taken at {snapshot_stamp}, database is at {stamp}")
+    offset += stamp_len
+
+    _, company_count, _, war_count = _COUNTS.unpack_from(buf, offset)
+    offset += _COUNTS.size
+
+    cache: Dict[int, Dict[int, Company]] = {}
+    by_id: Dict[int, Company] = {}
+    opponents: List[Tuple[Company, int]] = []
+
+    for _ in range(company_count):
+        (
+            id,
+            guild_id,
+            opponent_id,
+            influence,
+            total_influence,
+            war_expires_at,
+            color,
+            type_index,
+            at_war,
+            version,
+            name_len,
+            member_count,
+        ) = _COMPANY.unpack_from(buf, offset)
+        offset += _COMPANY.size
+        name = bytes(buf[offset : offset + name_len]).decode()
+        offset += name_len
+
+        members = []
+        for _ in range(member_count):
+            member_pk, member_id, role_index = _MEMBER.unpack_from(buf, offset)
+            offset += _MEMBER.size
+            members.append(
+                _new_member(
+                    member_pk,
+                    id=member_pk,
+                    member_id=member_id,
+                    company_id=id,
+                    type=_ROLE_TYPES[role_index],
+                )
+            )
+
+        company = _new_company(
+            id,
+            id=id,
+            guild_id=guild_id,
+            name=name,
+            color=enums.CompanyColor(color),
+            type=_COMPANY_TYPES[type_index],
+            influence=influence,
+            total_influence=total_influence,
+            at_war=at_war,
+            war_expires_at=_datetime(war_expires_at),
+            opponent_id=opponent_id or None,
+            version=version,
+        )
+        attributes.set_committed_value(company, "members", members)
+        opponents.append((company, opponent_id))
+
+        cache.setdefault(guild_id, {})[id] = company
+        by_id[id] = company
+
+    for company, opponent_id in opponents:
+        attributes.set_committed_value(company, "opponent", by_id.get(opponent_id))
+
+    at_war: Dict[int, List[Company]] = {guild_id: [] for guild_id in cache}
+    for _ in range(war_count):
+        guild_id, company_id = _WAR.unpack_from(buf, offset)
+        offset += _WAR.size
+        at_war.setdefault(guild_id, []).append(by_id[company_id])
+
+    return cache, at_war
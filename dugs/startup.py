@@ -0,0 +1,122 @@
+"""Staged, concurrent startup.
+
+`StartupPipeline` overlaps the independent parts of getting the bot online:
+
+    database    migrations.prepare_database ──► cache_warmup
+    login       HTTP login
+    extensions  cog import                   ──► gateway (connect until READY)
+
+The gateway connection starts once the cogs are loaded and logged in, since application commands
+are synced on the first connect. The database is prepared and the cache warmed while the
+handshake is in flight; handlers that need the warm cache wait on `Dugs.wait_until_warm`. Every
+stage is timed from the start of the pipeline and the timings are logged once the bot is both
+ready and warm.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+from dugs import log, migrations
+from dugs.bot import Dugs
+
+__all__ = ("Stage", "StartupPipeline")
+
+logger = log.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class Stage:
+    name: str
+    started: float
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.finished is None else self.finished - self.started
+
+
+class StartupPipeline:
+    """Runs the bot's startup stages concurrently where they do not depend on each other
+
+    Parameters
+    ----------
+    bot: Dugs
+        The bot to start
+    token: str
+        The bot token
+    """
+
+    def __init__(self, bot: Dugs, token: str) -> None:
+        self.bot = bot
+        self.token = token
+        self.stages: Dict[str, Stage] = {}
+        self._origin = time.perf_counter()
+        self._tasks: list[asyncio.Task] = []
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    async def _stage(self, name: str, aw: Awaitable[T]) -> T:
+        stage = self.stages[name] = Stage(name, self._now())
+        try:
+            return await aw
+        except BaseException as e:
+            stage.error = type(e).__name__
+            raise
+        finally:
+            stage.finished = self._now()
+
+    def _spawn(self, name: str, aw: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.create_task(self._stage(name, aw), name=f"dugs: startup {name}")
+        self._tasks.append(task)
+        return task
+
+    async def _warm_cache(self, database: asyncio.Task) -> None:
+        await database
+        await self._stage("cache_warmup", self.bot.warm_cache())
+
+    async def _report(self, *tasks: asyncio.Task) -> None:
+        await asyncio.wait(tasks)
+
+        lines = [
+            f"{s.name:<14} {s.started * 1000:>8.1f}ms -> "
+            + (f"{s.finished * 1000:>8.1f}ms ({s.duration * 1000:.1f}ms)" if s.finished else "...")
+            + (f" failed: {s.error}" if s.error else "")
+            for s in sorted(self.stages.values(), key=lambda s: s.started)
+        ]
+        logger.info("Startup stages (since pipeline start):\n" + "\n".join(lines))
+
+    def _stop_on_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.critical("Database preparation failed, shutting down")
+            asyncio.create_task(self.bot.close())
+
+    async def run(self) -> None:
+        """Starts the bot and returns once the gateway connection is closed"""
+        database = self._spawn("database", migrations.prepare_database(self.bot.db_engine))
+        database.add_done_callback(self._stop_on_failure)
+        login = self._spawn("login", self.bot.login(self.token))
+        warmup = asyncio.create_task(self._warm_cache(database), name="dugs: startup warmup")
+        self._tasks.append(warmup)
+
+        try:
+            await self._stage("extensions", self.bot.load_extensions())
+            await login
+
+            ready = self._spawn("gateway", self.bot.wait_until_ready())
+            self._tasks.append(asyncio.create_task(self._report(warmup, ready)))
+
+            await self.bot.connect()
+
+            # surface a failed migration as the reason the bot stopped
+            if database.done() and not database.cancelled() and database.exception():
+                raise database.exception()
+
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,64 @@
+"""Hit rate of the engine's compiled statement cache.
+
+SQLAlchemy compiles a statement to SQL once per distinct shape and reuses the result while it stays
+in the engine's LRU cache, sized by `constants.Database.query_cache_size`. A cache that is too
+small for the statements the bot runs shows up here as misses, see `CompiledCacheStats`.
+"""
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+__all__ = ("CompiledCacheStats",)
+
+
+class CompiledCacheStats:
+    """Counts how the statements an engine runs were compiled
+
+    Parameters
+    ----------
+    engine: AsyncEngine
+        The engine whose statements are counted
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        # statements whose compiled form came from the cache
+        self.hits = 0
+        # statements compiled and added to the cache
+        self.misses = 0
+        # statements that cannot be cached, like raw SQL strings
+        self.uncached = 0
+
+        self._engine = engine
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def close(self) -> None:
+        """Stops counting"""
+        event.remove(self._engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is None:
+            return
+
+        cache_hit = context.cache_hit
+        if cache_hit is CacheStats.CACHE_HIT:
+            self.hits += 1
+        elif cache_hit is CacheStats.CACHE_MISS:
+            self.misses += 1
+        else:
+            self.uncached += 1
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of cacheable statements that were compiled from the cache"""
+        cacheable = self.hits + self.misses
+        return self.hits / cacheable if cacheable else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "hit_rate": self.hit_rate,
+        }
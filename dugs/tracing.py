@@ -0,0 +1,356 @@
+"""Lightweight request tracing built on contextvars.
+
+A span is opened with `span(...)` (or the `traced` decorator) and becomes the parent of every
+span opened inside it, including spans opened in tasks created while it is active. Finished spans
+are handed to a background thread which batches them into the configured exporter, so exporting
+never does I/O on the event loop.
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from dugs import constants, log
+
+__all__ = (
+    "Span",
+    "Tracer",
+    "JsonlExporter",
+    "OtlpHttpExporter",
+    "configure",
+    "current_span",
+    "get_tracer",
+    "instrument_engine",
+    "instrument_http",
+    "span",
+    "traced",
+)
+
+logger = log.get_logger(__name__)
+
+
+@dataclass
+class Span:
+    """A single timed operation within a trace"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    sampled: bool = True
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# shared by every span of a trace that was not sampled so they cost nothing to open
+_NOT_SAMPLED = Span(name="", trace_id="", span_id="", sampled=False)
+
+# tells the export thread to flush and exit
+_STOP = object()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("dugs_current_span", default=None)
+
+
+class JsonlExporter:
+    """Appends finished spans, one JSON object per line, to a local file"""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str))
+                f.write("\n")
+
+
+class OtlpHttpExporter:
+    """Posts finished spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str = "dugs", timeout: float = 5.0) -> None:
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _span(self, s: Span) -> Dict[str, Any]:
+        otlp_span = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [self._attribute(k, v) for k, v in s.attributes.items()],
+            # 1 = OK, 2 = ERROR
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        return otlp_span
+
+    def export(self, spans: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [self._attribute("service.name", self.service_name)]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": __name__}, "spans": [self._span(s) for s in spans]}
+                    ],
+                }
+            ]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """Creates spans, decides sampling per trace, and exports finished spans in batches
+
+    With no exporter every trace is dropped at its root span.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[Any] = None,
+        *,
+        sample_rate: float = 1.0,
+        batch_size: int = 256,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter else 0.0
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._worker: Optional[threading.Thread] = None
+
+        if exporter is not None:
+            self._worker = threading.Thread(
+                target=self._export_loop, name="dugs-trace-exporter", daemon=True
+            )
+            self._worker.start()
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Span:
+        if parent is None:
+            if not self.sample_rate or random.random() >= self.sample_rate:
+                return _NOT_SAMPLED
+            trace_id = f"{random.getrandbits(128):032x}"
+        elif not parent.sampled:
+            return _NOT_SAMPLED
+        else:
+            trace_id = parent.trace_id
+
+        return Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=f"{random.getrandbits(64):016x}",
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+
+    def finish(self, span: Span) -> None:
+        if not span.sampled:
+            return
+        span.end_ns = span.end_ns or time.time_ns()
+        self._queue.put(span)
+
+    def record(self, name: str, start_ns: int, end_ns: int, **attributes: Any) -> None:
+        """Records an already completed operation as a child of the current span"""
+        s = self.start_span(name, _current_span.get(), **attributes)
+        if s.sampled:
+            s.start_ns, s.end_ns = start_ns, end_ns
+            self.finish(s)
+
+    def _export_loop(self) -> None:
+        batch: List[Span] = []
+        last_flush = time.monotonic()
+
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            stopping = item is _STOP
+            if isinstance(item, Span):
+                batch.append(item)
+
+            if batch and (
+                stopping
+                or len(batch) >= self.batch_size
+                or time.monotonic() - last_flush >= self.flush_interval
+            ):
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    logger.warning(f"Failed to export {len(batch)} spans", exc_info=True)
+                batch = []
+                last_flush = time.monotonic()
+
+            if stopping:
+                return
+
+    def shutdown(self) -> None:
+        """Flushes any queued spans and stops the export thread"""
+        if self._worker is None:
+            return
+        self._queue.put(_STOP)
+        self._worker.join(timeout=self.flush_interval)
+        self._worker = None
+
+
+_tracer = Tracer()
+
+
+def configure(
+    exporter: Optional[str] = constants.Tracing.exporter,
+    sample_rate: float = constants.Tracing.sample_rate,
+) -> Tracer:
+    """Replaces the global tracer using an exporter name of `jsonl`, `otlp` or None"""
+    global _tracer
+
+    if exporter == "jsonl":
+        _exporter = JsonlExporter(constants.Tracing.jsonl_path)
+    elif exporter == "otlp":
+        _exporter = OtlpHttpExporter(constants.Tracing.otlp_endpoint)
+    elif exporter:
+        raise ValueError(f"Unknown trace exporter `{exporter}`")
+    else:
+        _exporter = None
+
+    _tracer.shutdown()
+    _tracer = Tracer(_exporter, sample_rate=sample_rate)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """Opens a span as a child of the current span for the duration of the block"""
+    s = _tracer.start_span(name, _current_span.get(), **attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        if s.sampled:
+            s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _tracer.finish(s)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorates a coroutine function so every call runs inside its own span"""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Records a `db.execute` span for every statement the engine runs
+
+    SQLAlchemy runs these hooks in a greenlet that shares the awaiting task's context, so the
+    spans are parented to whatever span issued the query.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._trace_start_ns = time.time_ns()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        start_ns = getattr(context, "_trace_start_ns", None)
+        if start_ns is not None:
+            _tracer.record("db.execute", start_ns, time.time_ns(), statement=statement[:200])
+
+
+def instrument_http(http: Any) -> None:
+    """Wraps the bot's REST client and the interaction webhook adapter with `discord.rest` spans"""
+    from disnake.webhook.async_ import async_context
+
+    def wrap(request: Callable) -> Callable:
+        @functools.wraps(request)
+        async def traced_request(route: Any, *args: Any, **kwargs: Any) -> Any:
+            with span("discord.rest", method=route.method, path=route.path):
+                return await request(route, *args, **kwargs)
+
+        return traced_request
+
+    http.request = wrap(http.request)
+
+    adapter = async_context.get()
+    if not getattr(adapter.request, "__wrapped__", None):
+        adapter.request = wrap(adapter.request)
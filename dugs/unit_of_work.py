@@ -0,0 +1,129 @@
+"""One database session per interaction or gateway event.
+
+`scope` binds a `UnitOfWork` to the current context. Every `Companies` call made inside it shares
+the unit's session, so rows loaded once are reused from its identity map, and everything is
+committed once when the scope exits, or rolled back if it raised. The session is only opened by
+the first call that needs it, so handlers that never reach the database pay nothing. Handlers
+that call Discord after writing commit first, see `checkpoint`.
+
+Statements run inside a scope are counted on its unit, see `instrument_engine`.
+"""
+import contextlib
+from contextvars import ContextVar
+from typing import AsyncIterator, Callable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from dugs import log
+
+__all__ = ("UnitOfWork", "checkpoint", "current", "instrument_engine", "scope")
+
+logger = log.get_logger(__name__)
+
+_current: ContextVar[Optional["UnitOfWork"]] = ContextVar("dugs_unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """The session shared by the `Companies` calls of one interaction or event"""
+
+    def __init__(self, sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+        self._sessionmaker = sessionmaker
+        self._session: Optional[AsyncSession] = None
+        # statements run while this unit was current
+        self.queries = 0
+        # whether the work is rolled back rather than committed, see `discard`
+        self.discarded = False
+        self._undo: List[Callable[[], None]] = []
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._sessionmaker()
+        return self._session
+
+    def discard(self) -> None:
+        """Has the work rolled back instead of committed once its scope exits
+
+        For failures that are handled before they reach the scope, like a failed command.
+        """
+        self.discarded = True
+
+    def on_rollback(self, undo: Callable[[], None]) -> None:
+        """Has `undo` called if the work is rolled back, to revert what it changed in memory"""
+        self._undo.append(undo)
+
+    async def flush(self) -> None:
+        """Sends the changes pending in the session to the database, without committing them"""
+        if self._session is not None:
+            await self._session.flush()
+
+    async def commit(self) -> None:
+        if self._session is not None:
+            await self._session.commit()
+        self._undo.clear()
+
+    async def rollback(self) -> None:
+        try:
+            if self._session is not None:
+                await self._session.rollback()
+        finally:
+            while self._undo:
+                self._undo.pop()()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def current() -> Optional[UnitOfWork]:
+    """Returns the unit of work of the current interaction or event, if there is one"""
+    return _current.get()
+
+
+async def checkpoint() -> None:
+    """Commits what the current unit of work has written so far, if there is one
+
+    SQLite holds its write lock until the commit, so handlers commit their writes before calling
+    Discord rather than holding every other writer up for the round trip. What the handler does
+    afterwards is committed, or rolled back, on its own.
+    """
+    if (work := _current.get()) is not None:
+        await work.commit()
+
+
+@contextlib.asynccontextmanager
+async def scope(sessionmaker: async_sessionmaker[AsyncSession]) -> AsyncIterator[UnitOfWork]:
+    """Runs the block in a unit of work, joining the current one if there already is one"""
+    if (work := _current.get()) is not None:
+        yield work
+        return
+
+    work = UnitOfWork(sessionmaker)
+    token = _current.set(work)
+    try:
+        yield work
+        if work.discarded:
+            await work.rollback()
+        else:
+            await work.commit()
+    except BaseException:
+        await work.rollback()
+        raise
+    finally:
+        _current.reset(token)
+        await work.close()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Counts the statements the engine runs on the unit of work they were run in
+
+    SQLAlchemy runs the hook in a greenlet that shares the awaiting task's context, see
+    `tracing.instrument_engine`.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        if (work := _current.get()) is not None:
+            work.queries += 1
@@ -1 +1,2 @@
 from .command_utils import *
+from .lazy import *
@@ -0,0 +1,26 @@
+import importlib.util
+import sys
+import types
+
+__all__ = ("lazy_import",)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Returns the module `name`, deferring its execution until an attribute is first accessed
+
+    Used for heavy dependencies only a few commands need, so they do not add to startup time.
+    Parent packages are still imported straight away.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module